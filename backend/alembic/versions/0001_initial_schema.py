@@ -0,0 +1,103 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 09:00:00.000000
+
+Databases created before migrations existed (via Base.metadata.create_all)
+already have these tables: mark them with `alembic stamp 0001`.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('username', sa.String(), nullable=True),
+        sa.Column('email', sa.String(), nullable=True),
+        sa.Column('hashed_password', sa.String(), nullable=True),
+        sa.Column('role', sa.Enum('ADMIN', 'TECHNICIAN', name='userrole'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+
+    op.create_table(
+        'devices',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('device_id', sa.String(), nullable=True),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('type', sa.String(), nullable=True),
+        sa.Column('manufacturer', sa.String(), nullable=True),
+        sa.Column('model', sa.String(), nullable=True),
+        sa.Column('serial_number', sa.String(), nullable=True),
+        sa.Column('installation_date', sa.DateTime(), nullable=True),
+        sa.Column('last_maintenance_date', sa.DateTime(), nullable=True),
+        sa.Column('status', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('serial_number')
+    )
+    op.create_index(op.f('ix_devices_id'), 'devices', ['id'], unique=False)
+    op.create_index(op.f('ix_devices_device_id'), 'devices', ['device_id'], unique=True)
+    op.create_index(op.f('ix_devices_name'), 'devices', ['name'], unique=False)
+
+    op.create_table(
+        'device_data',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('device_id', sa.String(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('usage_hours', sa.Float(), nullable=True),
+        sa.Column('temperature', sa.Float(), nullable=True),
+        sa.Column('pressure', sa.Float(), nullable=True),
+        sa.Column('vibration', sa.Float(), nullable=True),
+        sa.Column('error_count', sa.Integer(), nullable=True),
+        sa.Column('error_codes', sa.Text(), nullable=True),
+        sa.Column('maintenance_notes', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.device_id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_device_data_id'), 'device_data', ['id'], unique=False)
+
+    op.create_table(
+        'predictions',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('device_id', sa.String(), nullable=True),
+        sa.Column('prediction_timestamp', sa.DateTime(), nullable=True),
+        sa.Column('predicted_status', sa.String(), nullable=True),
+        sa.Column('confidence_score', sa.Float(), nullable=True),
+        sa.Column('features_used', sa.String(), nullable=True),
+        sa.Column('recommendation', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.device_id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_predictions_id'), 'predictions', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_predictions_id'), table_name='predictions')
+    op.drop_table('predictions')
+    op.drop_index(op.f('ix_device_data_id'), table_name='device_data')
+    op.drop_table('device_data')
+    op.drop_index(op.f('ix_devices_name'), table_name='devices')
+    op.drop_index(op.f('ix_devices_device_id'), table_name='devices')
+    op.drop_index(op.f('ix_devices_id'), table_name='devices')
+    op.drop_table('devices')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_table('users')
+    sa.Enum(name='userrole').drop(op.get_bind(), checkfirst=True)
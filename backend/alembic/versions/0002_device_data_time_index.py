@@ -0,0 +1,38 @@
+"""time-ordered index on device_data
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 09:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Build concurrently on PostgreSQL so ingestion is not blocked on large tables
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index(
+                'ix_device_data_device_id_timestamp',
+                'device_data',
+                ['device_id', sa.text('timestamp DESC'), sa.text('id DESC')],
+                postgresql_concurrently=True
+            )
+    else:
+        op.create_index(
+            'ix_device_data_device_id_timestamp',
+            'device_data',
+            ['device_id', sa.text('timestamp DESC'), sa.text('id DESC')]
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_device_data_device_id_timestamp', table_name='device_data')
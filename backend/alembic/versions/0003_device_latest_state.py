@@ -0,0 +1,94 @@
+"""device_latest_state table
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'device_latest_state',
+        sa.Column('device_id', sa.String(), nullable=False),
+        sa.Column('last_timestamp', sa.DateTime(), nullable=True),
+        sa.Column('usage_hours', sa.Float(), nullable=True),
+        sa.Column('temperature', sa.Float(), nullable=True),
+        sa.Column('pressure', sa.Float(), nullable=True),
+        sa.Column('vibration', sa.Float(), nullable=True),
+        sa.Column('error_count', sa.Integer(), nullable=True),
+        sa.Column('reading_count', sa.Integer(), nullable=True),
+        sa.Column('temperature_sum', sa.Float(), nullable=True),
+        sa.Column('pressure_sum', sa.Float(), nullable=True),
+        sa.Column('vibration_sum', sa.Float(), nullable=True),
+        sa.Column('error_count_sum', sa.Integer(), nullable=True),
+        sa.Column('max_temperature', sa.Float(), nullable=True),
+        sa.Column('max_vibration', sa.Float(), nullable=True),
+        sa.Column('latest_prediction_id', sa.Integer(), nullable=True),
+        sa.Column('latest_status', sa.String(), nullable=True),
+        sa.Column('latest_confidence', sa.Float(), nullable=True),
+        sa.Column('latest_prediction_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['device_id'], ['devices.device_id']),
+        sa.ForeignKeyConstraint(['latest_prediction_id'], ['predictions.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('device_id')
+    )
+
+    # Backfill from the existing readings and predictions
+    op.execute("""
+        INSERT INTO device_latest_state (
+            device_id, last_timestamp, usage_hours, temperature, pressure, vibration, error_count,
+            reading_count, temperature_sum, pressure_sum, vibration_sum, error_count_sum,
+            max_temperature, max_vibration,
+            latest_prediction_id, latest_status, latest_confidence, latest_prediction_at, updated_at
+        )
+        SELECT
+            k.device_id, r.timestamp, r.usage_hours, r.temperature, r.pressure, r.vibration, r.error_count,
+            COALESCE(a.reading_count, 0), COALESCE(a.temperature_sum, 0), COALESCE(a.pressure_sum, 0),
+            COALESCE(a.vibration_sum, 0), COALESCE(a.error_count_sum, 0),
+            a.max_temperature, a.max_vibration,
+            p.id, p.predicted_status, p.confidence_score, p.prediction_timestamp, CURRENT_TIMESTAMP
+        FROM (
+            SELECT device_id FROM device_data
+            UNION
+            SELECT device_id FROM predictions
+        ) k
+        LEFT JOIN (
+            SELECT device_id,
+                   COUNT(id) AS reading_count,
+                   SUM(COALESCE(temperature, 0)) AS temperature_sum,
+                   SUM(COALESCE(pressure, 0)) AS pressure_sum,
+                   SUM(COALESCE(vibration, 0)) AS vibration_sum,
+                   SUM(COALESCE(error_count, 0)) AS error_count_sum,
+                   MAX(temperature) AS max_temperature,
+                   MAX(vibration) AS max_vibration
+            FROM device_data
+            GROUP BY device_id
+        ) a ON a.device_id = k.device_id
+        LEFT JOIN (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY device_id ORDER BY timestamp DESC, id DESC
+            ) AS rank
+            FROM device_data
+        ) r ON r.device_id = k.device_id AND r.rank = 1
+        LEFT JOIN (
+            SELECT *, ROW_NUMBER() OVER (
+                PARTITION BY device_id ORDER BY prediction_timestamp DESC, id DESC
+            ) AS rank
+            FROM predictions
+        ) p ON p.device_id = k.device_id AND p.rank = 1
+        WHERE k.device_id IS NOT NULL
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('device_latest_state')
@@ -0,0 +1,38 @@
+"""time-ordered index on predictions
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Build concurrently on PostgreSQL so prediction writes are not blocked
+    if op.get_bind().dialect.name == 'postgresql':
+        with op.get_context().autocommit_block():
+            op.create_index(
+                'ix_predictions_device_id_timestamp',
+                'predictions',
+                ['device_id', sa.text('prediction_timestamp DESC'), sa.text('id DESC')],
+                postgresql_concurrently=True
+            )
+    else:
+        op.create_index(
+            'ix_predictions_device_id_timestamp',
+            'predictions',
+            ['device_id', sa.text('prediction_timestamp DESC'), sa.text('id DESC')]
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_predictions_device_id_timestamp', table_name='predictions')
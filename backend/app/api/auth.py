@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from app.crud import user as crud_user
 from app.schemas.user import User, UserCreate, Token
 from app import auth
+from app.concurrency import run_blocking
 from app.database import get_db
 from datetime import timedelta
 
@@ -14,8 +15,9 @@ async def login_for_access_token(
     password: str = Form(...),
     db: Session = Depends(get_db)
 ):
-    user = crud_user.get_user_by_username(db, username=username)
-    if not user or not auth.verify_password(password, user.hashed_password):
+    # Both the sync session and bcrypt would block the event loop
+    user = await run_blocking(crud_user.get_user_by_username, db, username=username)
+    if not user or not await auth.verify_password_async(password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
@@ -0,0 +1,90 @@
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+import hashlib
+import json
+import threading
+from app.concurrency import run_blocking
+from app.crud import async_device as crud_device
+from app.database import get_async_db
+from app.ml.model import predictor
+from app.schemas.device import Device
+from app.schemas.device_latest_state import DeviceLatestState
+from app.schemas.prediction import Prediction
+
+router = APIRouter()
+
+# Last rendered dashboard, reused while its ETag is still current
+_cache = {'etag': None, 'body': None}
+_cache_lock = threading.Lock()
+
+@router.get("/")
+async def get_dashboard(request: Request, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get every device with its latest state (latest reading and running
+    aggregates), latest prediction and an explanation of its latest reading in one response.
+    Responds 304 when the client's If-None-Match matches the current ETag.
+    """
+    etag = await _current_etag(db)
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+
+    if request.headers.get('if-none-match') == etag:
+        return Response(status_code=304, headers=headers)
+
+    with _cache_lock:
+        body = _cache['body'] if _cache['etag'] == etag else None
+
+    if body is None:
+        rows = await crud_device.get_devices_with_latest_state(db)
+        # Model inference and serialization are CPU-bound, keep them off the event loop
+        body = await run_blocking(_render_dashboard, rows)
+        with _cache_lock:
+            _cache['etag'], _cache['body'] = etag, body
+
+    return Response(content=body, media_type='application/json', headers=headers)
+
+async def _current_etag(db: AsyncSession) -> str:
+    snapshot = predictor.registry.current()
+    fingerprint = (await crud_device.get_state_fingerprint(db)) + (snapshot.version if snapshot else None,)
+    return '"' + hashlib.sha1(repr(fingerprint).encode('utf-8')).hexdigest() + '"'
+
+def _render_dashboard(rows) -> bytes:
+    return json.dumps(jsonable_encoder(_build_dashboard(rows))).encode('utf-8')
+
+def _build_dashboard(rows) -> dict:
+    # rows are devices with their maintained latest state and latest prediction
+
+    # Explain every latest reading with a single batched model call
+    readings = [state for _, state, _ in rows if state is not None and state.last_timestamp is not None]
+    explanations = {}
+    if readings:
+        try:
+            # Trend features (for models trained with them) are read on a session of their own
+            for reading, explanation in zip(readings, predictor.explain_latest_states(None, readings).to_records()):
+                explanations[reading.device_id] = explanation
+        except Exception as e:
+            # Still serve devices and stored predictions without a model
+            print(f"Error generating dashboard explanations: {str(e)}")
+
+    devices = []
+    status_counts = {'healthy': 0, 'at_risk': 0, 'needs_maintenance': 0, 'unknown': 0}
+    for device, state, prediction in rows:
+        status = prediction.predicted_status if prediction is not None else 'unknown'
+        status_counts[status] = status_counts.get(status, 0) + 1
+
+        devices.append({
+            'device': Device.model_validate(device),
+            'latest_state': DeviceLatestState.model_validate(state) if state is not None else None,
+            'latest_prediction': Prediction.model_validate(prediction) if prediction is not None else None,
+            'explanation': explanations.get(device.device_id)
+        })
+
+    snapshot = predictor.registry.current()
+    return {
+        'total_devices': len(devices),
+        'status_breakdown': status_counts,
+        'devices': devices,
+        'model_version': snapshot.version if snapshot else None,
+        'generated_at': datetime.utcnow()
+    }
@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-import pandas as pd
-import io
+from typing import List, Optional
 from datetime import datetime
-from app.crud import device as crud_device, device_data as crud_device_data, prediction as crud_prediction
+from app.crud import device as crud_device, device_data as crud_device_data, prediction as crud_prediction, device_latest_state as crud_latest_state
 from app.schemas.device import Device, DeviceCreate, DeviceUpdate
 from app.schemas.device_data import DeviceData, DeviceDataCreate, DeviceDataUpload
 from app.schemas.prediction import PredictionCreate
-from app.database import get_db
+from app.crud import async_device as async_crud_device, async_device_data as async_crud_device_data
+from app.concurrency import run_blocking
+from app.database import get_db, get_async_db
 from app.ml.model import predictor
+from app import ingestion
 
 router = APIRouter()
 
@@ -21,17 +23,35 @@ def create_device(device: DeviceCreate, db: Session = Depends(get_db)):
     return crud_device.create_device(db=db, device=device)
 
 @router.get("/{device_id}", response_model=Device)
-def read_device(device_id: int, db: Session = Depends(get_db)):
-    db_device = crud_device.get_device(db, device_id=device_id)
+async def read_device(device_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_device = await async_crud_device.get_device(db, device_id=device_id)
     if db_device is None:
         raise HTTPException(status_code=404, detail="Device not found")
     return db_device
 
 @router.get("/", response_model=List[Device])
-def read_devices(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    devices = crud_device.get_devices(db, skip=skip, limit=limit)
+async def read_devices(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    devices = await async_crud_device.get_devices(db, skip=skip, limit=limit)
     return devices
 
+@router.get("/{device_id}/data", response_model=List[DeviceData])
+async def read_device_data(device_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           before_timestamp: Optional[datetime] = None, before_id: Optional[int] = None,
+                           limit: int = 100, db: AsyncSession = Depends(get_async_db)):
+    """
+    Get a device's readings newest first, optionally restricted to [start, end).
+    Page with the timestamp and id of the last reading returned (keyset pagination).
+    """
+    if start is not None or end is not None:
+        if before_timestamp is not None:
+            raise HTTPException(status_code=400, detail="Use either a time range or keyset pagination, not both")
+        return await async_crud_device_data.get_device_data_in_range(
+            db, device_id=device_id, start=start, end=end, limit=limit
+        )
+    return await async_crud_device_data.get_device_data_page(
+        db, device_id=device_id, before_timestamp=before_timestamp, before_id=before_id, limit=limit
+    )
+
 @router.put("/{device_id}", response_model=Device)
 def update_device(device_id: int, device: DeviceUpdate, db: Session = Depends(get_db)):
     db_device = crud_device.update_device(db, device_id=device_id, device_update=device)
@@ -48,95 +68,35 @@ def delete_device(device_id: int, db: Session = Depends(get_db)):
 
 @router.post("/{device_id}/upload-data")
 async def upload_device_data(device_id: str, file: UploadFile = File(...), db: Session = Depends(get_db)):
-    # Check if device exists, if not create a minimal device entry
-    db_device = crud_device.get_device_by_device_id(db, device_id=device_id)
-    if db_device is None:
-        # Create a minimal device entry
-        device_create = DeviceCreate(
-            device_id=device_id,
-            name=f"Device {device_id}",
-            type="Unknown",
-            manufacturer="Unknown",
-            model="Unknown",
-            serial_number=f"SN-{device_id}",
-            installation_date=datetime.utcnow()
-        )
-        db_device = crud_device.create_device(db=db, device=device_create)
-    
     # Check filename
     if not file.filename:
         raise HTTPException(status_code=400, detail="File name is missing")
     
-    # Read file content
-    content = await file.read()
+    if not ingestion.is_supported_upload(file.filename):
+        raise HTTPException(status_code=400, detail="Unsupported file format. Please upload CSV, Excel, Parquet or Arrow files.")
     
-    # Process based on file extension
-    if file.filename.endswith('.csv'):
-        df = pd.read_csv(io.StringIO(content.decode('utf-8')))
-    elif file.filename.endswith(('.xlsx', '.xls')):
-        df = pd.read_excel(io.BytesIO(content))
-    else:
-        raise HTTPException(status_code=400, detail="Unsupported file format. Please upload CSV or Excel files.")
-    
-    # Convert DataFrame to DeviceData objects
-    device_data_list = []
-    for _, row in df.iterrows():
-        # Map CSV columns to DeviceData fields
-        # You may need to adjust these field names based on your CSV structure
-        error_count_value = row.get('error_count')
-        # Handle different types of error_count values
-        if error_count_value is None or (isinstance(error_count_value, float) and pd.isna(error_count_value)):
-            error_count = 0
-        else:
-            try:
-                error_count = int(float(error_count_value))
-            except (ValueError, TypeError):
-                error_count = 0
-        
-        # Handle error_codes that might be NaN
-        error_codes_value = row.get('error_codes')
-        error_codes = str(error_codes_value) if error_codes_value is not None and not (isinstance(error_codes_value, float) and pd.isna(error_codes_value)) else None
-        
-        # Handle maintenance_notes that might be NaN
-        maintenance_notes_value = row.get('maintenance_notes')
-        maintenance_notes = str(maintenance_notes_value) if maintenance_notes_value is not None and not (isinstance(maintenance_notes_value, float) and pd.isna(maintenance_notes_value)) else None
-        
-        device_data = DeviceDataCreate(
-            device_id=device_id,
-            usage_hours=row.get('usage_hours'),
-            temperature=row.get('temperature'),
-            pressure=row.get('pressure'),
-            vibration=row.get('vibration'),
-            error_count=error_count,
-            error_codes=error_codes,
-            maintenance_notes=maintenance_notes
-        )
-        device_data_list.append(device_data)
+    # Parsing, inserts and inference are blocking, keep them off the event loop
+    return await run_blocking(_ingest_upload, db, device_id, file)
+
+def _ingest_upload(db: Session, device_id: str, file: UploadFile):
+    # Create a minimal device entry if the device is not registered yet
+    crud_device.ensure_devices_exist(db, [device_id])
     
-    # Save to database
-    created_data = crud_device_data.create_multiple_device_data(db, device_data_list)
+    # Stream the spooled upload into the database in bounded chunks
+    try:
+        rows_uploaded = ingestion.ingest_device_data_file(db, device_id, file.file, file.filename)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     
     # Generate prediction for this device using the latest data
     try:
-        # Get the latest device data for prediction
-        latest_device_data = crud_device_data.get_device_data_by_device_id(db, device_id=device_id, limit=10)
+        # Get the latest device data for prediction, maintained during ingestion
+        latest_device_data = crud_latest_state.get_latest_states(db, device_ids=[device_id])
         
         if latest_device_data:
-            # Convert to DataFrame for ML model
-            data_dicts = []
-            for data in latest_device_data:
-                data_dicts.append({
-                    'usage_hours': data.usage_hours,
-                    'temperature': data.temperature,
-                    'pressure': data.pressure,
-                    'vibration': data.vibration,
-                    'error_count': data.error_count
-                })
-            
-            df = pd.DataFrame(data_dicts)
-            
-            # Make prediction
-            predictions = predictor.predict(df)
+            # Make prediction straight from the state rows
+            predictions, feature_names = predictor.predict_latest_states(db, latest_device_data)
             # Use the first prediction (most recent data)
             predicted_status, confidence_score, recommendation = predictions[0]
             
@@ -145,38 +105,26 @@ async def upload_device_data(device_id: str, file: UploadFile = File(...), db: S
                 device_id=device_id,
                 predicted_status=predicted_status,
                 confidence_score=float(confidence_score),
-                features_used=str(df.columns.tolist()),
+                features_used=str(feature_names),
                 recommendation=recommendation
             )
             
             crud_prediction.create_prediction(db=db, prediction=prediction_create)
             
-            return {"message": f"Successfully uploaded {len(created_data)} data points for device {device_id} and generated prediction"}
+            return {"message": f"Successfully uploaded {rows_uploaded} data points for device {device_id} and generated prediction"}
         else:
-            return {"message": f"Successfully uploaded {len(created_data)} data points for device {device_id}. No data available for prediction."}
+            return {"message": f"Successfully uploaded {rows_uploaded} data points for device {device_id}. No data available for prediction."}
     except Exception as e:
         # Log the error but don't fail the upload
         print(f"Error generating prediction for device {device_id}: {str(e)}")
-        return {"message": f"Successfully uploaded {len(created_data)} data points for device {device_id}. Failed to generate prediction: {str(e)}"}
+        return {"message": f"Successfully uploaded {rows_uploaded} data points for device {device_id}. Failed to generate prediction: {str(e)}"}
 
 @router.post("/bulk-upload-data")
-async def bulk_upload_device_data(data: DeviceDataUpload, db: Session = Depends(get_db)):
-    # Check if device exists, if not create a minimal device entry
-    db_device = crud_device.get_device_by_device_id(db, device_id=data.device_id)
-    if db_device is None:
-        # Create a minimal device entry
-        device_create = DeviceCreate(
-            device_id=data.device_id,
-            name=f"Device {data.device_id}",
-            type="Unknown",
-            manufacturer="Unknown",
-            model="Unknown",
-            serial_number=f"SN-{data.device_id}",
-            installation_date=datetime.utcnow()
-        )
-        db_device = crud_device.create_device(db=db, device=device_create)
+async def bulk_upload_device_data(data: DeviceDataUpload, db: AsyncSession = Depends(get_async_db)):
+    # Create minimal device entries for every device in the batch not registered yet
+    await async_crud_device.ensure_devices_exist(db, {data.device_id} | {reading.device_id for reading in data.data})
     
     # Save to database
-    created_data = crud_device_data.create_multiple_device_data(db, data.data)
+    rows_uploaded = await async_crud_device_data.bulk_insert_device_data(db, data.data)
     
-    return {"message": f"Successfully uploaded {len(created_data)} data points for device {data.device_id}"}
\ No newline at end of file
+    return {"message": f"Successfully uploaded {rows_uploaded} data points for device {data.device_id}"}
\ No newline at end of file
@@ -2,10 +2,10 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Optional
-import pandas as pd
 from app.database import get_db
-from app.ml.model import predictor
-from app.crud import device_data as crud_device_data
+from app.ml.model import TrendFeaturesUnavailable, predictor
+from app.ml.training import training_jobs
+from app.crud import device_latest_state as crud_latest_state
 
 router = APIRouter()
 
@@ -20,77 +20,58 @@ class PredictionRequest(BaseModel):
 class ExplainablePredictionRequest(BaseModel):
     data: List[PredictionRequest]
 
-@router.post("/train-model")
-def train_model(db: Session = Depends(get_db)):
+@router.post("/train-model", status_code=202)
+def train_model(max_records: Optional[int] = None, trend_features: Optional[bool] = None):
     """
-    Train the device health prediction model with existing data
+    Submit a background job that trains the device health prediction model
+    with existing data. Poll /train-model/{job_id} for its progress.
+    trend_features adds rolling statistics of each device's recent readings
+    (default: TRAINING_TREND_FEATURES).
     """
-    try:
-        # Get all device data from database
-        all_device_data = crud_device_data.get_all_device_data(db, limit=10000)
-        
-        if not all_device_data:
-            raise HTTPException(status_code=400, detail="No device data available for training")
-        
-        # Convert to DataFrame
-        data_dicts = []
-        for data in all_device_data:
-            data_dicts.append({
-                'usage_hours': data.usage_hours,
-                'temperature': data.temperature,
-                'pressure': data.pressure,
-                'vibration': data.vibration,
-                'error_count': data.error_count,
-                'health_status': 'healthy'  # This would need to be determined or provided
-            })
-        
-        df = pd.DataFrame(data_dicts)
-        
-        # For demonstration, we'll randomly assign health statuses
-        # In a real application, these would come from historical maintenance records
-        import numpy as np
-        conditions = [
-            (df['error_count'] <= 1) & (df['temperature'] <= 35) & (df['vibration'] <= 0.3),
-            (df['error_count'] > 1) & (df['error_count'] <= 5) & ((df['temperature'] > 35) | (df['vibration'] > 0.3)),
-            (df['error_count'] > 5) | (df['temperature'] > 45) | (df['vibration'] > 0.8)
-        ]
-        
-        choices = ['healthy', 'at_risk', 'needs_maintenance']
-        df['health_status'] = np.select(conditions, choices, default='healthy')
-        
-        # Train the model
-        model = predictor.train(df, target_column='health_status')
-        
-        return {
-            "message": "Model trained successfully",
-            "records_used": len(df),
-            "model_saved": True
-        }
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Model training failed: {str(e)}")
+    job = training_jobs.submit(max_records=max_records, trend_features=trend_features)
+    return job.to_dict()
+
+@router.get("/train-model")
+def list_training_jobs():
+    """
+    List recent training jobs, newest first
+    """
+    return [job.to_dict() for job in training_jobs.list()]
+
+@router.get("/train-model/{job_id}")
+def get_training_job(job_id: str):
+    """
+    Get the status, progress and results of a training job
+    """
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job.to_dict()
 
 @router.post("/predict-explainable")
-def predict_with_explanation(request: ExplainablePredictionRequest, db: Session = Depends(get_db)):
+def predict_with_explanation(request: ExplainablePredictionRequest, format: str = "records",
+                             include_text: bool = True, db: Session = Depends(get_db)):
     """
-    Make predictions with detailed explanations including feature importance
+    Make predictions with detailed explanations including feature importance.
+    format=columnar returns one list per field instead of one object per prediction;
+    include_text=false skips formatting the recommendation and explanation texts.
     """
+    if format not in ("records", "columnar"):
+        raise HTTPException(status_code=400, detail="format must be 'records' or 'columnar'")
+    
     try:
-        # Convert request data to DataFrame
-        data_dicts = []
-        for item in request.data:
-            data_dicts.append({
-                'usage_hours': item.usage_hours or 0,
-                'temperature': item.temperature or 0,
-                'pressure': item.pressure or 0,
-                'vibration': item.vibration or 0,
-                'error_count': item.error_count or 0
-            })
-        
-        df = pd.DataFrame(data_dicts)
+        # Get predictions with explanations, reading features straight from the request models
+        # (trend features, if the model uses them, from each device's stored readings)
+        explanations = predictor.explain_values(request.data, db=db)
+        
+        if format == "columnar":
+            return {
+                "device_ids": [item.device_id for item in request.data],
+                "predictions": explanations.to_columnar(include_text=include_text),
+                "count": len(explanations)
+            }
         
-        # Get predictions with explanations
-        predictions = predictor.predict_with_explanation(df)
+        predictions = explanations.to_records(include_text=include_text)
         
         # Add device IDs to results
         for idx, pred in enumerate(predictions):
@@ -101,6 +82,8 @@ def predict_with_explanation(request: ExplainablePredictionRequest, db: Session
             "count": len(predictions)
         }
         
+    except TrendFeaturesUnavailable as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
@@ -111,27 +94,18 @@ def explain_device_prediction(device_id: str, db: Session = Depends(get_db)):
     """
     try:
         # Get the latest device data
-        latest_data = crud_device_data.get_device_data_by_device_id(db, device_id=device_id, limit=1)
+        latest_data = crud_latest_state.get_latest_states(db, device_ids=[device_id])
         
         if not latest_data:
             raise HTTPException(status_code=404, detail="No data found for this device")
         
-        # Convert to DataFrame
-        data = latest_data[0]
-        df = pd.DataFrame([{
-            'usage_hours': data.usage_hours or 0,
-            'temperature': data.temperature or 0,
-            'pressure': data.pressure or 0,
-            'vibration': data.vibration or 0,
-            'error_count': data.error_count or 0
-        }])
-        
         # Get prediction with explanation
-        predictions = predictor.predict_with_explanation(df)
+        data = latest_data[0]
+        predictions = predictor.explain_latest_states(db, latest_data).to_records()
         
         result = predictions[0]
         result['device_id'] = device_id
-        result['timestamp'] = data.timestamp.isoformat()
+        result['timestamp'] = data.last_timestamp.isoformat()
         
         return result
         
@@ -146,19 +120,16 @@ def get_global_feature_importance():
     Get global feature importance from the trained model
     """
     try:
-        if not predictor.is_trained or predictor.model is None:
-            if not predictor.load_model():
-                raise HTTPException(status_code=400, detail="No trained model available")
-        
-        if predictor.model is None:
-            raise HTTPException(status_code=400, detail="Model not available")
+        snapshot = predictor.registry.current()
+        if snapshot is None:
+            raise HTTPException(status_code=400, detail="No trained model available")
         
         # Get feature importance
-        feature_importance = predictor.model.feature_importances_
+        feature_importance = snapshot.model.feature_importances_
         
         # Create feature importance dictionary
         importance_dict = {}
-        for feature_name, importance in zip(predictor.feature_names, feature_importance):
+        for feature_name, importance in zip(snapshot.feature_names, feature_importance):
             importance_dict[feature_name] = float(importance)
         
         # Sort by importance
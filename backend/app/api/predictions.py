@@ -1,11 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-import pandas as pd
-from app.crud import prediction as crud_prediction, device_data as crud_device_data
+from typing import List, Optional
+from app.crud import prediction as crud_prediction, device_latest_state as crud_latest_state
 from app.schemas.prediction import Prediction, PredictionCreate, PredictionUpdate, PredictionResult, BulkPredictionRequest
 from app.schemas.device_data import DeviceData
-from app.database import get_db
+from app.crud import async_prediction as async_crud_prediction
+from app.database import get_db, get_async_db
 from app.ml.model import predictor
 from datetime import datetime
 
@@ -16,23 +17,22 @@ def create_prediction(prediction: PredictionCreate, db: Session = Depends(get_db
     return crud_prediction.create_prediction(db=db, prediction=prediction)
 
 @router.get("/{prediction_id}", response_model=Prediction)
-def read_prediction(prediction_id: int, db: Session = Depends(get_db)):
-    db_prediction = crud_prediction.get_prediction(db, prediction_id=prediction_id)
+async def read_prediction(prediction_id: int, db: AsyncSession = Depends(get_async_db)):
+    db_prediction = await async_crud_prediction.get_prediction(db, prediction_id=prediction_id)
     if db_prediction is None:
         raise HTTPException(status_code=404, detail="Prediction not found")
     return db_prediction
 
 @router.get("/device/{device_id}", response_model=List[Prediction])
-def read_predictions_by_device(device_id: str, skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    predictions = crud_prediction.get_predictions_by_device_id(db, device_id=device_id, skip=skip, limit=limit)
+async def read_predictions_by_device(device_id: str, skip: int = 0, limit: int = 100,
+                                     db: AsyncSession = Depends(get_async_db)):
+    predictions = await async_crud_prediction.get_predictions_by_device_id(db, device_id=device_id, skip=skip, limit=limit)
     return predictions
 
 @router.get("/", response_model=List[PredictionResult])
-def read_predictions(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    # Get recent predictions (default implementation returns all)
-    predictions = crud_prediction.get_recent_predictions(db)
-    # Apply pagination manually if needed
-    return predictions[skip:skip+limit] if predictions else []
+async def read_predictions(skip: int = 0, limit: int = 100, hours: int = 24, db: AsyncSession = Depends(get_async_db)):
+    # Get predictions from the last `hours` hours, paginated in the database
+    return await async_crud_prediction.get_recent_predictions(db, hours=hours, skip=skip, limit=limit)
 
 @router.put("/{prediction_id}", response_model=Prediction)
 def update_prediction(prediction_id: int, prediction: PredictionUpdate, db: Session = Depends(get_db)):
@@ -53,28 +53,15 @@ def predict_for_device(device_id: str, db: Session = Depends(get_db)):
     """
     Generate a prediction for a specific device using its latest data
     """
-    # Get the latest device data
-    device_data_list = crud_device_data.get_device_data_by_device_id(db, device_id=device_id, limit=10)
+    # Get the latest device data from the maintained latest-state row
+    device_data_list = crud_latest_state.get_latest_states(db, device_ids=[device_id])
     
     if not device_data_list:
         raise HTTPException(status_code=404, detail="No data found for this device")
     
-    # Convert to DataFrame for ML model
-    data_dicts = []
-    for data in device_data_list:
-        data_dicts.append({
-            'usage_hours': data.usage_hours,
-            'temperature': data.temperature,
-            'pressure': data.pressure,
-            'vibration': data.vibration,
-            'error_count': data.error_count
-        })
-    
-    df = pd.DataFrame(data_dicts)
-    
-    # Make prediction
+    # Make prediction straight from the state rows
     try:
-        predictions = predictor.predict(df)
+        predictions, feature_names = predictor.predict_latest_states(db, device_data_list)
         # Use the first prediction (most recent data)
         predicted_status, confidence_score, recommendation = predictions[0]
     except Exception as e:
@@ -85,60 +72,77 @@ def predict_for_device(device_id: str, db: Session = Depends(get_db)):
         device_id=device_id,
         predicted_status=predicted_status,
         confidence_score=float(confidence_score),
-        features_used=str(df.columns.tolist()),
+        features_used=str(feature_names),
         recommendation=recommendation
     )
     
     return crud_prediction.create_prediction(db=db, prediction=prediction_create)
 
 @router.post("/bulk-predict", response_model=List[Prediction])
-def bulk_predict(request: BulkPredictionRequest, db: Session = Depends(get_db)):
+def bulk_predict(request: BulkPredictionRequest, response: Response, db: Session = Depends(get_db)):
     """
     Generate predictions for multiple devices
     """
-    predictions = []
+    return _score_devices(db, response, device_ids=request.device_ids)
+
+@router.post("/fleet-predict", response_model=List[Prediction])
+def fleet_predict(response: Response, db: Session = Depends(get_db)):
+    """
+    Generate predictions for every device that has reported data
+    """
+    return _score_devices(db, response, device_ids=None)
+
+def _score_devices(db: Session, response: Response, device_ids: Optional[List[str]]):
+    """
+    Score devices in one vectorized pass: one read of the device_latest_state
+    rows, one model call on the stacked matrix and one bulk insert.
+    Devices without data are skipped. If the batch fails, devices are scored
+    one by one and those that still fail are skipped and listed in the
+    X-Failed-Devices response header; it is an error only when none succeed.
+    """
+    # Get the latest reading of every requested device
+    latest_readings = crud_latest_state.get_latest_states(db, device_ids=device_ids)
     
-    for device_id in request.device_ids:
+    if not latest_readings:
+        return []
+    
+    # Make predictions for all devices at once from a single feature matrix
+    # (with trend features, if the model uses them)
+    try:
+        pred_results, feature_names = predictor.predict_latest_states(db, latest_readings)
+        scored = list(zip(latest_readings, pred_results))
+    except Exception as e:
+        print(f"Batch prediction failed, scoring devices one by one: {str(e)}")
+        scored, feature_names, failed = _score_one_by_one(db, latest_readings)
+        if not scored:
+            raise HTTPException(status_code=500, detail=f"Prediction failed: {failed[-1][1]}")
+        if failed:
+            response.headers['X-Failed-Devices'] = ','.join(device_id for device_id, _ in failed)
+    
+    features_used = str(feature_names)
+    prediction_creates = [
+        PredictionCreate(
+            device_id=reading.device_id,
+            predicted_status=predicted_status,
+            confidence_score=float(confidence_score),
+            features_used=features_used,
+            recommendation=recommendation
+        )
+        for reading, (predicted_status, confidence_score, recommendation) in scored
+    ]
+    
+    # Save all predictions with a single bulk insert
+    return crud_prediction.create_multiple_predictions(db, prediction_creates)
+
+def _score_one_by_one(db: Session, latest_readings):
+    # Isolates the devices a batch failure came from, so the others are still scored
+    scored, failed = [], []
+    feature_names = None
+    for reading in latest_readings:
         try:
-            # Get the latest device data
-            device_data_list = crud_device_data.get_device_data_by_device_id(db, device_id=device_id, limit=10)
-            
-            if not device_data_list:
-                continue  # Skip devices with no data
-            
-            # Convert to DataFrame for ML model
-            data_dicts = []
-            for data in device_data_list:
-                data_dicts.append({
-                    'usage_hours': data.usage_hours,
-                    'temperature': data.temperature,
-                    'pressure': data.pressure,
-                    'vibration': data.vibration,
-                    'error_count': data.error_count
-                })
-            
-            df = pd.DataFrame(data_dicts)
-            
-            # Make prediction
-            pred_results = predictor.predict(df)
-            # Use the first prediction (most recent data)
-            predicted_status, confidence_score, recommendation = pred_results[0]
-            
-            # Save prediction to database
-            prediction_create = PredictionCreate(
-                device_id=device_id,
-                predicted_status=predicted_status,
-                confidence_score=float(confidence_score),
-                features_used=str(df.columns.tolist()),
-                recommendation=recommendation
-            )
-            
-            db_prediction = crud_prediction.create_prediction(db=db, prediction=prediction_create)
-            predictions.append(db_prediction)
-            
+            predictions, feature_names = predictor.predict_latest_states(db, [reading])
+            scored.append((reading, predictions[0]))
         except Exception as e:
-            # Log error but continue with other devices
-            print(f"Error predicting for device {device_id}: {str(e)}")
-            continue
-    
-    return predictions
\ No newline at end of file
+            print(f"Error predicting for device {reading.device_id}: {str(e)}")
+            failed.append((reading.device_id, str(e)))
+    return scored, feature_names, failed
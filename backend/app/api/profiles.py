@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from app import profiling
+
+def require_profile_token(x_profile_token: Optional[str] = Header(None)):
+    if not profiling.PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not profiling.valid_token(x_profile_token):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+router = APIRouter(dependencies=[Depends(require_profile_token)])
+
+def _get_profile(profile_id: str) -> profiling.RequestProfile:
+    profile = profiling.profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
+
+@router.get("/")
+async def list_profiles():
+    """
+    Stored request profiles of this worker, newest first
+    """
+    return [profile.summary() for profile in profiling.profile_store.list()]
+
+@router.get("/{profile_id}")
+async def read_profile(profile_id: str, limit: int = 30):
+    """
+    A request profile with the functions most samples were spent in
+    """
+    profile = _get_profile(profile_id)
+    return {**profile.summary(), "functions": profile.top_functions(limit)}
+
+@router.get("/{profile_id}/collapsed", response_class=PlainTextResponse)
+async def read_profile_stacks(profile_id: str):
+    """
+    The sampled stacks in collapsed format, for flamegraph.pl or speedscope
+    """
+    return PlainTextResponse(_get_profile(profile_id).collapsed())
@@ -1,171 +1,139 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-import pandas as pd
-import io
-from datetime import datetime, timedelta
-from app.database import get_db
+from typing import List, Optional
+from datetime import datetime
+from app import exports
+from app.crud import async_device as async_crud_device
+from app.database import get_db, get_async_db
 from app.crud import device as crud_device, prediction as crud_prediction, device_data as crud_device_data
 from app.schemas.device import Device
 from app.schemas.prediction import Prediction
 
 router = APIRouter()
 
+# Columns of each CSV export, in output order
+DEVICE_EXPORT_COLUMNS = [
+    'device_id', 'name', 'type', 'manufacturer', 'model', 'serial_number',
+    'installation_date', 'last_maintenance_date', 'status'
+]
+PREDICTION_EXPORT_COLUMNS = [
+    'device_id', 'predicted_status', 'confidence_score', 'recommendation', 'prediction_timestamp'
+]
+DEVICE_DATA_EXPORT_COLUMNS = [
+    'device_id', 'timestamp', 'usage_hours', 'temperature', 'pressure', 'vibration',
+    'error_count', 'error_codes', 'maintenance_notes'
+]
+
 @router.get("/export-devices")
-def export_devices_csv(db: Session = Depends(get_db)):
+def export_devices_csv(gzip: bool = False):
     """
-    Export all devices as CSV
+    Export all devices as CSV, streamed from a server-side cursor
     """
     try:
-        # Get all devices
-        devices = crud_device.get_devices(db, skip=0, limit=1000)
-        
-        # Convert to DataFrame
-        data = []
-        for device in devices:
-            data.append({
-                'device_id': device.device_id,
-                'name': device.name,
-                'type': device.type,
-                'manufacturer': device.manufacturer,
-                'model': device.model,
-                'serial_number': device.serial_number,
-                'installation_date': device.installation_date,
-                'last_maintenance_date': device.last_maintenance_date,
-                'status': device.status
-            })
-        
-        df = pd.DataFrame(data)
-        
-        # Convert to CSV
-        csv_buffer = io.StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_data = csv_buffer.getvalue()
-        
-        # Return as downloadable CSV
-        headers = {
-            'Content-Disposition': 'attachment; filename="devices_report.csv"',
-            'Content-Type': 'text/csv'
-        }
-        return Response(content=csv_data, headers=headers)
+        return exports.csv_response(
+            crud_device.select_devices(DEVICE_EXPORT_COLUMNS), DEVICE_EXPORT_COLUMNS,
+            "devices_report.csv", gzip=gzip
+        )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export devices: {str(e)}")
 
 @router.get("/export-predictions")
-def export_predictions_csv(db: Session = Depends(get_db)):
+def export_predictions_csv(gzip: bool = False):
     """
-    Export all predictions as CSV
+    Export all predictions as CSV, streamed from a server-side cursor
     """
     try:
-        # Get recent predictions
-        predictions = crud_prediction.get_recent_predictions(db)
-        
-        # Convert to DataFrame
-        data = []
-        for pred in predictions:
-            data.append({
-                'device_id': pred.device_id,
-                'predicted_status': pred.predicted_status,
-                'confidence_score': pred.confidence_score,
-                'recommendation': pred.recommendation,
-                'prediction_timestamp': pred.prediction_timestamp
-            })
-        
-        df = pd.DataFrame(data)
-        
-        # Convert to CSV
-        csv_buffer = io.StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_data = csv_buffer.getvalue()
-        
-        # Return as downloadable CSV
-        headers = {
-            'Content-Disposition': 'attachment; filename="predictions_report.csv"',
-            'Content-Type': 'text/csv'
-        }
-        return Response(content=csv_data, headers=headers)
+        return exports.csv_response(
+            crud_prediction.select_predictions(PREDICTION_EXPORT_COLUMNS), PREDICTION_EXPORT_COLUMNS,
+            "predictions_report.csv", gzip=gzip
+        )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export predictions: {str(e)}")
 
-@router.get("/export-device-data/{device_id}")
-def export_device_data_csv(device_id: str, db: Session = Depends(get_db)):
+@router.get("/export-device-data")
+def export_fleet_device_data(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                             format: str = 'csv', gzip: bool = False):
     """
-    Export device data points as CSV
+    Export the data points of every device as CSV, Parquet or Arrow IPC,
+    optionally restricted to [start, end) in the database
     """
     try:
-        # Get device data
-        device_data_list = crud_device_data.get_device_data_by_device_id(db, device_id=device_id, limit=1000)
+        return exports.export_response(
+            crud_device_data.select_device_data(DEVICE_DATA_EXPORT_COLUMNS, start=start, end=end),
+            DEVICE_DATA_EXPORT_COLUMNS, "device_data_report", file_format=format, gzip=gzip
+        )
         
-        if not device_data_list:
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to export device data: {str(e)}")
+
+@router.get("/export-device-data/{device_id}")
+def export_device_data_csv(device_id: str, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                           format: str = 'csv', gzip: bool = False, db: Session = Depends(get_db)):
+    """
+    Export the data points of a device, newest first, as CSV, Parquet or Arrow
+    IPC, optionally restricted to [start, end) in the database. Streamed from a
+    server-side cursor so memory use does not grow with the device's history.
+    """
+    try:
+        # Check there is data before the response (and its status) is started
+        if not crud_device_data.get_latest_device_data(db, device_id=device_id, limit=1):
             raise HTTPException(status_code=404, detail="No data found for this device")
         
-        # Convert to DataFrame
-        data = []
-        for data_point in device_data_list:
-            data.append({
-                'device_id': data_point.device_id,
-                'timestamp': data_point.timestamp,
-                'usage_hours': data_point.usage_hours,
-                'temperature': data_point.temperature,
-                'pressure': data_point.pressure,
-                'vibration': data_point.vibration,
-                'error_count': data_point.error_count,
-                'error_codes': data_point.error_codes,
-                'maintenance_notes': data_point.maintenance_notes
-            })
-        
-        df = pd.DataFrame(data)
-        
-        # Convert to CSV
-        csv_buffer = io.StringIO()
-        df.to_csv(csv_buffer, index=False)
-        csv_data = csv_buffer.getvalue()
-        
-        # Return as downloadable CSV
-        headers = {
-            'Content-Disposition': f'attachment; filename="device_data_{device_id}_report.csv"',
-            'Content-Type': 'text/csv'
-        }
-        return Response(content=csv_data, headers=headers)
+        return exports.export_response(
+            crud_device_data.select_device_data(DEVICE_DATA_EXPORT_COLUMNS, device_id=device_id, start=start, end=end),
+            DEVICE_DATA_EXPORT_COLUMNS, f"device_data_{device_id}_report", file_format=format, gzip=gzip
+        )
         
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to export device data: {str(e)}")
 
 @router.get("/summary-report")
-def get_summary_report(db: Session = Depends(get_db)):
+async def get_summary_report(by_type: bool = False, by_manufacturer: bool = False,
+                             db: AsyncSession = Depends(get_async_db)):
     """
-    Get a summary report of device health status
+    Get a summary report of device health status, counted in the database
+    from each device's latest prediction. Optionally break the counts down
+    by device type and/or manufacturer.
     """
     try:
-        # Get all devices
-        devices = crud_device.get_devices(db, skip=0, limit=1000)
-        
-        # Get recent predictions
-        predictions = crud_prediction.get_recent_predictions(db)
+        group_by = [name for name, enabled in (('type', by_type), ('manufacturer', by_manufacturer)) if enabled]
         
-        # Create a mapping of device_id to latest prediction
-        prediction_map = {}
-        for pred in predictions:
-            if pred.device_id not in prediction_map:
-                prediction_map[pred.device_id] = pred
+        # One GROUP BY query covers the totals and every requested breakdown
+        groups = await async_crud_device.get_status_summary(db, group_by=group_by)
         
         # Count device statuses
         status_counts = {'healthy': 0, 'at_risk': 0, 'needs_maintenance': 0, 'unknown': 0}
-        for device in devices:
-            if device.device_id in prediction_map:
-                status = prediction_map[device.device_id].predicted_status
-                status_counts[status] = status_counts.get(status, 0) + 1
-            else:
-                status_counts['unknown'] = status_counts['unknown'] + 1
+        for group in groups:
+            status_counts[group['status']] = status_counts.get(group['status'], 0) + group['count']
         
         # Return summary data
-        return {
-            "total_devices": len(devices),
-            "status_breakdown": status_counts,
-            "report_generated": datetime.utcnow()
+        summary = {
+            "total_devices": sum(status_counts.values()),
+            "status_breakdown": status_counts
         }
+        for name in group_by:
+            summary[f"by_{name}"] = _breakdown(groups, name)
+        summary["report_generated"] = datetime.utcnow()
+        return summary
         
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to generate summary report: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Failed to generate summary report: {str(e)}")
+
+def _breakdown(groups: List[dict], name: str) -> dict:
+    # Fold the (group columns, status) counts into {value: {status: count}}
+    breakdown = {}
+    for group in groups:
+        counts = breakdown.setdefault(group[name] or 'unknown', {
+            'healthy': 0, 'at_risk': 0, 'needs_maintenance': 0, 'unknown': 0
+        })
+        counts[group['status']] = counts.get(group['status'], 0) + group['count']
+    return breakdown
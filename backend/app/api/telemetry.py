@@ -0,0 +1,87 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import datetime
+from app import telemetry
+from app.concurrency import run_blocking
+from app.crud import async_device as async_crud_device
+from app.database import get_async_db
+
+router = APIRouter()
+
+# Upper bound on how long ?wait=true holds a request for its readings to be committed
+WAIT_TIMEOUT_SECONDS = 30.0
+# Larger bodies are decoded on a worker thread
+INLINE_DECODE_BYTES = 64 * 1024
+
+@router.post("/", status_code=202)
+async def ingest_telemetry(request: Request, wait: bool = False, db: AsyncSession = Depends(get_async_db)):
+    """
+    Accept one or more readings as JSON lines (default), JSON or msgpack and
+    buffer them for micro-batched insertion. Responds 202 once buffered, or
+    with wait=true 201 once they are committed (retry on failure: delivery is
+    at-least-once), or 500 if the database refused and dropped some of them.
+    Responds 429 when the buffer is full and 503 when the writer is not
+    running; retry after the Retry-After delay.
+    Readings with invalid or out-of-range values are rejected individually,
+    with 422 when none is left; readings for unregistered devices register a
+    minimal device entry.
+    """
+    body = await request.body()
+    try:
+        if len(body) > INLINE_DECODE_BYTES:
+            # Parsing a large payload would stall every other request on the loop
+            readings = await run_blocking(telemetry.decode_payload, body, request.headers.get('content-type'))
+        else:
+            readings = telemetry.decode_payload(body, request.headers.get('content-type'))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    received_at = datetime.utcnow()
+    records, rejected = [], []
+    for index, reading in enumerate(readings):
+        try:
+            records.append(telemetry.coerce_reading(reading, received_at))
+        except (TypeError, ValueError) as e:
+            rejected.append({'index': index, 'error': str(e)})
+    if rejected and not records:
+        raise HTTPException(status_code=422, detail=rejected)
+
+    # Unknown devices are registered like on upload, usually without a query thanks to the registry cache
+    await async_crud_device.ensure_devices_exist(db, {record['device_id'] for record in records})
+
+    # Resolved from the writer thread, so waiting does not hold a worker thread
+    committed = asyncio.get_running_loop().create_future() if wait and records else None
+    try:
+        telemetry.telemetry_writer.submit(records, _resolver(committed) if committed is not None else None)
+    except telemetry.TelemetryFull as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={'Retry-After': '1'})
+    except telemetry.TelemetryUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={'Retry-After': '5'})
+
+    result = {'accepted': len(records), 'rejected': rejected, 'committed': False}
+    if committed is not None:
+        try:
+            written = await asyncio.wait_for(committed, WAIT_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Readings are buffered but not yet committed")
+        if not written:
+            raise HTTPException(status_code=500, detail="Some readings were refused by the database and dropped")
+        result['committed'] = True
+        return JSONResponse(status_code=201, content=result)
+    return result
+
+def _resolver(future: asyncio.Future):
+    # Called on the writer thread; the future may already be cancelled by a timeout
+    loop = future.get_loop()
+    def resolve(written: bool):
+        loop.call_soon_threadsafe(lambda: future.done() or future.set_result(written))
+    return resolve
+
+@router.get("/stats")
+async def telemetry_stats():
+    """
+    Buffer occupancy and write throughput counters of this worker's telemetry writer
+    """
+    return telemetry.telemetry_writer.stats()
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+import os
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+import anyio
+from app.profiling import current_profile
+
+logger = logging.getLogger(__name__)
+
+# Threads for blocking work (sync DB sessions, file parsing, inference) started from async endpoints
+BLOCKING_THREADS = int(os.getenv("BLOCKING_THREADS", "16"))
+# Threads for bcrypt; small so a burst of logins cannot take every core
+PASSWORD_HASH_THREADS = int(os.getenv("PASSWORD_HASH_THREADS", "2"))
+# Seconds between event loop lag probes
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", "0.5"))
+# Probe delays above this many seconds are logged and counted as stalls
+LOOP_LAG_THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD", "0.1"))
+
+# anyio limiters belong to one event loop; TestClient and reloads may run several
+_limiters: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, anyio.CapacityLimiter]" = weakref.WeakKeyDictionary()
+_limiters_lock = threading.Lock()
+
+_password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_THREADS, thread_name_prefix="password-hash")
+
+def _blocking_limiter() -> anyio.CapacityLimiter:
+    loop = asyncio.get_running_loop()
+    with _limiters_lock:
+        limiter = _limiters.get(loop)
+        if limiter is None:
+            limiter = _limiters[loop] = anyio.CapacityLimiter(BLOCKING_THREADS)
+        return limiter
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Run a blocking callable on a worker thread, at most BLOCKING_THREADS at a
+    time per event loop, and return its result. Exceptions propagate.
+    """
+    func = partial(func, *args, **kwargs)
+    profile = current_profile.get()
+    if profile is not None:
+        func = profile.wrap(func)
+    return await anyio.to_thread.run_sync(func, limiter=_blocking_limiter())
+
+def run_password_hash(func: Callable[..., Any], *args) -> Any:
+    """
+    Run a bcrypt call on the dedicated password pool and wait for it. Sync
+    callers block their own thread; bcrypt itself releases the GIL.
+    """
+    return _password_executor.submit(func, *args).result()
+
+async def run_password_hash_async(func: Callable[..., Any], *args) -> Any:
+    """Async counterpart of run_password_hash that does not block the event loop"""
+    return await asyncio.wrap_future(_password_executor.submit(func, *args))
+
+class EventLoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a task sleeping for `interval`
+    seconds. Lag above `threshold` means something ran on the loop without
+    yielding (blocking I/O, CPU-heavy code in an async def endpoint) and is
+    logged as a stall.
+    """
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL, threshold: float = LOOP_LAG_THRESHOLD):
+        self.interval = interval
+        self.threshold = threshold
+        self._task: Optional[asyncio.Task] = None
+        self.samples = 0
+        self.stalls = 0
+        self.stall_seconds = 0.0
+        self.last_lag_seconds = 0.0
+        self.max_lag_seconds = 0.0
+
+    def start(self):
+        """Start probing the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="event-loop-lag-monitor")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def record(self, lag: float):
+        self.samples += 1
+        self.last_lag_seconds = lag
+        self.max_lag_seconds = max(self.max_lag_seconds, lag)
+        if lag > self.threshold:
+            self.stalls += 1
+            self.stall_seconds += lag
+            logger.warning(f"Event loop stalled for {lag * 1000:.0f} ms")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'interval_seconds': self.interval,
+            'threshold_seconds': self.threshold,
+            'samples': self.samples,
+            'stalls': self.stalls,
+            'stall_seconds_total': self.stall_seconds,
+            'last_lag_seconds': self.last_lag_seconds,
+            'max_lag_seconds': self.max_lag_seconds,
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record(max(loop.time() - start - self.interval, 0.0))
+
+loop_lag_monitor = EventLoopLagMonitor()
@@ -0,0 +1,50 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, Iterable, List, Set
+from app.crud import device as crud_device
+from app.device_registry import device_registry
+from app.models.device import Device
+from app.schemas.device import DeviceCreate
+
+async def get_device(db: AsyncSession, device_id: int):
+    return await db.get(Device, device_id)
+
+async def get_device_by_device_id(db: AsyncSession, device_id: str):
+    return (await db.scalars(select(Device).where(Device.device_id == device_id))).first()
+
+async def get_devices(db: AsyncSession, skip: int = 0, limit: int = 100):
+    return (await db.scalars(select(Device).order_by(Device.id).offset(skip).limit(limit))).all()
+
+async def get_devices_with_latest_state(db: AsyncSession):
+    return (await db.execute(crud_device.devices_with_latest_state_query())).all()
+
+async def get_state_fingerprint(db: AsyncSession):
+    return tuple((await db.execute(crud_device.state_fingerprint_query())).one())
+
+async def get_status_summary(db: AsyncSession, group_by: List[str] = ()) -> List[Dict]:
+    rows = (await db.execute(crud_device.status_summary_query(db, group_by))).all()
+    return [dict(row._mapping) for row in rows]
+
+async def create_device(db: AsyncSession, device: DeviceCreate):
+    db_device = Device(**device.dict())
+    db.add(db_device)
+    await db.commit()
+    device_registry.invalidate([db_device.device_id])
+    return db_device
+
+async def ensure_devices_exist(db: AsyncSession, device_ids: Iterable[str]) -> Set[str]:
+    """
+    Async counterpart of crud.device.ensure_devices_exist
+    """
+    device_ids = set(device_ids)
+    missing = device_ids - device_registry.known(device_ids)
+    if not missing:
+        return set()
+    
+    existing = set((await db.scalars(select(Device.device_id).where(Device.device_id.in_(missing)))).all())
+    created = missing - existing
+    if created:
+        await db.execute(*crud_device.placeholder_devices_insert(db.get_bind().dialect.name, created))
+        await db.commit()
+    device_registry.add(missing)
+    return created
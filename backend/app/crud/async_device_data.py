@@ -0,0 +1,43 @@
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
+from datetime import datetime
+from app.crud import device_data as crud_device_data
+from app.crud import device_latest_state as crud_latest_state
+from app.metrics import record_ingest
+from app.ml.features import online_features
+from app.models.device_data import DeviceData
+
+async def get_latest_device_data(db: AsyncSession, device_id: str, limit: int = 1):
+    return (await db.scalars(crud_device_data.device_data_newest_first(device_id).limit(limit))).all()
+
+async def get_device_data_in_range(db: AsyncSession, device_id: str, start: Optional[datetime] = None,
+                                   end: Optional[datetime] = None, limit: Optional[int] = None):
+    return (await db.scalars(crud_device_data.device_data_range_query(device_id, start, end, limit))).all()
+
+async def get_device_data_page(db: AsyncSession, device_id: str, before_timestamp: Optional[datetime] = None,
+                               before_id: Optional[int] = None, limit: int = 100):
+    return (await db.scalars(
+        crud_device_data.device_data_page_query(device_id, before_timestamp, before_id, limit)
+    )).all()
+
+async def bulk_insert_device_data(db: AsyncSession, device_data_list: list) -> int:
+    return await insert_device_data_records(db, crud_device_data.device_data_records(device_data_list))
+
+async def insert_device_data_records(db: AsyncSession, records: List[Dict[str, Any]], commit: bool = True) -> int:
+    """
+    Async counterpart of crud.device_data.insert_device_data_records: one
+    executemany plus the device_latest_state upsert in the same transaction
+    """
+    if not records:
+        return 0
+    
+    await db.execute(insert(DeviceData.__table__), records)
+    upsert = crud_latest_state.readings_upsert(db.get_bind().dialect.name, records)
+    if upsert is not None:
+        await db.execute(*upsert)
+    if commit:
+        await db.commit()
+    online_features.observe(records)
+    record_ingest(len(records))
+    return len(records)
@@ -0,0 +1,15 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from app.crud import prediction as crud_prediction
+from app.models.prediction import Prediction
+
+async def get_prediction(db: AsyncSession, prediction_id: int):
+    return await db.get(Prediction, prediction_id)
+
+async def get_predictions_by_device_id(db: AsyncSession, device_id: str, skip: int = 0, limit: int = 100):
+    stmt = select(Prediction).where(Prediction.device_id == device_id).offset(skip).limit(limit)
+    return (await db.scalars(stmt)).all()
+
+async def get_recent_predictions(db: AsyncSession, hours: int = 24, skip: int = 0, limit: Optional[int] = 100):
+    return (await db.scalars(crud_prediction.recent_predictions_query(hours, skip, limit))).all()
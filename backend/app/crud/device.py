@@ -1,7 +1,19 @@
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterable, List, Set
+from datetime import datetime
+from app.device_registry import device_registry
 from app.models.device import Device
+from app.models.device_data import DeviceData
+from app.models.device_latest_state import DeviceLatestState
+from app.models.prediction import Prediction
+from app.crud.prediction import latest_prediction_statuses
 from app.schemas.device import DeviceCreate, DeviceUpdate
 
+# Columns the status summary can be broken down by
+SUMMARY_GROUPS = {'type': Device.type, 'manufacturer': Device.manufacturer}
+
 def get_device(db: Session, device_id: int):
     return db.query(Device).filter(Device.id == device_id).first()
 
@@ -11,21 +23,84 @@ def get_device_by_device_id(db: Session, device_id: str):
 def get_devices(db: Session, skip: int = 0, limit: int = 100):
     return db.query(Device).offset(skip).limit(limit).all()
 
+def select_devices(columns: List[str]):
+    """
+    Select statement for the given device columns, in id order
+    """
+    return select(*[getattr(Device, column) for column in columns]).order_by(Device.id)
+
+def get_devices_with_latest_state(db: Session):
+    """
+    Get every device with its latest state and latest prediction (either may
+    be None) as (Device, DeviceLatestState, Prediction) tuples, in one query
+    """
+    return db.execute(devices_with_latest_state_query()).all()
+
+def devices_with_latest_state_query():
+    return (
+        select(Device, DeviceLatestState, Prediction)
+        .outerjoin(DeviceLatestState, DeviceLatestState.device_id == Device.device_id)
+        .outerjoin(Prediction, Prediction.id == DeviceLatestState.latest_prediction_id)
+        .order_by(Device.id)
+    )
+
+def get_state_fingerprint(db: Session):
+    """
+    Cheap aggregate that changes whenever devices, readings or predictions
+    are added or updated: (device count, last device update, last reading id,
+    last prediction id, last latest-state update)
+    """
+    return tuple(db.execute(state_fingerprint_query()).one())
+
+def state_fingerprint_query():
+    return select(
+        select(func.count(Device.id)).scalar_subquery(),
+        select(func.max(Device.updated_at)).scalar_subquery(),
+        select(func.max(DeviceData.id)).scalar_subquery(),
+        select(func.max(Prediction.id)).scalar_subquery(),
+        select(func.max(DeviceLatestState.updated_at)).scalar_subquery()
+    )
+
+def get_status_summary(db: Session, group_by: List[str] = ()) -> List[Dict]:
+    """
+    Count devices by the status of their latest prediction ('unknown' for
+    devices never predicted), optionally also by the SUMMARY_GROUPS columns
+    in group_by, in a single GROUP BY query.
+    Returns one dict per group with the group columns, 'status' and 'count'.
+    """
+    rows = db.execute(status_summary_query(db, group_by)).all()
+    return [dict(row._mapping) for row in rows]
+
+def status_summary_query(db: Session, group_by: List[str] = ()):
+    latest = latest_prediction_statuses(db)
+    group_columns = [SUMMARY_GROUPS[name].label(name) for name in group_by]
+    status = func.coalesce(latest.c.predicted_status, 'unknown').label('status')
+    
+    return (
+        select(*group_columns, status, func.count(Device.id).label('count'))
+        .select_from(Device)
+        .outerjoin(latest, latest.c.device_id == Device.device_id)
+        .group_by(*group_columns, status)
+    )
+
 def create_device(db: Session, device: DeviceCreate):
     db_device = Device(**device.dict())
     db.add(db_device)
     db.commit()
     db.refresh(db_device)
+    device_registry.invalidate([db_device.device_id])
     return db_device
 
 def update_device(db: Session, device_id: int, device_update: DeviceUpdate):
     db_device = db.query(Device).filter(Device.id == device_id).first()
     if db_device:
+        previous_device_id = db_device.device_id
         update_data = device_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_device, key, value)
         db.commit()
         db.refresh(db_device)
+        device_registry.invalidate([previous_device_id, db_device.device_id])
     return db_device
 
 def delete_device(db: Session, device_id: int):
@@ -33,4 +108,63 @@ def delete_device(db: Session, device_id: int):
     if db_device:
         db.delete(db_device)
         db.commit()
-    return db_device
\ No newline at end of file
+        device_registry.invalidate([db_device.device_id])
+    return db_device
+
+def ensure_devices_exist(db: Session, device_ids: Iterable[str]) -> Set[str]:
+    """
+    Make sure every device id has a devices row before readings reference it,
+    registering placeholder devices for unknown ids. Ids cached as registered
+    cost no query; the rest take one SELECT and, for new devices, one
+    INSERT ... ON CONFLICT DO NOTHING, so concurrent uploads for the same new
+    device do not fail on the unique constraint. Commits when devices were
+    added. Returns the ids that were not registered before.
+    """
+    device_ids = set(device_ids)
+    missing = device_ids - device_registry.known(device_ids)
+    if not missing:
+        return set()
+    
+    existing = set(db.scalars(select(Device.device_id).where(Device.device_id.in_(missing))).all())
+    created = missing - existing
+    if created:
+        db.execute(*placeholder_devices_insert(db.get_bind().dialect.name, created))
+        db.commit()
+    device_registry.add(missing)
+    return created
+
+def placeholder_devices_insert(dialect_name: str, device_ids: Iterable[str]):
+    """
+    Build the (statement, parameters) inserting minimal device entries for
+    device_ids, skipping ids registered concurrently. Shared by the sync and
+    async crud layers.
+    """
+    now = datetime.utcnow()
+    records = [placeholder_device(device_id, now) for device_id in sorted(device_ids)]
+    table = Device.__table__
+    if dialect_name == 'postgresql':
+        stmt = postgresql.insert(table).on_conflict_do_nothing(index_elements=['device_id'])
+    elif dialect_name == 'sqlite':
+        stmt = sqlite.insert(table).on_conflict_do_nothing(index_elements=['device_id'])
+    else:
+        # No portable conflict clause, a concurrent registration fails the insert
+        stmt = insert(table)
+    return stmt, records
+
+def placeholder_device(device_id: str, now: datetime) -> Dict[str, Any]:
+    """
+    Column values of the minimal device entry created for data uploaded for
+    an unregistered device
+    """
+    return {
+        'device_id': device_id,
+        'name': f"Device {device_id}",
+        'type': "Unknown",
+        'manufacturer': "Unknown",
+        'model': "Unknown",
+        'serial_number': f"SN-{device_id}",
+        'installation_date': now,
+        'status': "active",
+        'created_at': now,
+        'updated_at': now,
+    }
\ No newline at end of file
@@ -1,41 +1,274 @@
+import csv
+import io
+from sqlalchemy import and_, func, insert, or_, select
 from sqlalchemy.orm import Session
+from typing import Any, Dict, List, Optional
+from app.crud import device_latest_state as crud_latest_state
+from app.metrics import record_ingest
+from app.ml.features import online_features
 from app.models.device_data import DeviceData
 from app.schemas.device_data import DeviceDataCreate, DeviceDataUpdate
 from datetime import datetime
 
+# Batches at least this large are loaded with COPY on PostgreSQL (psycopg2)
+COPY_MIN_ROWS = 1000
+COPY_NULL = "\\N"
+COPY_COLUMNS = [column.name for column in DeviceData.__table__.columns if column.name != "id"]
+
 def get_device_data(db: Session, data_id: int):
     return db.query(DeviceData).filter(DeviceData.id == data_id).first()
 
 def get_device_data_by_device_id(db: Session, device_id: str, skip: int = 0, limit: int = 100):
-    return db.query(DeviceData).filter(DeviceData.device_id == device_id).offset(skip).limit(limit).all()
+    return db.scalars(device_data_newest_first(device_id).offset(skip).limit(limit)).all()
+
+def get_latest_device_data(db: Session, device_id: str, limit: int = 1):
+    """
+    Get the latest `limit` readings of a device, newest first
+    """
+    return db.scalars(device_data_newest_first(device_id).limit(limit)).all()
+
+def get_device_data_in_range(db: Session, device_id: str, start: Optional[datetime] = None,
+                             end: Optional[datetime] = None, limit: Optional[int] = None):
+    """
+    Get the readings of a device with start <= timestamp < end, newest first
+    """
+    return db.scalars(device_data_range_query(device_id, start, end, limit)).all()
+
+def get_device_data_page(db: Session, device_id: str, before_timestamp: Optional[datetime] = None,
+                         before_id: Optional[int] = None, limit: int = 100):
+    """
+    Keyset pagination over a device's readings, newest first. Pass the
+    timestamp and id of the last row of the previous page to get the next one;
+    unlike OFFSET the cost does not grow with the page number.
+    """
+    return db.scalars(device_data_page_query(device_id, before_timestamp, before_id, limit)).all()
+
+def device_data_newest_first(device_id: str):
+    # Served by the (device_id, timestamp DESC, id DESC) index
+    return (
+        select(DeviceData)
+        .where(DeviceData.device_id == device_id)
+        .order_by(DeviceData.timestamp.desc(), DeviceData.id.desc())
+    )
+
+def device_data_range_query(device_id: str, start: Optional[datetime] = None,
+                            end: Optional[datetime] = None, limit: Optional[int] = None):
+    stmt = device_data_newest_first(device_id)
+    if start is not None:
+        stmt = stmt.where(DeviceData.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(DeviceData.timestamp < end)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+def device_data_page_query(device_id: str, before_timestamp: Optional[datetime] = None,
+                           before_id: Optional[int] = None, limit: int = 100):
+    stmt = device_data_newest_first(device_id)
+    if before_timestamp is not None:
+        if before_id is not None:
+            stmt = stmt.where(or_(
+                DeviceData.timestamp < before_timestamp,
+                and_(DeviceData.timestamp == before_timestamp, DeviceData.id < before_id)
+            ))
+        else:
+            stmt = stmt.where(DeviceData.timestamp < before_timestamp)
+    return stmt.limit(limit)
+
+def get_latest_device_data_for_devices(db: Session, device_ids: Optional[List[str]] = None):
+    """
+    Get the most recent reading of every requested device in a single query.
+    Passing device_ids=None returns the latest reading of every device with data.
+    """
+    if device_ids is not None and not device_ids:
+        return []
+    
+    latest_ids = latest_device_data_ids(device_ids)
+    return db.query(DeviceData).join(latest_ids, DeviceData.id == latest_ids.c.id).all()
+
+def latest_device_data_ids(device_ids: Optional[List[str]] = None):
+    """
+    Subquery selecting the id and device_id of the most recent reading of each device
+    """
+    ranked = select(
+        DeviceData.id,
+        DeviceData.device_id,
+        func.row_number().over(
+            partition_by=DeviceData.device_id,
+            order_by=(DeviceData.timestamp.desc(), DeviceData.id.desc())
+        ).label("rank")
+    )
+    if device_ids is not None:
+        ranked = ranked.where(DeviceData.device_id.in_(device_ids))
+    ranked = ranked.subquery()
+    
+    return select(ranked.c.id, ranked.c.device_id).where(ranked.c.rank == 1).subquery()
+
+def get_recent_device_data_for_devices(db: Session, device_ids: List[str], per_device: int):
+    """
+    Get the last `per_device` readings of each requested device in a single
+    query, grouped by device and oldest first within a device
+    """
+    if not device_ids:
+        return []
+    
+    ranked = select(
+        DeviceData.id,
+        func.row_number().over(
+            partition_by=DeviceData.device_id,
+            order_by=(DeviceData.timestamp.desc(), DeviceData.id.desc())
+        ).label("rank")
+    ).where(DeviceData.device_id.in_(device_ids)).subquery()
+    stmt = (
+        select(DeviceData)
+        .join(ranked, DeviceData.id == ranked.c.id)
+        .where(ranked.c.rank <= per_device)
+        .order_by(DeviceData.device_id, DeviceData.timestamp, DeviceData.id)
+    )
+    return db.scalars(stmt).all()
 
 def get_all_device_data(db: Session, skip: int = 0, limit: int = 100):
     return db.query(DeviceData).offset(skip).limit(limit).all()
 
+def count_device_data(db: Session) -> int:
+    return db.query(func.count(DeviceData.id)).scalar()
+
+def select_device_data(columns: List[str], device_id: Optional[str] = None,
+                       start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """
+    Select statement for the given device_data columns, optionally for one
+    device and restricted to start <= timestamp < end. Rows come per device,
+    newest first, which is the order of the time index serving the filters.
+    """
+    stmt = select(*[getattr(DeviceData, column) for column in columns])
+    if device_id is not None:
+        stmt = stmt.where(DeviceData.device_id == device_id)
+    if start is not None:
+        stmt = stmt.where(DeviceData.timestamp >= start)
+    if end is not None:
+        stmt = stmt.where(DeviceData.timestamp < end)
+    return stmt.order_by(DeviceData.device_id, DeviceData.timestamp.desc(), DeviceData.id.desc())
+
+def iter_feature_rows(db: Session, columns: List[str], chunk_size: int = 10000, limit: Optional[int] = None,
+                      per_device: bool = False):
+    """
+    Stream the given device_data columns as lists of tuples of at most
+    chunk_size rows, using a server-side cursor where the driver supports it.
+    Rows come in id order, or grouped by device in time order with per_device.
+    """
+    stmt = select(*[getattr(DeviceData, column) for column in columns])
+    if per_device:
+        stmt = stmt.order_by(DeviceData.device_id, DeviceData.timestamp, DeviceData.id)
+    else:
+        stmt = stmt.order_by(DeviceData.id)
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield partition
+
 def create_device_data(db: Session, device_data: DeviceDataCreate):
     # If timestamp is not provided, use current time
     if not device_data.timestamp:
         device_data.timestamp = datetime.utcnow()
     
-    db_device_data = DeviceData(**device_data.dict())
+    record = device_data.dict()
+    db_device_data = DeviceData(**record)
     db.add(db_device_data)
+    crud_latest_state.record_readings(db, [record])
     db.commit()
+    online_features.observe([record])
+    record_ingest(1)
     db.refresh(db_device_data)
     return db_device_data
 
 def create_multiple_device_data(db: Session, device_data_list: list):
-    db_device_data_list = []
-    for data in device_data_list:
-        if not data.timestamp:
-            data.timestamp = datetime.utcnow()
-        db_device_data = DeviceData(**data.dict())
-        db_device_data_list.append(db_device_data)
+    """
+    Insert many readings with a single executemany and return the stored rows,
+    including generated ids and timestamps, through RETURNING in input order
+    """
+    records = device_data_records(device_data_list)
+    if not records:
+        return []
     
-    db.add_all(db_device_data_list)
+    table = DeviceData.__table__
+    stmt = insert(table).returning(*table.c, sort_by_parameter_order=True)
+    created_rows = db.execute(stmt, records).all()
+    crud_latest_state.record_readings(db, created_rows)
     db.commit()
-    for db_device_data in db_device_data_list:
-        db.refresh(db_device_data)
-    return db_device_data_list
+    online_features.observe(created_rows)
+    record_ingest(len(created_rows))
+    return created_rows
+
+def bulk_insert_device_data(db: Session, device_data_list: list) -> int:
+    """
+    Fire-and-forget variant of create_multiple_device_data that only reports
+    the number of inserted rows
+    """
+    return insert_device_data_records(db, device_data_records(device_data_list))
+
+def insert_device_data_records(db: Session, records: List[Dict[str, Any]], commit: bool = True) -> int:
+    """
+    Insert plain column dicts without building ORM objects. Large batches are
+    loaded with COPY on PostgreSQL, everything else uses a single executemany.
+    device_latest_state is updated in the same transaction.
+    Returns the number of inserted rows.
+    """
+    if not records:
+        return 0
+    
+    if len(records) >= COPY_MIN_ROWS and _supports_copy(db):
+        _copy_device_data_records(db, records)
+    else:
+        db.execute(insert(DeviceData.__table__), records)
+    crud_latest_state.record_readings(db, records)
+    if commit:
+        db.commit()
+    # Without commit the caller commits; a rolled back batch leaves the windows
+    # ahead of device_latest_state, which makes them reload
+    online_features.observe(records)
+    record_ingest(len(records))
+    return len(records)
+
+def device_data_records(device_data_list: list) -> List[Dict[str, Any]]:
+    now = datetime.utcnow()
+    records = []
+    for data in device_data_list:
+        record = data.dict()
+        # If timestamp is not provided, use current time
+        if not record.get('timestamp'):
+            record['timestamp'] = now
+        records.append(record)
+    return records
+
+def _supports_copy(db: Session) -> bool:
+    dialect = db.get_bind().dialect
+    return dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
+def _copy_device_data_records(db: Session, records: List[Dict[str, Any]]):
+    # COPY bypasses client-side column defaults, so fill them in here
+    defaults = {'error_count': 0, 'created_at': datetime.utcnow()}
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for record in records:
+        row = []
+        for column in COPY_COLUMNS:
+            value = record.get(column)
+            if value is None:
+                value = defaults.get(column)
+            row.append(COPY_NULL if value is None else value)
+        writer.writerow(row)
+    buffer.seek(0)
+    
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {DeviceData.__tablename__} ({', '.join(COPY_COLUMNS)}) "
+            f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')",
+            buffer
+        )
+    finally:
+        cursor.close()
 
 def update_device_data(db: Session, data_id: int, device_data_update: DeviceDataUpdate):
     db_device_data = db.query(DeviceData).filter(DeviceData.id == data_id).first()
@@ -43,7 +276,10 @@ def update_device_data(db: Session, data_id: int, device_data_update: DeviceData
         update_data = device_data_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_device_data, key, value)
+        db.flush()
+        crud_latest_state.rebuild_latest_states(db, [db_device_data.device_id])
         db.commit()
+        online_features.invalidate([db_device_data.device_id])
         db.refresh(db_device_data)
     return db_device_data
 
@@ -51,5 +287,8 @@ def delete_device_data(db: Session, data_id: int):
     db_device_data = db.query(DeviceData).filter(DeviceData.id == data_id).first()
     if db_device_data:
         db.delete(db_device_data)
+        db.flush()
+        crud_latest_state.rebuild_latest_states(db, [db_device_data.device_id])
         db.commit()
+        online_features.invalidate([db_device_data.device_id])
     return db_device_data
\ No newline at end of file
@@ -0,0 +1,226 @@
+from sqlalchemy import case, delete, func, insert, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from typing import Any, Dict, Iterable, List, Optional
+from datetime import datetime
+from app.crud import device_data as crud_device_data
+from app.crud import prediction as crud_prediction
+from app.models.device_data import DeviceData
+from app.models.device_latest_state import DeviceLatestState
+from app.models.prediction import Prediction
+
+READING_COLUMNS = ['usage_hours', 'temperature', 'pressure', 'vibration', 'error_count']
+
+def get_latest_state(db: Session, device_id: str):
+    return db.query(DeviceLatestState).filter(DeviceLatestState.device_id == device_id).first()
+
+def get_latest_states(db: Session, device_ids: Optional[List[str]] = None, with_readings_only: bool = True):
+    """
+    Get the latest state of the requested devices (all devices if device_ids is None)
+    """
+    query = db.query(DeviceLatestState)
+    if device_ids is not None:
+        if not device_ids:
+            return []
+        query = query.filter(DeviceLatestState.device_id.in_(device_ids))
+    if with_readings_only:
+        query = query.filter(DeviceLatestState.last_timestamp.isnot(None))
+    return query.all()
+
+def record_readings(db: Session, readings: Iterable[Any]):
+    """
+    Fold a batch of new readings (column dicts or Core rows) into
+    device_latest_state with one upsert per device. Does not commit.
+    """
+    upsert = readings_upsert(db.get_bind().dialect.name, readings)
+    if upsert is not None:
+        db.execute(*upsert)
+
+def _by_device_id(states: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [states[device_id] for device_id in sorted(states)]
+
+def readings_upsert(dialect_name: str, readings: Iterable[Any]):
+    """
+    Build the (statement, parameters) of the record_readings upsert, or None
+    for an empty batch. Shared by the sync and async crud layers.
+    """
+    states: Dict[str, Dict[str, Any]] = {}
+    for reading in readings:
+        values = reading if isinstance(reading, dict) else reading._mapping
+        device_id = values['device_id']
+        state = states.get(device_id)
+        if state is None:
+            state = states[device_id] = {
+                'device_id': device_id, 'last_timestamp': None, 'reading_count': 0,
+                'temperature_sum': 0.0, 'pressure_sum': 0.0, 'vibration_sum': 0.0, 'error_count_sum': 0,
+                'max_temperature': None, 'max_vibration': None, 'updated_at': datetime.utcnow(),
+                **{column: None for column in READING_COLUMNS}
+            }
+
+        timestamp = values.get('timestamp')
+        # Later readings in a batch win ties, matching id order
+        if state['last_timestamp'] is None or (timestamp is not None and timestamp >= state['last_timestamp']):
+            state['last_timestamp'] = timestamp
+            for column in READING_COLUMNS:
+                state[column] = values.get(column)
+            # Same default the device_data column applies
+            if state['error_count'] is None:
+                state['error_count'] = 0
+
+        temperature = values.get('temperature')
+        vibration = values.get('vibration')
+        state['reading_count'] += 1
+        state['temperature_sum'] += temperature or 0.0
+        state['pressure_sum'] += values.get('pressure') or 0.0
+        state['vibration_sum'] += vibration or 0.0
+        state['error_count_sum'] += values.get('error_count') or 0
+        if temperature is not None and (state['max_temperature'] is None or temperature > state['max_temperature']):
+            state['max_temperature'] = temperature
+        if vibration is not None and (state['max_vibration'] is None or vibration > state['max_vibration']):
+            state['max_vibration'] = vibration
+
+    if not states:
+        return None
+
+    table = DeviceLatestState.__table__
+    stmt = _insert(dialect_name)(table)
+    excluded = stmt.excluded
+    is_newer = or_(table.c.last_timestamp.is_(None), excluded.last_timestamp >= table.c.last_timestamp)
+
+    set_ = {column: case((is_newer, excluded[column]), else_=table.c[column])
+            for column in ['last_timestamp'] + READING_COLUMNS}
+    for column in ['reading_count', 'temperature_sum', 'pressure_sum', 'vibration_sum', 'error_count_sum']:
+        set_[column] = func.coalesce(table.c[column], 0) + excluded[column]
+    for column in ['max_temperature', 'max_vibration']:
+        set_[column] = case(
+            (or_(table.c[column].is_(None), excluded[column] > table.c[column]), excluded[column]),
+            else_=table.c[column]
+        )
+    set_['updated_at'] = excluded.updated_at
+
+    # Rows in device_id order so concurrent multi-device batches lock them in the same order
+    return stmt.on_conflict_do_update(index_elements=[table.c.device_id], set_=set_), _by_device_id(states)
+
+def record_predictions(db: Session, predictions: Iterable[Any]):
+    """
+    Point device_latest_state at the newest of the given stored predictions
+    (objects with id, device_id, prediction_timestamp, predicted_status, confidence_score). Does not commit.
+    """
+    upsert = predictions_upsert(db.get_bind().dialect.name, predictions)
+    if upsert is not None:
+        db.execute(*upsert)
+
+def predictions_upsert(dialect_name: str, predictions: Iterable[Any]):
+    """
+    Build the (statement, parameters) of the record_predictions upsert, or None
+    for an empty batch
+    """
+    states: Dict[str, Dict[str, Any]] = {}
+    for prediction in predictions:
+        state = states.get(prediction.device_id)
+        if state is None or prediction.prediction_timestamp >= state['latest_prediction_at']:
+            states[prediction.device_id] = {
+                'device_id': prediction.device_id,
+                'latest_prediction_id': prediction.id,
+                'latest_status': prediction.predicted_status,
+                'latest_confidence': prediction.confidence_score,
+                'latest_prediction_at': prediction.prediction_timestamp,
+                'updated_at': datetime.utcnow()
+            }
+
+    if not states:
+        return None
+
+    table = DeviceLatestState.__table__
+    stmt = _insert(dialect_name)(table)
+    excluded = stmt.excluded
+    is_newer = or_(
+        table.c.latest_prediction_at.is_(None),
+        excluded.latest_prediction_at >= table.c.latest_prediction_at
+    )
+    set_ = {column: case((is_newer, excluded[column]), else_=table.c[column])
+            for column in ['latest_prediction_id', 'latest_status', 'latest_confidence', 'latest_prediction_at']}
+    set_['updated_at'] = excluded.updated_at
+
+    # Rows in device_id order so concurrent multi-device batches lock them in the same order
+    return stmt.on_conflict_do_update(index_elements=[table.c.device_id], set_=set_), _by_device_id(states)
+
+def rebuild_latest_states(db: Session, device_ids: Optional[List[str]] = None):
+    """
+    Recompute device_latest_state from device_data and predictions for the
+    given devices (all devices if device_ids is None). Used after updates and
+    deletes, which the incremental upserts cannot undo. Does not commit.
+    """
+    table = DeviceLatestState.__table__
+    aggregates = select(
+        DeviceData.device_id,
+        func.count(DeviceData.id).label('reading_count'),
+        func.sum(func.coalesce(DeviceData.temperature, 0)).label('temperature_sum'),
+        func.sum(func.coalesce(DeviceData.pressure, 0)).label('pressure_sum'),
+        func.sum(func.coalesce(DeviceData.vibration, 0)).label('vibration_sum'),
+        func.sum(func.coalesce(DeviceData.error_count, 0)).label('error_count_sum'),
+        func.max(DeviceData.temperature).label('max_temperature'),
+        func.max(DeviceData.vibration).label('max_vibration')
+    ).group_by(DeviceData.device_id)
+    if device_ids is not None:
+        aggregates = aggregates.where(DeviceData.device_id.in_(device_ids))
+    aggregates = aggregates.subquery()
+    
+    latest_data = crud_device_data.latest_device_data_ids(device_ids)
+    latest_predictions = crud_prediction.latest_prediction_ids()
+    
+    # Every device with readings or predictions
+    device_keys = select(DeviceData.device_id).union(select(Prediction.device_id)).subquery()
+    
+    source = (
+        select(
+            device_keys.c.device_id,
+            DeviceData.timestamp,
+            *[DeviceData.__table__.c[column] for column in READING_COLUMNS],
+            func.coalesce(aggregates.c.reading_count, 0),
+            func.coalesce(aggregates.c.temperature_sum, 0),
+            func.coalesce(aggregates.c.pressure_sum, 0),
+            func.coalesce(aggregates.c.vibration_sum, 0),
+            func.coalesce(aggregates.c.error_count_sum, 0),
+            aggregates.c.max_temperature,
+            aggregates.c.max_vibration,
+            Prediction.id,
+            Prediction.predicted_status,
+            Prediction.confidence_score,
+            Prediction.prediction_timestamp,
+            func.current_timestamp()
+        )
+        .select_from(device_keys)
+        .outerjoin(aggregates, aggregates.c.device_id == device_keys.c.device_id)
+        .outerjoin(latest_data, latest_data.c.device_id == device_keys.c.device_id)
+        .outerjoin(DeviceData, DeviceData.id == latest_data.c.id)
+        .outerjoin(latest_predictions, latest_predictions.c.device_id == device_keys.c.device_id)
+        .outerjoin(Prediction, Prediction.id == latest_predictions.c.id)
+        .where(device_keys.c.device_id.isnot(None))
+    )
+    
+    clear = delete(table)
+    if device_ids is not None:
+        if not device_ids:
+            return
+        clear = clear.where(table.c.device_id.in_(device_ids))
+        source = source.where(device_keys.c.device_id.in_(device_ids))
+    
+    db.execute(clear)
+    db.execute(insert(table).from_select(
+        ['device_id', 'last_timestamp'] + READING_COLUMNS + [
+            'reading_count', 'temperature_sum', 'pressure_sum', 'vibration_sum', 'error_count_sum',
+            'max_temperature', 'max_vibration',
+            'latest_prediction_id', 'latest_status', 'latest_confidence', 'latest_prediction_at',
+            'updated_at'
+        ],
+        source
+    ))
+
+def _insert(dialect_name: str):
+    # INSERT ... ON CONFLICT DO UPDATE is spelled the same on both supported databases
+    if dialect_name == 'postgresql':
+        return postgresql.insert
+    if dialect_name == 'sqlite':
+        return sqlite.insert
+    raise NotImplementedError(f"device_latest_state upserts are not supported on {dialect_name}")
@@ -1,7 +1,10 @@
+from sqlalchemy import func, insert, select
 from sqlalchemy.orm import Session
+from app.crud import device_latest_state as crud_latest_state
 from app.models.prediction import Prediction
 from app.schemas.prediction import PredictionCreate, PredictionUpdate
-from datetime import datetime
+from typing import List, Optional
+from datetime import datetime, timedelta
 
 def get_prediction(db: Session, prediction_id: int):
     return db.query(Prediction).filter(Prediction.id == prediction_id).first()
@@ -9,27 +12,97 @@ def get_prediction(db: Session, prediction_id: int):
 def get_predictions_by_device_id(db: Session, device_id: str, skip: int = 0, limit: int = 100):
     return db.query(Prediction).filter(Prediction.device_id == device_id).offset(skip).limit(limit).all()
 
-def get_recent_predictions(db: Session, hours: int = 24):
-    # This would need to be adjusted based on your needs
-    return db.query(Prediction).limit(100).all()
+def get_recent_predictions(db: Session, hours: int = 24, skip: int = 0, limit: Optional[int] = 100):
+    """
+    Get the predictions made in the last `hours` hours, newest first
+    """
+    return db.scalars(recent_predictions_query(hours, skip, limit)).all()
+
+def recent_predictions_query(hours: int = 24, skip: int = 0, limit: Optional[int] = 100):
+    since = datetime.utcnow() - timedelta(hours=hours)
+    stmt = (
+        select(Prediction)
+        .where(Prediction.prediction_timestamp >= since)
+        .order_by(Prediction.prediction_timestamp.desc(), Prediction.id.desc())
+        .offset(skip)
+    )
+    if limit is not None:
+        stmt = stmt.limit(limit)
+    return stmt
+
+def select_predictions(columns: List[str]):
+    """
+    Select statement for the given prediction columns, oldest first
+    """
+    return (
+        select(*[getattr(Prediction, column) for column in columns])
+        .order_by(Prediction.prediction_timestamp, Prediction.id)
+    )
+
+def latest_prediction_ids():
+    """
+    Subquery selecting the id and device_id of the most recent prediction of each device
+    """
+    ranked = select(
+        Prediction.id,
+        Prediction.device_id,
+        func.row_number().over(
+            partition_by=Prediction.device_id,
+            order_by=(Prediction.prediction_timestamp.desc(), Prediction.id.desc())
+        ).label("rank")
+    ).subquery()
+    
+    return select(ranked.c.id, ranked.c.device_id).where(ranked.c.rank == 1).subquery()
+
+def latest_prediction_statuses(db: Session):
+    """
+    Subquery selecting the device_id and predicted_status of the most recent
+    prediction of each device. Uses DISTINCT ON on PostgreSQL, which walks the
+    predictions once in index order, and a row_number() window elsewhere.
+    """
+    ordering = (Prediction.device_id, Prediction.prediction_timestamp.desc(), Prediction.id.desc())
+    if db.get_bind().dialect.name == 'postgresql':
+        return (
+            select(Prediction.device_id, Prediction.predicted_status)
+            .distinct(Prediction.device_id)
+            .order_by(*ordering)
+            .subquery()
+        )
+    
+    ranked = select(
+        Prediction.device_id,
+        Prediction.predicted_status,
+        func.row_number().over(
+            partition_by=Prediction.device_id,
+            order_by=ordering[1:]
+        ).label("rank")
+    ).subquery()
+    
+    return select(ranked.c.device_id, ranked.c.predicted_status).where(ranked.c.rank == 1).subquery()
 
 def create_prediction(db: Session, prediction: PredictionCreate):
     db_prediction = Prediction(**prediction.dict())
     db.add(db_prediction)
+    db.flush()
+    crud_latest_state.record_predictions(db, [db_prediction])
     db.commit()
     db.refresh(db_prediction)
     return db_prediction
 
 def create_multiple_predictions(db: Session, predictions: list):
-    db_predictions = []
-    for pred in predictions:
-        db_prediction = Prediction(**pred.dict())
-        db_predictions.append(db_prediction)
+    """
+    Insert all predictions with a single executemany and get the generated
+    ids/timestamps back through RETURNING instead of refreshing every row.
+    Returns rows in the same order as the input list.
+    """
+    if not predictions:
+        return []
     
-    db.add_all(db_predictions)
+    table = Prediction.__table__
+    stmt = insert(table).returning(*table.c, sort_by_parameter_order=True)
+    db_predictions = db.execute(stmt, [pred.dict() for pred in predictions]).all()
+    crud_latest_state.record_predictions(db, db_predictions)
     db.commit()
-    for db_prediction in db_predictions:
-        db.refresh(db_prediction)
     return db_predictions
 
 def update_prediction(db: Session, prediction_id: int, prediction_update: PredictionUpdate):
@@ -38,6 +111,8 @@ def update_prediction(db: Session, prediction_id: int, prediction_update: Predic
         update_data = prediction_update.dict(exclude_unset=True)
         for key, value in update_data.items():
             setattr(db_prediction, key, value)
+        db.flush()
+        crud_latest_state.rebuild_latest_states(db, [db_prediction.device_id])
         db.commit()
         db.refresh(db_prediction)
     return db_prediction
@@ -46,5 +121,7 @@ def delete_prediction(db: Session, prediction_id: int):
     db_prediction = db.query(Prediction).filter(Prediction.id == prediction_id).first()
     if db_prediction:
         db.delete(db_prediction)
+        db.flush()
+        crud_latest_state.rebuild_latest_states(db, [db_prediction.device_id])
         db.commit()
     return db_prediction
\ No newline at end of file
@@ -0,0 +1,68 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set
+
+# Device ids remembered as registered (per worker process)
+DEVICE_CACHE_SIZE = int(os.getenv("DEVICE_CACHE_SIZE", "10000"))
+# Seconds an entry is trusted, bounding how long a device deleted through another worker is assumed to exist
+DEVICE_CACHE_TTL = float(os.getenv("DEVICE_CACHE_TTL", "300"))
+
+class DeviceRegistryCache:
+    """
+    Bounded LRU set of device ids known to exist in the devices table, with
+    entries expiring after ttl seconds. Only positive lookups are cached, so a
+    miss always goes to the database. The crud layer invalidates entries when
+    devices are created, updated or deleted in this process.
+    """
+
+    def __init__(self, max_size: int = DEVICE_CACHE_SIZE, ttl: float = DEVICE_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def known(self, device_ids: Iterable[str]) -> Set[str]:
+        """Which of device_ids are cached as registered"""
+        now = time.monotonic()
+        found = set()
+        with self._lock:
+            for device_id in set(device_ids):
+                expires = self._entries.get(device_id)
+                if expires is None:
+                    self.misses += 1
+                elif expires <= now:
+                    del self._entries[device_id]
+                    self.misses += 1
+                else:
+                    self._entries.move_to_end(device_id)
+                    found.add(device_id)
+                    self.hits += 1
+        return found
+
+    def add(self, device_ids: Iterable[str]):
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for device_id in device_ids:
+                self._entries[device_id] = expires
+                self._entries.move_to_end(device_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, device_ids: Optional[Iterable[str]] = None):
+        """Forget the given device ids, or every entry"""
+        with self._lock:
+            if device_ids is None:
+                self._entries.clear()
+                return
+            for device_id in device_ids:
+                self._entries.pop(device_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.max_size, 'hits': self.hits, 'misses': self.misses}
+
+device_registry = DeviceRegistryCache()
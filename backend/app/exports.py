@@ -0,0 +1,169 @@
+import csv
+import io
+import zlib
+from typing import Any, Iterable, Iterator, List, Sequence
+from fastapi.responses import StreamingResponse
+from sqlalchemy import DateTime, Float, Integer
+from sqlalchemy.sql import Select
+from app.database import SessionLocal
+from app.ingestion import import_pyarrow
+
+EXPORT_FORMATS = ('csv', 'parquet', 'arrow')
+
+# Number of rows fetched from the server-side cursor and written per chunk
+DEFAULT_CHUNK_SIZE = 5000
+
+def stream_rows(stmt: Select, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Sequence]:
+    """
+    Run a select on its own session and yield its rows in partitions of at
+    most chunk_size, through a server-side cursor where the driver supports it.
+    The session lives as long as the generator: request-scoped sessions from
+    get_db are closed before a streaming response body is sent.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(stream_results=True, yield_per=chunk_size))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+def iter_csv(columns: List[str], partitions: Iterable[Sequence]) -> Iterator[bytes]:
+    """
+    Encode a header and row partitions as CSV, one bytes chunk per partition
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode('utf-8')
+
+    for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode('utf-8')
+
+def iter_gzip(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """
+    Compress a stream of chunks into a single gzip member incrementally
+    """
+    compressor = zlib.compressobj(wbits=31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def csv_response(stmt: Select, columns: List[str], filename: str, gzip: bool = False,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE) -> StreamingResponse:
+    """
+    Stream the rows of stmt as a downloadable CSV (optionally gzipped)
+    without holding more than one chunk of rows in memory
+    """
+    body = iter_csv(columns, stream_rows(stmt, chunk_size))
+    media_type = 'text/csv'
+    if gzip:
+        body = iter_gzip(body)
+        media_type = 'application/gzip'
+        filename = f"{filename}.gz"
+
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Write-only file object that hands out what was written since the last
+    drain, so pyarrow writers can feed a streaming response
+    """
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+def arrow_schema(stmt: Select) -> Any:
+    """
+    Arrow schema matching the column types of a select, so every batch
+    (including all-NULL ones) is written with the same types
+    """
+    pa = import_pyarrow()
+    fields = []
+    for column in stmt.selected_columns:
+        if isinstance(column.type, DateTime):
+            arrow_type = pa.timestamp('us')
+        elif isinstance(column.type, Float):
+            arrow_type = pa.float64()
+        elif isinstance(column.type, Integer):
+            arrow_type = pa.int64()
+        else:
+            arrow_type = pa.string()
+        fields.append(pa.field(column.name, arrow_type))
+    return pa.schema(fields)
+
+def iter_columnar(schema: Any, partitions: Iterable[Sequence], file_format: str) -> Iterator[bytes]:
+    """
+    Encode row partitions as a Parquet file (one row group per partition) or
+    an Arrow IPC stream (one record batch per partition), yielding bytes as
+    each partition is written
+    """
+    pa = import_pyarrow()
+    sink = _ChunkSink()
+    if file_format == 'parquet':
+        writer = pa.parquet.ParquetWriter(sink, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+
+    try:
+        for rows in partitions:
+            # Transpose the rows once and build every column in a single call
+            columns = list(zip(*rows))
+            batch = pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            )
+            if file_format == 'parquet':
+                writer.write_batch(batch, row_group_size=len(rows))
+            else:
+                writer.write_batch(batch)
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+def export_response(stmt: Select, columns: List[str], filename: str, file_format: str = 'csv',
+                    gzip: bool = False, chunk_size: int = DEFAULT_CHUNK_SIZE) -> StreamingResponse:
+    """
+    Stream the rows of stmt as CSV, Parquet or Arrow IPC. filename is given
+    without an extension. gzip only applies to CSV, the columnar formats are
+    already compressed (Parquet) or meant to be read without decoding (Arrow).
+    """
+    if file_format == 'csv':
+        return csv_response(stmt, columns, f"{filename}.csv", gzip=gzip, chunk_size=chunk_size)
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{file_format}', expected one of {', '.join(EXPORT_FORMATS)}")
+
+    # Fails fast (before streaming) when pyarrow is missing
+    schema = arrow_schema(stmt)
+    body = iter_columnar(schema, stream_rows(stmt, chunk_size), file_format)
+    if file_format == 'parquet':
+        media_type, extension = 'application/vnd.apache.parquet', 'parquet'
+    else:
+        media_type, extension = 'application/vnd.apache.arrow.stream', 'arrows'
+
+    headers = {'Content-Disposition': f'attachment; filename="{filename}.{extension}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
@@ -0,0 +1,189 @@
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, BinaryIO, Dict, Iterator, List
+from sqlalchemy.orm import Session
+from app.crud import device_data as crud_device_data
+
+if TYPE_CHECKING:
+    # Imported where used: pandas takes a second to import and only uploads need it
+    import pandas as pd
+
+# Number of rows parsed, validated and inserted at a time
+DEFAULT_CHUNK_SIZE = 5000
+
+NUMERIC_COLUMNS = ['usage_hours', 'temperature', 'pressure', 'vibration']
+TEXT_COLUMNS = ['error_codes', 'maintenance_notes']
+# Columnar formats decoded with pyarrow (optional dependency)
+PARQUET_EXTENSIONS = ('.parquet',)
+ARROW_EXTENSIONS = ('.arrow', '.feather', '.ipc')
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx', '.xls') + PARQUET_EXTENSIONS + ARROW_EXTENSIONS
+UPLOAD_COLUMNS = NUMERIC_COLUMNS + ['error_count'] + TEXT_COLUMNS
+
+def is_supported_upload(filename: str) -> bool:
+    return filename.endswith(SUPPORTED_EXTENSIONS)
+
+def is_columnar_upload(filename: str) -> bool:
+    return filename.endswith(PARQUET_EXTENSIONS + ARROW_EXTENSIONS)
+
+def import_pyarrow():
+    """
+    Import pyarrow on first use so the API starts without it; only the
+    Parquet/Arrow formats need it
+    """
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Parquet and Arrow files require the pyarrow package")
+    return pyarrow
+
+def iter_upload_chunks(file_obj: BinaryIO, filename: str, chunksize: int = DEFAULT_CHUNK_SIZE) -> Iterator['pd.DataFrame']:
+    """
+    Parse an uploaded file into DataFrames of at most `chunksize` rows,
+    reading straight from the (spooled) file object
+    """
+    import pandas as pd
+
+    file_obj.seek(0)
+    if filename.endswith('.csv'):
+        with pd.read_csv(file_obj, chunksize=chunksize, encoding='utf-8') as reader:
+            for chunk in reader:
+                yield chunk
+    elif filename.endswith(('.xlsx', '.xls')):
+        # Workbooks cannot be parsed incrementally, only the inserts are chunked
+        df = pd.read_excel(file_obj)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+    else:
+        raise ValueError("Unsupported file format. Please upload CSV, Excel, Parquet or Arrow files.")
+
+def coerce_device_data_chunk(chunk: 'pd.DataFrame', device_id: str, timestamp: datetime) -> List[Dict[str, Any]]:
+    """
+    Validate and coerce a parsed chunk column-wise into device_data rows.
+    Unparseable numbers become NULL, missing error counts become 0 and
+    NaN error codes / maintenance notes become NULL.
+    """
+    import pandas as pd
+
+    n_rows = len(chunk)
+    columns = {}
+
+    for col in NUMERIC_COLUMNS:
+        if col in chunk.columns:
+            columns[col] = pd.to_numeric(chunk[col], errors='coerce').astype('float64').astype(object)
+        else:
+            columns[col] = pd.Series([None] * n_rows, index=chunk.index, dtype=object)
+
+    if 'error_count' in chunk.columns:
+        error_count = pd.to_numeric(chunk['error_count'], errors='coerce').fillna(0)
+        columns['error_count'] = error_count.astype('int64').astype(object)
+    else:
+        columns['error_count'] = pd.Series([0] * n_rows, index=chunk.index, dtype=object)
+
+    for col in TEXT_COLUMNS:
+        if col in chunk.columns:
+            columns[col] = chunk[col].astype(str).astype(object)
+            columns[col] = columns[col].where(chunk[col].notna(), None)
+        else:
+            columns[col] = pd.Series([None] * n_rows, index=chunk.index, dtype=object)
+
+    clean = pd.DataFrame(columns, index=chunk.index)
+    clean = clean.where(clean.notna(), None)
+    clean.insert(0, 'device_id', device_id)
+    clean.insert(1, 'timestamp', timestamp)
+
+    return clean.to_dict('records')
+
+def iter_arrow_batches(file_obj: BinaryIO, filename: str, batch_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[Any]:
+    """
+    Decode an uploaded Parquet or Arrow IPC file into pyarrow RecordBatches of
+    at most `batch_size` rows. Parquet files are read one batch at a time and
+    only the device_data columns present in the file are decoded.
+    """
+    pa = import_pyarrow()
+    file_obj.seek(0)
+    if filename.endswith(PARQUET_EXTENSIONS):
+        parquet_file = pa.parquet.ParquetFile(file_obj)
+        columns = [col for col in UPLOAD_COLUMNS if col in parquet_file.schema_arrow.names]
+        for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+            yield batch
+        return
+
+    # Arrow IPC: random-access file format (also Feather v2) or streaming format
+    try:
+        reader = pa.ipc.open_file(file_obj)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+    except pa.ArrowInvalid:
+        file_obj.seek(0)
+        batches = pa.ipc.open_stream(file_obj)
+    for batch in batches:
+        for start in range(0, batch.num_rows, batch_size):
+            yield batch.slice(start, batch_size)
+
+def coerce_arrow_batch(batch: Any, device_id: str, timestamp: datetime) -> List[Dict[str, Any]]:
+    """
+    Arrow counterpart of coerce_device_data_chunk: coerces every column with
+    Arrow compute kernels and only builds Python objects for the final rows.
+    Unparseable numbers and NaN become NULL, missing error counts become 0.
+    """
+    import pandas as pd
+
+    pa = import_pyarrow()
+    pc = pa.compute
+    n_rows = batch.num_rows
+    names = batch.schema.names
+    columns = {}
+
+    for col in NUMERIC_COLUMNS + ['error_count']:
+        if col not in names:
+            columns[col] = pa.nulls(n_rows, pa.float64())
+            continue
+        values = batch.column(col)
+        try:
+            values = pc.cast(values, pa.float64())
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+            # Text columns with unparseable entries
+            values = pa.array(pd.to_numeric(values.to_pandas(), errors='coerce'), type=pa.float64())
+        columns[col] = pc.if_else(pc.is_nan(values), pa.scalar(None, pa.float64()), values)
+
+    columns['error_count'] = pc.cast(pc.fill_null(columns['error_count'], 0.0), pa.int64(), safe=False)
+
+    for col in TEXT_COLUMNS:
+        if col in names:
+            columns[col] = pc.cast(batch.column(col), pa.string())
+        else:
+            columns[col] = pa.nulls(n_rows, pa.string())
+
+    values = [columns[col].to_pylist() for col in UPLOAD_COLUMNS]
+    return [
+        dict(zip(UPLOAD_COLUMNS, row), device_id=device_id, timestamp=timestamp)
+        for row in zip(*values)
+    ]
+
+def ingest_device_data_file(db: Session, device_id: str, file_obj: BinaryIO, filename: str,
+                            chunksize: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Stream an uploaded CSV/Excel/Parquet/Arrow file into device_data chunk by
+    chunk so memory stays bounded by `chunksize` regardless of the file size.
+    All chunks are committed together. Returns the number of rows inserted.
+    """
+    timestamp = datetime.utcnow()
+    rows_inserted = 0
+
+    if is_columnar_upload(filename):
+        chunks = (
+            coerce_arrow_batch(batch, device_id, timestamp)
+            for batch in iter_arrow_batches(file_obj, filename, batch_size=chunksize)
+        )
+    else:
+        chunks = (
+            coerce_device_data_chunk(chunk, device_id, timestamp)
+            for chunk in iter_upload_chunks(file_obj, filename, chunksize=chunksize)
+        )
+
+    for records in chunks:
+        rows_inserted += crud_device_data.insert_device_data_records(db, records, commit=False)
+
+    db.commit()
+    return rows_inserted
@@ -1,25 +1,50 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from app.api import users, devices, predictions, auth, ml, reports
-from app.database import engine, Base
+from app.api import users, devices, predictions, auth, ml, reports, dashboard, telemetry, profiles
+from app.concurrency import loop_lag_monitor, run_blocking
+from app.database import check_connection, dispose_async_engine, pool_status
+from app.metrics import CONTENT_TYPE, MetricsMiddleware, registry as metrics_registry
+from app.profiling import ProfilingMiddleware
+from app.ml.model import predictor
+from app.ml.training import training_jobs
+from app.telemetry import telemetry_writer
 import logging
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create tables with error handling
-try:
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables created successfully")
-except Exception as e:
-    logger.error(f"Error creating database tables: {e}")
-    logger.info("Application will start but database operations may fail")
+# The schema is managed by Alembic migrations (alembic upgrade head), nothing
+# touches the database at import time
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Report an unreachable database right away; /ready keeps failing until it answers
+    db_error = await run_blocking(check_connection)
+    if db_error is None:
+        logger.info("Database connection OK")
+    else:
+        logger.error(f"Database unreachable at startup: {db_error}")
+    # Load the model in the background so the worker accepts requests (and health checks) immediately
+    predictor.start_loading()
+    predictor.registry.start_watching()
+    telemetry_writer.start()
+    loop_lag_monitor.start()
+    yield
+    await loop_lag_monitor.stop()
+    # Flush buffered telemetry before the database engines go away
+    telemetry_writer.stop()
+    training_jobs.shutdown()
+    predictor.registry.stop_watching()
+    await dispose_async_engine()
 
 app = FastAPI(
     title="MediPredict API",
     description="Predictive Maintenance System for Healthcare Devices",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -31,6 +56,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in request profiling (X-Profile-Token header or PROFILE_SAMPLE_RATE)
+app.add_middleware(ProfilingMiddleware)
+# Request metrics, outermost so the measured latency includes every other middleware
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth.router, prefix="/api/auth", tags=["auth"])
 app.include_router(users.router, prefix="/api/users", tags=["users"])
@@ -38,6 +68,14 @@ app.include_router(devices.router, prefix="/api/devices", tags=["devices"])
 app.include_router(predictions.router, prefix="/api/predictions", tags=["predictions"])
 app.include_router(ml.router, prefix="/api/ml", tags=["ml"])
 app.include_router(reports.router, prefix="/api/reports", tags=["reports"])
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["dashboard"])
+app.include_router(telemetry.router, prefix="/api/telemetry", tags=["telemetry"])
+app.include_router(profiles.router, prefix="/api/admin/profiles", tags=["admin"])
+
+# Process-level stats exported next to the request metrics
+metrics_registry.stats("db_pool", "Connection pool occupancy and checkout metrics", pool_status, labelname="pool")
+metrics_registry.stats("telemetry_writer", "Telemetry write-behind buffer", telemetry_writer.stats)
+metrics_registry.stats("event_loop", "Event loop lag probes", loop_lag_monitor.stats)
 
 @app.get("/")
 async def root():
@@ -45,4 +83,46 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
\ No newline at end of file
+    return {"status": "healthy"}
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Whether this worker can serve traffic: the database answers and the model
+    finished loading. Responds 503 until then, and while the model file fails
+    to load. A missing model file counts as ready: nothing has been trained
+    yet, the rest of the API works and prediction requests report that no
+    model is available until one is trained.
+    """
+    db_error = await run_blocking(check_connection)
+    ready = db_error is None and predictor.load_state in ("loaded", "missing")
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "database": "ok" if db_error is None else db_error,
+        "model": predictor.load_state,
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+@app.get("/health/db-pool")
+async def db_pool_health():
+    """
+    Connection pool occupancy and checkout wait metrics of this worker
+    """
+    pools = pool_status()
+    exhausted = any(pool.get('exhausted') for pool in pools.values())
+    return {"status": "exhausted" if exhausted else "ok", "pools": pools}
+
+@app.get("/health/event-loop")
+async def event_loop_health():
+    """
+    Event loop lag probes of this worker: stalls mean blocking work ran on the loop
+    """
+    stats = loop_lag_monitor.stats()
+    return {"status": "stalled" if stats['last_lag_seconds'] > loop_lag_monitor.threshold else "ok", **stats}
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """
+    Metrics of this worker in the Prometheus text format
+    """
+    return Response(content=metrics_registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,406 @@
+import bisect
+import contextvars
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Requests executing one SELECT shape this many times are logged and counted as suspected N+1 queries
+DB_N_PLUS_ONE_THRESHOLD = int(os.getenv("DB_N_PLUS_ONE_THRESHOLD", "10"))
+# Add X-DB-Queries, X-DB-Time-Ms and X-DB-Repeated-Statements headers to every response (debugging only)
+DB_DEBUG_HEADERS = os.getenv("DB_DEBUG_HEADERS", "false").lower() in ("1", "true", "yes")
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow exports
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Payload size buckets in bytes
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+# Database statements per request
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+class Counter(_Metric):
+    """Monotonically increasing value per label set"""
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values
+        ]
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down per label set. With a callback the values
+    are read when the registry is rendered (callback returns {label values: value}).
+    """
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 callback: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self.callback = callback
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def collect(self) -> List[str]:
+        if self.callback is not None:
+            values = sorted((tuple(str(v) for v in key), value) for key, value in self.callback().items())
+        else:
+            with self._lock:
+                values = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values if value is not None
+        ]
+
+class Histogram(_Metric):
+    """Observations counted into cumulative buckets per label set, with their sum and count"""
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # Per label set: [per-bucket counts..., sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * len(self.buckets) + [0.0]
+            state[index] += 1
+            state[-1] += value
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return int(sum(state[:-1])) if state else 0
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            values = sorted((key, list(state)) for key, state in self._values.items())
+        lines = self.header()
+        for key, state in values:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, state[:-1]):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+class StatsCollector:
+    """
+    Exports the numeric values of a stats() dict as gauges named
+    <name>_<key>, booleans as 0/1. With a labelname the callback returns one
+    stats dict per label value (e.g. per connection pool).
+    """
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], Dict[str, Any]],
+                 labelname: Optional[str] = None):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelname = labelname
+
+    def collect(self) -> List[str]:
+        stats = self.callback()
+        groups = sorted(stats.items()) if self.labelname else [(None, stats)]
+        samples: Dict[str, List[str]] = {}
+        for label, values in groups:
+            labels = _format_labels((self.labelname,), (label,)) if self.labelname else ""
+            for key, value in values.items():
+                if isinstance(value, bool):
+                    value = int(value)
+                if isinstance(value, (int, float)):
+                    samples.setdefault(key, []).append(f"{self.name}_{key}{labels} {_format_value(value)}")
+        lines = []
+        for key in sorted(samples):
+            lines.append(f"# HELP {self.name}_{key} {self.documentation} ({key})")
+            lines.append(f"# TYPE {self.name}_{key} gauge")
+            lines.extend(samples[key])
+        return lines
+
+class RateMeter:
+    """Events per second over a sliding window, for values read without a Prometheus server"""
+
+    def __init__(self, window: float = 60.0):
+        self.window = window
+        self._events = deque()
+        self._lock = threading.Lock()
+
+    def add(self, amount: float):
+        now = time.monotonic()
+        with self._lock:
+            self._events.append((now, amount))
+            self._expire(now)
+
+    def rate(self) -> float:
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            return sum(amount for _, amount in self._events) / self.window
+
+    def _expire(self, now: float):
+        while self._events and self._events[0][0] < now - self.window:
+            self._events.popleft()
+
+class MetricsRegistry:
+    """Metrics of this worker process, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric, replace: bool = False):
+        with self._lock:
+            if metric.name in self._metrics and not replace:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def stats(self, name: str, documentation: str, callback: Callable[[], Dict[str, Any]],
+              labelname: Optional[str] = None) -> StatsCollector:
+        # Replaces an earlier collector of the same name, the callbacks belong to the app module
+        return self.register(StatsCollector(name, documentation, callback, labelname), replace=True)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.collect())
+        return "\n".join(lines) + "\n"
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route template, method and status code", ("method", "route", "status"))
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "Time from receiving a request to sending its last body chunk", ("method", "route"))
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "Requests currently being handled")
+HTTP_REQUEST_SIZE = registry.histogram(
+    "http_request_size_bytes", "Request body sizes (Content-Length)", ("method", "route"), SIZE_BUCKETS)
+HTTP_RESPONSE_SIZE = registry.histogram(
+    "http_response_size_bytes", "Response body sizes as sent", ("method", "route"), SIZE_BUCKETS)
+DB_TIME_PER_REQUEST = registry.histogram(
+    "http_request_db_seconds", "Time spent executing database statements per request", ("method", "route"))
+DB_QUERIES_PER_REQUEST = registry.histogram(
+    "http_request_db_queries", "Database statements executed per request", ("method", "route"), COUNT_BUCKETS)
+MODEL_INFERENCE = registry.histogram(
+    "model_inference_seconds", "Model inference time by stage (preprocess, predict_proba, explanation)", ("stage",))
+INGEST_ROWS = registry.counter("ingest_rows_total", "Device readings written to device_data")
+INGEST_RATE = RateMeter()
+registry.gauge("ingest_rows_per_second", "Device readings written per second over the last minute",
+               callback=lambda: {(): INGEST_RATE.rate()})
+
+def record_ingest(rows: int):
+    INGEST_ROWS.inc(rows)
+    INGEST_RATE.add(rows)
+
+DB_SLOW_QUERIES = registry.counter("db_slow_queries_total", "Statements slower than DB_SLOW_QUERY_SECONDS")
+DB_N_PLUS_ONE = registry.counter(
+    "db_n_plus_one_requests_total", "Requests repeating a SELECT shape DB_N_PLUS_ONE_THRESHOLD times or more",
+    ("method", "route"))
+
+_SQL_WHITESPACE = re.compile(r"\s+")
+# Parameter lists such as IN (?, ?, ?) whose length varies with the bound values
+_SQL_PARAMETER_LIST = re.compile(r"\(\s*(\?|%s|%\(\w+\)s|\$\d+|:\w+)(\s*,\s*(\?|%s|%\(\w+\)s|\$\d+|:\w+))*\s*\)")
+_SQL_NUMBER = re.compile(r"\b\d+\b")
+_SQL_READ = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+
+def statement_shape(statement: str) -> str:
+    """A statement with whitespace normalized, numbers as ? and parameter lists as (?)"""
+    shape = _SQL_WHITESPACE.sub(" ", statement).strip()
+    shape = _SQL_NUMBER.sub("?", shape)
+    return _SQL_PARAMETER_LIST.sub("(?)", shape)
+
+class RequestStats:
+    """Per-request accumulators filled by instrumentation below the HTTP layer"""
+    __slots__ = ('db_seconds', 'db_queries', 'statements')
+
+    def __init__(self):
+        self.db_seconds = 0.0
+        self.db_queries = 0
+        # Executions per SELECT shape
+        self.statements: Dict[str, int] = {}
+
+    def record_query(self, statement: str, elapsed: float, executemany: bool = False):
+        self.db_seconds += elapsed
+        self.db_queries += 1
+        # Only single-row reads hint at N+1 loops; executemany batches and chunked
+        # inserts/upserts repeat their statement on purpose
+        if executemany or not _SQL_READ.match(statement):
+            return
+        shape = statement_shape(statement)
+        self.statements[shape] = self.statements.get(shape, 0) + 1
+
+    def repeated_statements(self, threshold: int) -> Dict[str, int]:
+        """SELECT shapes executed at least threshold times, the signature of an N+1 pattern"""
+        return {shape: count for shape, count in self.statements.items() if count >= threshold}
+
+# Content type of the Prometheus text exposition format rendered by MetricsRegistry
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Set by the metrics middleware for the duration of a request; worker threads
+# started from the request (run_blocking, sync endpoints) see the same object
+current_request: contextvars.ContextVar[Optional[RequestStats]] = contextvars.ContextVar("current_request", default=None)
+
+class _Timer:
+    def __init__(self, histogram: Histogram, labels: Dict[str, str]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+def time_inference(stage: str) -> _Timer:
+    """Context manager observing the duration of a model inference stage"""
+    return _Timer(MODEL_INFERENCE, {'stage': stage})
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request counts, latency, in-flight requests,
+    payload sizes and per-request database time, labelled by route template
+    (e.g. /api/devices/{device_id}) so path parameters do not explode the
+    label space. Requests repeating a SELECT shape DB_N_PLUS_ONE_THRESHOLD
+    times are logged and counted as suspected N+1 queries.
+    """
+
+    def __init__(self, app, excluded_paths: Iterable[str] = ("/metrics",)):
+        self.app = app
+        self.excluded_paths = set(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        start = time.perf_counter()
+        status = 500
+        response_bytes = 0
+        HTTP_IN_FLIGHT.inc()
+
+        async def send_wrapper(message):
+            nonlocal status, response_bytes
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if DB_DEBUG_HEADERS:
+                    message["headers"] = list(message.get("headers", [])) + self._debug_headers(stats)
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            current_request.reset(token)
+            route = scope.get("route")
+            labels = {'method': scope["method"], 'route': getattr(route, "path", None) or "<unmatched>"}
+            HTTP_REQUESTS.inc(status=status, **labels)
+            HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, **labels)
+            HTTP_RESPONSE_SIZE.observe(response_bytes, **labels)
+            content_length = dict(scope["headers"]).get(b"content-length")
+            if content_length is not None and content_length.isdigit():
+                HTTP_REQUEST_SIZE.observe(int(content_length), **labels)
+            DB_TIME_PER_REQUEST.observe(stats.db_seconds, **labels)
+            DB_QUERIES_PER_REQUEST.observe(stats.db_queries, **labels)
+            repeated = stats.repeated_statements(DB_N_PLUS_ONE_THRESHOLD)
+            if repeated:
+                DB_N_PLUS_ONE.inc(**labels)
+                for shape, count in repeated.items():
+                    logger.warning(f"Suspected N+1 queries in {labels['method']} {labels['route']}: "
+                                   f"{count} x {shape[:500]}")
+
+    @staticmethod
+    def _debug_headers(stats: RequestStats) -> List[Tuple[bytes, bytes]]:
+        # Statements still running (e.g. in a streamed body) are not included
+        return [
+            (b"x-db-queries", str(stats.db_queries).encode()),
+            (b"x-db-time-ms", f"{stats.db_seconds * 1000:.1f}".encode()),
+            (b"x-db-repeated-statements", str(len(stats.repeated_statements(DB_N_PLUS_ONE_THRESHOLD))).encode()),
+        ]
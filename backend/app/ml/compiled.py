@@ -0,0 +1,105 @@
+import numpy as np
+from typing import Any, Dict, Mapping, Sequence, Union
+
+class CompiledForest:
+    """
+    A fitted StandardScaler + RandomForestClassifier flattened into NumPy
+    node arrays for low-overhead inference on plain arrays.
+
+    All trees are concatenated into one node table (split feature, threshold,
+    left/right child, leaf class distribution). Leaves point to
+    themselves, so a batch descends every tree in lockstep with one gather
+    per depth level instead of one Cython call per tree and method.
+    Probabilities are computed once and labels derived from them.
+
+    The arithmetic mirrors sklearn step by step so results are bit-identical
+    to scaler.transform followed by model.predict_proba / model.predict:
+    scaling in float64, thresholds compared against float32 features, per-tree
+    leaf distributions accumulated in tree order, then divided by the number
+    of trees.
+    """
+
+    def __init__(self, model: Any, scaler: Any, feature_names: Sequence[str]):
+        self.feature_names = list(feature_names)
+        self.classes = model.classes_
+        self.n_trees = len(model.estimators_)
+
+        self.mean = np.asarray(scaler.mean_, dtype=np.float64) if scaler.with_mean else None
+        self.scale = np.asarray(scaler.scale_, dtype=np.float64) if scaler.with_std else None
+
+        features, thresholds, lefts, rights, leaf_values, roots = [], [], [], [], [], []
+        offset = 0
+        self.max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(tree.node_count)
+            is_leaf = tree.children_left < 0
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            # Leaves always "go left" into themselves
+            thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+            # Class fractions per node, what DecisionTreeClassifier.predict_proba returns
+            leaf_values.append(tree.value[:, 0, :model.n_classes_])
+
+            roots.append(offset)
+            offset += tree.node_count
+            self.max_depth = max(self.max_depth, tree.max_depth)
+
+        self.feature = np.concatenate(features).astype(np.intp)
+        self.threshold = np.concatenate(thresholds)
+        self.left = np.concatenate(lefts).astype(np.intp)
+        self.right = np.concatenate(rights).astype(np.intp)
+        self.leaf_values = np.concatenate(leaf_values)
+        self.roots = np.asarray(roots, dtype=np.intp)
+        self.is_leaf = self.left == np.arange(offset)
+
+    def row(self, values: Union[Mapping[str, Any], Sequence[Any]]) -> np.ndarray:
+        """
+        One feature row from a mapping keyed by feature name or a sequence in
+        feature order; missing or None values are 0 as in preprocessing
+        """
+        if isinstance(values, Mapping):
+            values = [values.get(name) for name in self.feature_names]
+        return np.array([[0.0 if value is None else value for value in values]], dtype=np.float64)
+
+    def transform(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        if self.mean is not None:
+            X = X - self.mean
+        if self.scale is not None:
+            X = X / self.scale
+        return X
+
+    def predict_proba_scaled(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities of already scaled rows"""
+        # Trees split on float32 features (compared against float64 thresholds)
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[:, np.newaxis]
+
+        nodes = np.broadcast_to(self.roots, (len(X), self.n_trees))
+        for depth in range(self.max_depth):
+            go_left = X[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            # Most paths end well above the deepest leaf
+            if depth % 4 == 3 and self.is_leaf[nodes].all():
+                break
+
+        # cumsum accumulates strictly in tree order, like the forest's running sum
+        proba = np.cumsum(self.leaf_values[nodes], axis=1)[:, -1]
+        return proba / self.n_trees
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities of raw (unscaled) feature rows"""
+        return self.predict_proba_scaled(self.transform(X))
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        """Class labels of raw feature rows"""
+        return self.classes.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def predict_one(self, values: Union[Mapping[str, Any], Sequence[Any]]) -> Dict[Any, float]:
+        """Class probabilities of a single reading given as a mapping or sequence"""
+        proba = self.predict_proba(self.row(values))[0]
+        return dict(zip(self.classes.tolist(), proba.tolist()))
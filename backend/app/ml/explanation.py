@@ -0,0 +1,207 @@
+import numpy as np
+from typing import Any, Dict, List, Optional
+
+CLASS_NAMES = ['healthy', 'at_risk', 'needs_maintenance']
+
+# Features whose importance exceeds this are considered significant contributors
+SIGNIFICANT_IMPORTANCE = 0.15
+
+def _rule_hits(feature_name: str, values: np.ndarray) -> np.ndarray:
+    if feature_name == 'error_count':
+        return values > 5
+    if feature_name == 'temperature':
+        return values > 40
+    if feature_name == 'vibration':
+        return values > 1.0
+    if feature_name == 'pressure':
+        return (values < 80) | (values > 140)
+    if feature_name == 'usage_hours':
+        return values > 5000
+    return np.zeros(len(values), dtype=bool)
+
+def _rule_message(feature_name: str, value: float) -> str:
+    if feature_name == 'error_count':
+        return f"→ High error count ({int(value)}) detected - investigate error logs."
+    if feature_name == 'temperature':
+        return f"→ Elevated temperature ({value:.1f}°C) - check cooling system."
+    if feature_name == 'vibration':
+        return f"→ Abnormal vibration ({value:.2f} Hz) - check mechanical components."
+    if feature_name == 'pressure':
+        return f"→ Pressure outside normal range ({value:.1f} PSI) - inspect pressure system."
+    return f"→ High usage hours ({int(value)}) - consider scheduled maintenance."
+
+def _feature_display(feature_name: str, value: float) -> str:
+    if feature_name == 'usage_hours':
+        return f'Usage Hours ({int(value)} hrs)'
+    if feature_name == 'temperature':
+        return f'Temperature ({value:.1f}°C)'
+    if feature_name == 'pressure':
+        return f'Pressure ({value:.1f} PSI)'
+    if feature_name == 'vibration':
+        return f'Vibration ({value:.2f} Hz)'
+    if feature_name == 'error_count':
+        return f'Error Count ({int(value)})'
+    return feature_name
+
+class ExplanationBatch:
+    """
+    Explanations for a whole batch of predictions held as arrays.
+    Probabilities, factor rankings and recommendation rule hits are computed
+    once for the batch; text is only formatted when records are requested.
+    """
+
+    def __init__(self, feature_names: List[str], feature_values: np.ndarray, probabilities: np.ndarray,
+                 model_classes: np.ndarray, importances: np.ndarray,
+                 contributions: Optional[np.ndarray] = None):
+        """
+        contributions are optional per-sample attributions of shape
+        (rows, features, model classes). With them factors are ranked per row by
+        how much they pushed the prediction towards the predicted class;
+        without them every row is ranked by global feature importance.
+        """
+        self.feature_names = list(feature_names)
+        self.feature_values = feature_values
+        n_rows = len(feature_values)
+
+        # Spread the model's class columns over all three known classes
+        self.probabilities = np.zeros((n_rows, len(CLASS_NAMES)))
+        known_classes = [int(c) for c in model_classes if 0 <= int(c) < len(CLASS_NAMES)]
+        self.probabilities[:, known_classes] = probabilities[:, :len(known_classes)]
+        self._class_order = [CLASS_NAMES[c] for c in known_classes] + \
+            [name for idx, name in enumerate(CLASS_NAMES) if idx not in known_classes]
+
+        predicted_idx = np.argmax(probabilities, axis=1)
+        predicted = np.asarray(model_classes)[predicted_idx]
+        self.labels = np.array([CLASS_NAMES[int(c)] if 0 <= int(c) < len(CLASS_NAMES) else 'unknown' for c in predicted])
+        self.confidence = probabilities.max(axis=1)
+        self.importances = np.asarray(importances, dtype=float)
+
+        if contributions is not None:
+            # Contribution of every feature towards the predicted class of its row
+            self.contributions = contributions[np.arange(n_rows), :, predicted_idx]
+            self.factor_order = np.argsort(-self.contributions, axis=1, kind='stable')
+            significant = (self.contributions > 0) & (self.importances > SIGNIFICANT_IMPORTANCE)
+        else:
+            # Global importances rank the factors identically for every row
+            self.contributions = None
+            self.factor_order = np.broadcast_to(
+                np.argsort(-self.importances, kind='stable'), (n_rows, len(self.feature_names))
+            )
+            significant = np.broadcast_to(self.importances > SIGNIFICANT_IMPORTANCE, (n_rows, len(self.feature_names)))
+
+        # Rules fire for a row when one of its top 2 factors is significant and out of range
+        rule_hits = np.column_stack([
+            _rule_hits(name, feature_values[:, idx]) for idx, name in enumerate(self.feature_names)
+        ]) if n_rows else np.zeros((0, len(self.feature_names)), dtype=bool)
+        rule_hits &= significant
+        top_two = np.zeros_like(rule_hits)
+        np.put_along_axis(top_two, self.factor_order[:, :2], True, axis=1)
+        self.rule_hits = rule_hits & top_two
+
+    def __len__(self) -> int:
+        return len(self.feature_values)
+
+    def top_factors(self, idx: int, count: int = 3) -> List[str]:
+        return [self.feature_names[f] for f in self.factor_order[idx, :count]]
+
+    def triggered_rules(self, idx: int) -> List[str]:
+        return [self.feature_names[f] for f in self.factor_order[idx, :2] if self.rule_hits[idx, f]]
+
+    def recommendation(self, idx: int) -> str:
+        """Generate a detailed recommendation based on prediction and feature analysis"""
+        prediction = self.labels[idx]
+        recommendations = []
+
+        if prediction == 'healthy':
+            recommendations.append("✓ Device is operating within normal parameters.")
+            if self.confidence[idx] < 0.7:
+                recommendations.append("⚠ However, confidence is moderate. Monitor closely.")
+        elif prediction == 'at_risk':
+            recommendations.append("⚠ Device showing early warning signs.")
+            recommendations.append("→ Schedule preventive inspection within 2-4 weeks.")
+        else:  # needs_maintenance
+            recommendations.append("🔴 Critical: Device requires immediate attention.")
+            recommendations.append("→ Schedule maintenance within 24-48 hours.")
+
+        for f in self.factor_order[idx, :2]:
+            if self.rule_hits[idx, f]:
+                recommendations.append(_rule_message(self.feature_names[f], float(self.feature_values[idx, f])))
+
+        return "\n".join(recommendations)
+
+    def explanation(self, idx: int) -> str:
+        """Create a human-readable explanation of the prediction"""
+        explanation_parts = [
+            f"The model predicts this device is '{self.labels[idx]}' with {self.confidence[idx]*100:.1f}% confidence."
+        ]
+
+        if self.feature_names:
+            explanation_parts.append("\nKey factors influencing this prediction:")
+            for rank, f in enumerate(self.factor_order[idx, :3], 1):
+                name = self.feature_names[f]
+                weight = self.contributions[idx, f] if self.contributions is not None else self.importances[f]
+                explanation_parts.append(
+                    f"{rank}. {_feature_display(name, float(self.feature_values[idx, f]))} - "
+                    f"{weight * 100:.1f}% contribution to prediction"
+                )
+
+        return "\n".join(explanation_parts)
+
+    def to_records(self, include_text: bool = True) -> List[Dict[str, Any]]:
+        """One dict per prediction, the response shape of predict_with_explanation"""
+        probabilities = self.probabilities.tolist()
+        confidence = self.confidence.tolist()
+        values = self.feature_values.tolist()
+        importances = self.importances.tolist()
+        contributions = self.contributions.tolist() if self.contributions is not None else None
+        class_index = {name: idx for idx, name in enumerate(CLASS_NAMES)}
+
+        results = []
+        for idx in range(len(self)):
+            order = self.factor_order[idx].tolist()
+            result = {
+                'prediction': str(self.labels[idx]),
+                'confidence': confidence[idx],
+                'class_probabilities': {
+                    name: probabilities[idx][class_index[name]] for name in self._class_order
+                },
+                'feature_contributions': {
+                    self.feature_names[f]: self._feature_contribution(f, importances, contributions, values, idx)
+                    for f in order
+                },
+            }
+            if include_text:
+                result['recommendation'] = self.recommendation(idx)
+                result['explanation'] = self.explanation(idx)
+            result['top_factors'] = [self.feature_names[f] for f in order[:3]]
+            results.append(result)
+
+        return results
+
+    def _feature_contribution(self, f: int, importances: List[float], contributions: Optional[List[List[float]]],
+                              values: List[List[float]], idx: int) -> Dict[str, float]:
+        if contributions is None:
+            return {'importance': importances[f], 'value': values[idx][f]}
+        return {'importance': importances[f], 'contribution': contributions[idx][f], 'value': values[idx][f]}
+
+    def to_columnar(self, include_text: bool = False) -> Dict[str, Any]:
+        """Column-oriented response: one list per field instead of one dict per prediction"""
+        columns = {
+            'prediction': self.labels.tolist(),
+            'confidence': self.confidence.tolist(),
+            'class_probabilities': {
+                name: self.probabilities[:, idx].tolist() for idx, name in enumerate(CLASS_NAMES)
+            },
+            'feature_names': self.feature_names,
+            'feature_values': self.feature_values.tolist(),
+            'feature_importance': self.importances.tolist(),
+            'feature_contributions': self.contributions.tolist() if self.contributions is not None else None,
+            'top_factors': [
+                [self.feature_names[f] for f in order] for order in self.factor_order[:, :3].tolist()
+            ],
+            'triggered_rules': [self.triggered_rules(idx) for idx in range(len(self))],
+        }
+        if include_text:
+            columns['recommendation'] = [self.recommendation(idx) for idx in range(len(self))]
+            columns['explanation'] = [self.explanation(idx) for idx in range(len(self))]
+        return columns
@@ -0,0 +1,250 @@
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Values of a single reading, the features every model uses
+RAW_FEATURES = ['usage_hours', 'temperature', 'pressure', 'vibration', 'error_count']
+# Signals summarized over each device's recent readings
+TREND_SIGNALS = ['temperature', 'pressure', 'vibration', 'error_count']
+TREND_STATS = ['mean', 'slope', 'ewma', 'delta']
+
+# Readings per device a trend window covers (the reading itself and the ones before it)
+FEATURE_WINDOW = int(os.getenv("FEATURE_WINDOW", "8"))
+# Weight of the newest reading in the exponentially weighted mean
+FEATURE_EWMA_ALPHA = float(os.getenv("FEATURE_EWMA_ALPHA", "0.3"))
+# Devices whose windows are kept in memory for online scoring (per worker process)
+FEATURE_STORE_MAX_DEVICES = int(os.getenv("FEATURE_STORE_MAX_DEVICES", "10000"))
+
+def trend_feature_names(signals: Sequence[str] = TREND_SIGNALS) -> List[str]:
+    return [f"{signal}_{stat}" for signal in signals for stat in TREND_STATS]
+
+TREND_FEATURES = trend_feature_names()
+
+def model_feature_names(scaler: Any) -> List[str]:
+    """
+    Feature columns a model was fitted on, in order, as recorded by its
+    scaler; artifacts fitted without column names use RAW_FEATURES
+    """
+    names = getattr(scaler, 'feature_names_in_', None)
+    return [str(name) for name in names] if names is not None else list(RAW_FEATURES)
+
+def window_features(windows: np.ndarray, alpha: float = FEATURE_EWMA_ALPHA) -> np.ndarray:
+    """
+    Trend features of a stack of windows shaped (n, window, signals), oldest
+    reading first, NaN for missing values. Returns (n, signals * 4) columns
+    in TREND_FEATURES order: per signal the mean, least-squares slope per
+    reading, EWMA and change from the previous reading.
+
+    Missing values are filled from the nearest earlier reading in the window,
+    leading ones from the first present value and all-missing signals are 0.
+    Every statistic is a fixed sequence of elementwise operations over the
+    window positions, so a row gets bit-identical results whether it is
+    computed alone (online) or stacked with millions of others (training).
+    """
+    n, window, n_signals = windows.shape
+    positions = np.arange(window, dtype=np.float64)
+    centered = positions - positions.mean()
+    slope_weights = centered / (centered * centered).sum() if window > 1 else np.zeros(window)
+
+    columns = []
+    for signal in range(n_signals):
+        values = [windows[:, k, signal].astype(np.float64) for k in range(window)]
+        for k in range(1, window):
+            values[k] = np.where(np.isnan(values[k]), values[k - 1], values[k])
+        for k in range(window - 2, -1, -1):
+            values[k] = np.where(np.isnan(values[k]), values[k + 1], values[k])
+        values = [np.nan_to_num(column, nan=0.0) for column in values]
+
+        total = values[0]
+        slope = slope_weights[0] * values[0]
+        ewma = values[0]
+        for k in range(1, window):
+            total = total + values[k]
+            slope = slope + slope_weights[k] * values[k]
+            ewma = alpha * values[k] + (1.0 - alpha) * ewma
+        delta = values[-1] - values[-2] if window > 1 else np.zeros(n)
+        columns.extend([total / window, slope, ewma, delta])
+
+    if not columns:
+        return np.empty((n, 0))
+    return np.column_stack(columns)
+
+def batch_trend_features(device_ids: Sequence[str], values: np.ndarray, window: int = FEATURE_WINDOW,
+                         alpha: float = FEATURE_EWMA_ALPHA) -> np.ndarray:
+    """
+    Trend features of every reading from the window ending at it. values is
+    (n, len(TREND_SIGNALS)) with rows grouped by device and in time order
+    within a device (timestamp, then id), as the training query returns them.
+    Each device's history is preceded by window - 1 missing readings, the
+    state a new device starts from online.
+    """
+    n = len(values)
+    if n == 0:
+        return np.empty((0, len(TREND_FEATURES)))
+
+    device_ids = np.asarray(device_ids, dtype=object)
+    starts = np.ones(n, dtype=bool)
+    starts[1:] = device_ids[1:] != device_ids[:-1]
+    # Row i moves past the padding of its own and every earlier device
+    padded_positions = np.arange(n) + (window - 1) * np.cumsum(starts)
+
+    padded = np.full((n + (window - 1) * int(starts.sum()), values.shape[1]), np.nan)
+    padded[padded_positions] = values
+    # (rows, signals, window) view without copying, one window per padded row; the
+    # features of windows ending in padding are computed too and dropped afterwards
+    windows = sliding_window_view(padded, window, axis=0).transpose(0, 2, 1)
+    return window_features(windows, alpha)[padded_positions - (window - 1)]
+
+class DeviceWindow:
+    """
+    Ring buffer of a device's last `window` readings (TREND_SIGNALS values),
+    with the timestamp and reading count it reflects
+    """
+
+    def __init__(self, window: int = FEATURE_WINDOW):
+        self.values = np.full((window, len(TREND_SIGNALS)), np.nan)
+        self.head = 0
+        self.last_timestamp: Optional[datetime] = None
+        self.reading_count = 0
+
+    def push(self, timestamp: datetime, row: Sequence[Optional[float]]):
+        self.values[self.head] = [np.nan if value is None else value for value in row]
+        self.head = (self.head + 1) % len(self.values)
+        self.last_timestamp = timestamp
+        self.reading_count += 1
+
+    def ordered(self) -> np.ndarray:
+        """The window, oldest reading first"""
+        return np.roll(self.values, -self.head, axis=0)
+
+def _field(reading: Any, name: str) -> Any:
+    return reading[name] if isinstance(reading, dict) else getattr(reading, name)
+
+class OnlineFeatureStore:
+    """
+    Trend-feature windows of recently scored devices, kept in memory and
+    advanced in O(1) per ingested reading. A window is trusted only while its
+    reading count matches the device's device_latest_state row; otherwise
+    (readings ingested by another worker, edited or out-of-order readings,
+    first use) it is reloaded from the device's last readings, which yields
+    the same features as the batch path.
+    """
+
+    def __init__(self, window: int = FEATURE_WINDOW, alpha: float = FEATURE_EWMA_ALPHA,
+                 max_devices: int = FEATURE_STORE_MAX_DEVICES):
+        self.window = window
+        self.alpha = alpha
+        self.max_devices = max_devices
+        self._windows: "OrderedDict[str, DeviceWindow]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def observe(self, readings: Iterable[Any]):
+        """
+        Advance the windows of tracked devices with newly stored readings
+        (column dicts or rows). Untracked devices are ignored.
+        """
+        if not self._windows:
+            return
+        by_device: Dict[str, List[Any]] = {}
+        for reading in readings:
+            by_device.setdefault(_field(reading, 'device_id'), []).append(reading)
+
+        with self._lock:
+            for device_id, device_readings in by_device.items():
+                state = self._windows.get(device_id)
+                if state is None:
+                    continue
+                device_readings.sort(key=lambda reading: _field(reading, 'timestamp'))
+                if state.last_timestamp is not None and _field(device_readings[0], 'timestamp') < state.last_timestamp:
+                    # Lands inside the window, rebuild it from the database when next needed
+                    del self._windows[device_id]
+                    continue
+                for reading in device_readings:
+                    state.push(_field(reading, 'timestamp'), [_field(reading, signal) for signal in TREND_SIGNALS])
+
+    def invalidate(self, device_ids: Optional[Iterable[str]] = None):
+        with self._lock:
+            if device_ids is None:
+                self._windows.clear()
+                return
+            for device_id in device_ids:
+                self._windows.pop(device_id, None)
+
+    def trend_features(self, db, states: Sequence[Any]) -> np.ndarray:
+        """
+        Trend features of the latest reading of each device_latest_state row
+        in states, in TREND_FEATURES order. Stale or missing windows are loaded
+        with one query for all of them, on db or (if None) a session of its own.
+        """
+        windows = {}
+        stale = []
+        with self._lock:
+            for state in states:
+                window = self._windows.get(state.device_id)
+                if window is not None and window.reading_count == state.reading_count:
+                    self._windows.move_to_end(state.device_id)
+                    windows[state.device_id] = window.ordered()
+                else:
+                    stale.append(state)
+
+        if stale:
+            recent = self._recent_readings(db, [state.device_id for state in stale], self.window)
+            loaded = {state.device_id: DeviceWindow(self.window) for state in stale}
+            for reading in recent:
+                loaded[reading.device_id].push(reading.timestamp, [getattr(reading, signal) for signal in TREND_SIGNALS])
+            with self._lock:
+                for state in stale:
+                    window = loaded[state.device_id]
+                    window.reading_count = state.reading_count
+                    self._windows[state.device_id] = window
+                    windows[state.device_id] = window.ordered()
+                while len(self._windows) > self.max_devices:
+                    self._windows.popitem(last=False)
+
+        if not states:
+            return np.empty((0, len(TREND_FEATURES)))
+        return window_features(np.stack([windows[state.device_id] for state in states]), self.alpha)
+
+    def reading_trend_features(self, db, readings: Sequence[Any]) -> np.ndarray:
+        """
+        Trend features of readings that are not stored (column dicts or objects
+        with device_id and the TREND_SIGNALS), in TREND_FEATURES order. Each
+        reading ends a window after its device's last stored readings, as if it
+        were the next one ingested; devices without history start from missing
+        readings. One query for all devices, on db or a session of its own.
+        """
+        if not len(readings):
+            return np.empty((0, len(TREND_FEATURES)))
+
+        history: Dict[str, List[List[Optional[float]]]] = {}
+        if self.window > 1:
+            device_ids = sorted({_field(reading, 'device_id') for reading in readings})
+            for reading in self._recent_readings(db, device_ids, self.window - 1):
+                history.setdefault(reading.device_id, []).append([getattr(reading, signal) for signal in TREND_SIGNALS])
+
+        windows = np.full((len(readings), self.window, len(TREND_SIGNALS)), np.nan)
+        for row, reading in enumerate(readings):
+            previous = history.get(_field(reading, 'device_id'), [])
+            for position, values in enumerate(previous, start=self.window - 1 - len(previous)):
+                windows[row, position] = [np.nan if value is None else value for value in values]
+            windows[row, -1] = [np.nan if value is None else value
+                                for value in (_field(reading, signal) for signal in TREND_SIGNALS)]
+        return window_features(windows, self.alpha)
+
+    def _recent_readings(self, db, device_ids: List[str], per_device: int) -> List[Any]:
+        # Imported here: the crud layer feeds this store on ingest
+        from app.crud import device_data as crud_device_data
+        from app.database import SessionLocal
+        session = db if db is not None else SessionLocal()
+        try:
+            return crud_device_data.get_recent_device_data_for_devices(session, device_ids, per_device=per_device)
+        finally:
+            if db is None:
+                session.close()
+
+# Initialize global online feature store
+online_features = OnlineFeatureStore()
@@ -1,94 +1,309 @@
-import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.preprocessing import StandardScaler
-from sklearn.metrics import classification_report, accuracy_score
-import joblib
+import logging
 import os
+import threading
+import time
 from datetime import datetime
-from typing import List, Tuple, Optional, Any, Dict
+from typing import TYPE_CHECKING, List, Tuple, Optional, Any, Dict, Mapping, Sequence, Union
+from app.ml.explanation import ExplanationBatch
+from app.ml.features import RAW_FEATURES, TREND_FEATURES, TREND_SIGNALS, model_feature_names, online_features
+from app.ml.registry import ModelRegistry, ModelSnapshot
+from app.metrics import time_inference
+
+if TYPE_CHECKING:
+    # pandas and scikit-learn take seconds to import; they are loaded when first needed
+    import pandas as pd
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+
+logger = logging.getLogger(__name__)
+
+LABEL_MAPPING = {'healthy': 0, 'at_risk': 1, 'needs_maintenance': 2}
+
+# Seconds a request waits for the background model load started at startup
+MODEL_LOAD_WAIT = float(os.getenv("MODEL_LOAD_WAIT", "30"))
+
+class TrendFeaturesUnavailable(ValueError):
+    """The served model uses trend features that rows neither carry nor have a device_id to compute them from"""
+
+def fit_health_model(X: 'pd.DataFrame', y: Any, n_estimators: int = 100,
+                     n_jobs: Optional[int] = None) -> Tuple['RandomForestClassifier', 'StandardScaler', float]:
+    """
+    Fit a scaler and random forest on the given features and numeric labels.
+    Returns (model, scaler, fit_seconds). Kept at module level so it can run in a worker process.
+    """
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.preprocessing import StandardScaler
+    
+    start = time.perf_counter()
+    
+    scaler = StandardScaler()
+    X_scaled = scaler.fit_transform(X)
+    
+    model = RandomForestClassifier(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs)
+    model.fit(X_scaled, y)
+    # Predict single rows in-process instead of spinning up a joblib pool per request
+    model.set_params(n_jobs=None)
+    
+    return model, scaler, time.perf_counter() - start
+
+def _trend_columns(feature_names: List[str]) -> List[Tuple[int, int]]:
+    # (matrix column, TREND_FEATURES index) of each trend feature a model uses
+    return [(column, TREND_FEATURES.index(name)) for column, name in enumerate(feature_names) if name in TREND_FEATURES]
 
 class DeviceHealthPredictor:
-    def __init__(self):
-        self.model: Optional[RandomForestClassifier] = None
-        self.scaler = StandardScaler()
-        self.is_trained = False
-        self.feature_names = ['usage_hours', 'temperature', 'pressure', 'vibration', 'error_count']
+    def __init__(self, registry: Optional[ModelRegistry] = None):
+        self.registry = registry or ModelRegistry()
+        # Columns of a single reading; models trained with trend features also expect TREND_FEATURES
+        self.feature_names = list(RAW_FEATURES)
+        self._cold_load_attempted = False
+        # "loading" while start_loading runs, then "loaded", "missing" or "failed"
+        self.load_state = "not_started"
+        self._load_finished = threading.Event()
+    
+    @property
+    def model(self) -> Optional['RandomForestClassifier']:
+        snapshot = self.registry.current()
+        return snapshot.model if snapshot is not None else None
+    
+    @property
+    def scaler(self) -> Optional['StandardScaler']:
+        snapshot = self.registry.current()
+        return snapshot.scaler if snapshot is not None else None
+    
+    @property
+    def is_trained(self) -> bool:
+        return self.registry.current() is not None
+    
+    def current_snapshot(self) -> ModelSnapshot:
+        """
+        Get the model snapshot to serve a request with. The artifact is normally
+        loaded at startup (requests arriving meanwhile wait up to MODEL_LOAD_WAIT
+        seconds for it); disk is only read here once if that never happened.
+        """
+        snapshot = self.registry.current()
+        if snapshot is None and self.load_state == "loading":
+            if not self._load_finished.wait(MODEL_LOAD_WAIT):
+                raise Exception("Model is still loading")
+            snapshot = self.registry.current()
+        if snapshot is None and not self._cold_load_attempted:
+            self._cold_load_attempted = True
+            snapshot = self.registry.load()
+        if snapshot is None:
+            raise Exception("Model not trained and no saved model found")
+        return snapshot
+    
+    def start_loading(self) -> threading.Thread:
+        """
+        Load the saved model and build its inference structures on a background
+        thread, so startup does not wait for unpickling the forest and requests
+        do not pay for compiling it
+        """
+        self._cold_load_attempted = True
+        self.load_state = "loading"
+        self._load_finished.clear()
+        thread = threading.Thread(target=self._load_in_background, name="model-loader", daemon=True)
+        thread.start()
+        return thread
+    
+    def _load_in_background(self):
+        try:
+            snapshot = self.registry.load()
+            if snapshot is None:
+                self.load_state = "missing"
+                logger.warning("No trained model found; predictions will fail until one is trained")
+                return
+            # Cached with the snapshot, built here instead of by the first request
+            snapshot.compiled, snapshot.attributor
+            self.load_state = "loaded"
+            logger.info(f"Model loaded (version {snapshot.version})")
+        except Exception as e:
+            self.load_state = "failed"
+            logger.error(f"Error loading model: {e}")
+        finally:
+            self._load_finished.set()
         
-    def preprocess_data(self, df: pd.DataFrame) -> Any:
+    def preprocess_data(self, df: 'pd.DataFrame', scaler: Optional['StandardScaler'] = None) -> Any:
         """
-        Preprocess the device data for training or prediction
+        Preprocess the device data for prediction with the given (or currently served) scaler
         """
+        if scaler is None:
+            scaler = self.current_snapshot().scaler
+        X = self._feature_frame(df, model_feature_names(scaler))
+        
+        # Scale features
+        return scaler.transform(X)
+    
+    def feature_matrix(self, rows: Sequence[Any], feature_names: Optional[List[str]] = None,
+                       out: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Build the feature matrix of ORM rows, Pydantic models or dicts directly,
+        one column per feature in feature_names order (default: the raw reading
+        features). Missing and None values are 0, as in preprocess_data; use
+        row_matrix to get the trend features a model needs filled in.
+        Pass out to fill a preallocated (rows, features) float32/float64 array.
+        """
+        feature_names = feature_names or self.feature_names
+        if out is None:
+            out = np.empty((len(rows), len(feature_names)), dtype=np.float64)
+        
+        mappings = len(rows) > 0 and isinstance(rows[0], Mapping)
+        for column, name in enumerate(feature_names):
+            if mappings:
+                values = [row.get(name) for row in rows]
+            else:
+                values = [getattr(row, name, None) for row in rows]
+            # None becomes NaN with a float dtype
+            out[:, column] = np.array(values, dtype=np.float64)
+        np.nan_to_num(out, copy=False, nan=0.0)
+        return out
+    
+    def preprocess_matrix(self, X: np.ndarray, snapshot: Optional[ModelSnapshot] = None) -> np.ndarray:
+        """
+        Scale a feature matrix in the served model's feature order, the array
+        counterpart of preprocess_data
+        """
+        snapshot = snapshot or self.current_snapshot()
+        return snapshot.compiled.transform(X)
+    
+    def _feature_frame(self, df: 'pd.DataFrame', feature_names: Optional[List[str]] = None) -> 'pd.DataFrame':
+        feature_names = feature_names or self.feature_names
+        
         # Handle missing values
         df = df.fillna(0)
         
-        # Select features for prediction
-        feature_columns = ['usage_hours', 'temperature', 'pressure', 'vibration', 'error_count']
-        
         # Ensure all feature columns exist
-        for col in feature_columns:
+        for col in feature_names:
             if col not in df.columns:
                 df[col] = 0
         
-        X = df[feature_columns]
+        return df[feature_names]
+    
+    def row_matrix(self, rows: Sequence[Any], snapshot: Optional[ModelSnapshot] = None, db=None) -> np.ndarray:
+        """
+        Feature matrix of ORM rows, Pydantic models or dicts in the served
+        model's feature order. Trend features the rows do not carry are
+        computed from the stored readings of each row's device_id, the row
+        being the device's newest reading; rows without either raise
+        TrendFeaturesUnavailable.
+        """
+        snapshot = snapshot or self.current_snapshot()
+        X = self.feature_matrix(rows, snapshot.feature_names)
+        trend_columns = _trend_columns(snapshot.feature_names)
+        if not trend_columns or not len(rows):
+            return X
         
-        # Scale features
-        if not self.is_trained:
-            X_scaled = self.scaler.fit_transform(X)
+        mappings = isinstance(rows[0], Mapping)
+        names = [snapshot.feature_names[column] for column, _ in trend_columns]
+        if all((name in row) if mappings else hasattr(row, name) for row in rows for name in names):
+            return X
+        device_ids = [row.get('device_id') if mappings else getattr(row, 'device_id', None) for row in rows]
+        return self._fill_reading_trends(db, X, trend_columns, rows, device_ids)
+    
+    def _frame_matrix(self, df: 'pd.DataFrame', feature_names: List[str]) -> np.ndarray:
+        # Missing columns and values become 0 without copying the whole frame
+        X = df.reindex(columns=feature_names).to_numpy(dtype=np.float64)
+        np.nan_to_num(X, copy=False, nan=0.0)
+        trend_columns = _trend_columns(feature_names)
+        if not trend_columns or all(feature_names[column] in df.columns for column, _ in trend_columns):
+            return X
+        
+        if 'device_id' in df.columns:
+            device_ids = df['device_id'].astype(object).where(df['device_id'].notna(), None).tolist()
         else:
-            X_scaled = self.scaler.transform(X)
-            
-        return X_scaled
+            device_ids = [None] * len(df)
+        readings = df.reindex(columns=['device_id'] + TREND_SIGNALS).to_dict('records')
+        return self._fill_reading_trends(None, X, trend_columns, readings, device_ids)
+    
+    def _fill_reading_trends(self, db, X: np.ndarray, trend_columns: List[Tuple[int, int]],
+                             readings: Sequence[Any], device_ids: List[Any]) -> np.ndarray:
+        # Zeros would describe a perfectly flat history, so they are never filled in instead
+        if any(device_id is None for device_id in device_ids):
+            raise TrendFeaturesUnavailable(
+                "The model uses trend features: every row needs a device_id to compute them "
+                "from the device's stored readings, or must carry them itself"
+            )
+        with time_inference('trend_features'):
+            trends = online_features.reading_trend_features(db, readings)
+        for column, trend in trend_columns:
+            X[:, column] = trends[:, trend]
+        return X
+    
+    def latest_state_matrix(self, db, states: Sequence[Any], snapshot: Optional[ModelSnapshot] = None) -> np.ndarray:
+        """
+        Feature matrix of the latest reading of each device_latest_state row in
+        the served model's feature order, including the trend features of the
+        device's recent readings when the model was trained with them
+        """
+        snapshot = snapshot or self.current_snapshot()
+        X = self.feature_matrix(states, snapshot.feature_names)
+        
+        trend_columns = _trend_columns(snapshot.feature_names)
+        if trend_columns and len(states):
+            with time_inference('trend_features'):
+                trends = online_features.trend_features(db, states)
+            for column, trend in trend_columns:
+                X[:, column] = trends[:, trend]
+        return X
     
-    def train(self, df: pd.DataFrame, target_column: str = 'health_status'):
+    def train(self, df: 'pd.DataFrame', target_column: str = 'health_status'):
         """
         Train the model with provided data
         Expected target values: 'healthy', 'at_risk', 'needs_maintenance'
+        The new model is saved and atomically swapped in for serving once fitted.
         """
-        # Preprocess data
-        X = self.preprocess_data(df)
-        
         # Prepare target variable
         y = df[target_column]
         
         # Convert string labels to numeric
-        def map_labels(label):
-            label_mapping = {'healthy': 0, 'at_risk': 1, 'needs_maintenance': 2}
-            return label_mapping.get(label, 0)
+        y_numeric = y.map(LABEL_MAPPING).fillna(0).astype(int)
         
-        y_numeric = y.apply(map_labels)
+        # Fit a fresh scaler and model so the served snapshot is never mutated
+        model, scaler, _ = fit_health_model(self._feature_frame(df), y_numeric)
         
-        # Train model
-        self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-        self.model.fit(X, y_numeric)
+        # Save model and start serving it
+        self.registry.publish(model, scaler)
         
-        self.is_trained = True
-        
-        # Save model
-        self.save_model()
-        
-        return self.model
+        return model
     
-    def predict(self, df: pd.DataFrame) -> List[Tuple[str, float, str]]:
+    def predict(self, df: 'pd.DataFrame') -> List[Tuple[str, float, str]]:
         """
         Predict device health status
         Returns: list of predictions with confidence scores
         """
-        if not self.is_trained or self.model is None:
-            # Try to load a pre-trained model
-            if not self.load_model():
-                raise Exception("Model not trained and no saved model found")
-        
-        # Preprocess data
-        X = self.preprocess_data(df)
-        
-        # Make predictions
-        if self.model is not None:
-            predictions = self.model.predict(X)
-            probabilities = self.model.predict_proba(X)
-        else:
-            raise Exception("Model is not available for prediction")
+        snapshot = self.current_snapshot()
+        return self.predict_values(self._frame_matrix(df, snapshot.feature_names), snapshot)
+    
+    def predict_values(self, rows: Union[np.ndarray, Sequence[Any]],
+                       snapshot: Optional[ModelSnapshot] = None, db=None) -> List[Tuple[str, float, str]]:
+        """
+        predict for plain data without building a DataFrame: a 2D array in the
+        served model's feature order, or ORM rows, Pydantic models or dicts
+        (missing or None values are 0, trend features as in row_matrix)
+        """
+        snapshot = snapshot or self.current_snapshot()
+        with time_inference('preprocess'):
+            if isinstance(rows, np.ndarray):
+                X = np.nan_to_num(rows.astype(np.float64), nan=0.0)
+            else:
+                X = self.row_matrix(rows, snapshot, db)
+            X = snapshot.compiled.transform(X)
+        with time_inference('predict_proba'):
+            probabilities = snapshot.compiled.predict_proba_scaled(X)
+        return self._predictions(snapshot, probabilities)
+    
+    def predict_latest_states(self, db, states: Sequence[Any]) -> Tuple[List[Tuple[str, float, str]], List[str]]:
+        """
+        Predict from device_latest_state rows. Returns the predictions and the
+        feature names they were made with.
+        """
+        snapshot = self.current_snapshot()
+        X = self.latest_state_matrix(db, states, snapshot)
+        return self.predict_values(X, snapshot), snapshot.feature_names
+    
+    def _predictions(self, snapshot: ModelSnapshot, probabilities: np.ndarray) -> List[Tuple[str, float, str]]:
+        # Labels are the most probable classes, as RandomForestClassifier.predict derives them
+        predictions = snapshot.model.classes_.take(np.argmax(probabilities, axis=1), axis=0)
         
         # Convert numeric predictions back to labels
         label_mapping = {0: 'healthy', 1: 'at_risk', 2: 'needs_maintenance'}
@@ -109,191 +324,84 @@ class DeviceHealthPredictor:
         
         return list(zip(predictions_labels, confidence_scores, recommendations))
     
-    def predict_with_explanation(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
+    def explain_batch(self, df: 'pd.DataFrame') -> ExplanationBatch:
         """
-        Predict device health status with detailed explanations
-        Returns: list of predictions with explanations including feature importance
+        Predict device health status for a whole batch and keep the
+        explanation data (probabilities, factor ranking, rule hits) as arrays
         """
-        if not self.is_trained or self.model is None:
-            # Try to load a pre-trained model
-            if not self.load_model():
-                raise Exception("Model not trained and no saved model found")
-        
-        # Preprocess data
-        X = self.preprocess_data(df)
-        
-        # Make predictions
-        if self.model is not None:
-            predictions = self.model.predict(X)
-            probabilities = self.model.predict_proba(X)
-            
-            # Get feature importance from the model
-            feature_importance = self.model.feature_importances_
-            
-            # Get the actual classes the model was trained on
-            model_classes = self.model.classes_
-        else:
-            raise Exception("Model is not available for prediction")
-        
-        # Convert numeric predictions back to labels
-        label_mapping = {0: 'healthy', 1: 'at_risk', 2: 'needs_maintenance'}
-        
-        results = []
-        for idx, pred in enumerate(predictions):
-            prediction_label = label_mapping.get(pred, 'unknown')
-            confidence_score = float(np.max(probabilities[idx]))
-            
-            # Get probability distribution across all classes (only those in the model)
-            class_probabilities = {}
-            for class_idx, class_label in enumerate(model_classes):
-                class_name = label_mapping.get(class_label, f'class_{class_label}')
-                if class_idx < len(probabilities[idx]):
-                    class_probabilities[class_name] = float(probabilities[idx][class_idx])
-                else:
-                    class_probabilities[class_name] = 0.0
-            
-            # Ensure all three classes are in the output (even if model wasn't trained on them)
-            for class_name in ['healthy', 'at_risk', 'needs_maintenance']:
-                if class_name not in class_probabilities:
-                    class_probabilities[class_name] = 0.0
-            
-            # Calculate feature contributions for this prediction
-            feature_values = df.iloc[idx][self.feature_names].to_dict()
-            
-            # Create feature importance dictionary
-            feature_contributions = {}
-            for feature_name, importance in zip(self.feature_names, feature_importance):
-                feature_contributions[feature_name] = {
-                    'importance': float(importance),
-                    'value': float(feature_values[feature_name])
-                }
-            
-            # Sort features by importance
-            sorted_features = sorted(
-                feature_contributions.items(),
-                key=lambda x: x[1]['importance'],
-                reverse=True
-            )
-            
-            # Generate detailed recommendation
-            recommendation = self._generate_detailed_recommendation(
-                prediction_label,
-                sorted_features,
-                confidence_score
-            )
-            
-            # Create explanation text
-            explanation = self._create_explanation(
-                prediction_label,
-                sorted_features,
-                confidence_score
-            )
-            
-            result = {
-                'prediction': prediction_label,
-                'confidence': confidence_score,
-                'class_probabilities': class_probabilities,
-                'feature_contributions': dict(sorted_features),
-                'recommendation': recommendation,
-                'explanation': explanation,
-                'top_factors': [f[0] for f in sorted_features[:3]]  # Top 3 most important features
-            }
-            
-            results.append(result)
-        
-        return results
+        snapshot = self.current_snapshot()
+        return self.explain_values(self._frame_matrix(df, snapshot.feature_names), snapshot)
     
-    def _generate_detailed_recommendation(self, prediction: str, sorted_features: List, confidence: float) -> str:
-        """Generate a detailed recommendation based on prediction and feature analysis"""
-        recommendations = []
+    def explain_values(self, rows: Union[np.ndarray, Sequence[Any]],
+                       snapshot: Optional[ModelSnapshot] = None, db=None) -> ExplanationBatch:
+        """
+        explain_batch for a feature matrix in the served model's feature order
+        or ORM rows, Pydantic models or dicts (trend features as in row_matrix)
+        """
+        snapshot = snapshot or self.current_snapshot()
+        with time_inference('preprocess'):
+            if isinstance(rows, np.ndarray):
+                features = np.nan_to_num(rows.astype(np.float64), nan=0.0)
+            else:
+                features = self.row_matrix(rows, snapshot, db)
+            X = snapshot.compiled.transform(features)
         
-        if prediction == 'healthy':
-            recommendations.append("✓ Device is operating within normal parameters.")
-            if confidence < 0.7:
-                recommendations.append("⚠ However, confidence is moderate. Monitor closely.")
-        elif prediction == 'at_risk':
-            recommendations.append("⚠ Device showing early warning signs.")
-            recommendations.append("→ Schedule preventive inspection within 2-4 weeks.")
-        else:  # needs_maintenance
-            recommendations.append("🔴 Critical: Device requires immediate attention.")
-            recommendations.append("→ Schedule maintenance within 24-48 hours.")
+        # One forest pass; labels are the most probable classes
+        with time_inference('predict_proba'):
+            probabilities = snapshot.compiled.predict_proba_scaled(X)
         
-        # Add specific feature-based recommendations
-        for feature_name, data in sorted_features[:2]:  # Top 2 features
-            importance = data['importance']
-            value = data['value']
-            
-            if importance > 0.15:  # Significant contributor
-                if feature_name == 'error_count' and value > 5:
-                    recommendations.append(f"→ High error count ({int(value)}) detected - investigate error logs.")
-                elif feature_name == 'temperature' and value > 40:
-                    recommendations.append(f"→ Elevated temperature ({value:.1f}°C) - check cooling system.")
-                elif feature_name == 'vibration' and value > 1.0:
-                    recommendations.append(f"→ Abnormal vibration ({value:.2f} Hz) - check mechanical components.")
-                elif feature_name == 'pressure' and (value < 80 or value > 140):
-                    recommendations.append(f"→ Pressure outside normal range ({value:.1f} PSI) - inspect pressure system.")
-                elif feature_name == 'usage_hours' and value > 5000:
-                    recommendations.append(f"→ High usage hours ({int(value)}) - consider scheduled maintenance.")
+        # Per-sample attributions from the cached per-tree structures
+        with time_inference('explanation'):
+            _, contributions = snapshot.attributor.contributions(X)
         
-        return "\n".join(recommendations)
-    
-    def _create_explanation(self, prediction: str, sorted_features: List, confidence: float) -> str:
-        """Create a human-readable explanation of the prediction"""
-        explanation_parts = []
-        
-        explanation_parts.append(
-            f"The model predicts this device is '{prediction}' with {confidence*100:.1f}% confidence."
+        return ExplanationBatch(
+            feature_names=snapshot.feature_names,
+            feature_values=features,
+            probabilities=probabilities,
+            model_classes=snapshot.model.classes_,
+            importances=snapshot.model.feature_importances_,
+            contributions=contributions
         )
-        
-        # Explain top contributing factors
-        top_features = sorted_features[:3]
-        if top_features:
-            explanation_parts.append("\nKey factors influencing this prediction:")
-            for idx, (feature_name, data) in enumerate(top_features, 1):
-                importance_pct = data['importance'] * 100
-                value = data['value']
-                
-                feature_display = {
-                    'usage_hours': f'Usage Hours ({int(value)} hrs)',
-                    'temperature': f'Temperature ({value:.1f}°C)',
-                    'pressure': f'Pressure ({value:.1f} PSI)',
-                    'vibration': f'Vibration ({value:.2f} Hz)',
-                    'error_count': f'Error Count ({int(value)})'
-                }
-                
-                explanation_parts.append(
-                    f"{idx}. {feature_display.get(feature_name, feature_name)} - "
-                    f"{importance_pct:.1f}% contribution to prediction"
-                )
-        
-        return "\n".join(explanation_parts)
     
-    def save_model(self, filepath: str = "models/device_health_model.pkl"):
+    def explain_latest_states(self, db, states: Sequence[Any]) -> ExplanationBatch:
+        """
+        explain_batch for device_latest_state rows, with trend features when
+        the served model uses them
+        """
+        snapshot = self.current_snapshot()
+        return self.explain_values(self.latest_state_matrix(db, states, snapshot), snapshot)
+    
+    def predict_with_explanation(self, df: 'pd.DataFrame', include_text: bool = True) -> List[Dict[str, Any]]:
         """
-        Save the trained model to disk
+        Predict device health status with detailed explanations
+        Returns: list of predictions with explanations including feature importance
         """
+        return self.explain_batch(df).to_records(include_text=include_text)
+    
+    def save_model(self, filepath: Optional[str] = None):
+        """
+        Save the currently served model to disk
+        """
+        snapshot = self.current_snapshot()
+        filepath = filepath or self.registry.path
+        
         # Create models directory if it doesn't exist
-        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        os.makedirs(os.path.dirname(filepath) or '.', exist_ok=True)
         
         model_data = {
-            'model': self.model,
-            'scaler': self.scaler,
-            'is_trained': self.is_trained
+            'model': snapshot.model,
+            'scaler': snapshot.scaler,
+            'is_trained': True
         }
+        import joblib
         joblib.dump(model_data, filepath)
     
-    def load_model(self, filepath: str = "models/device_health_model.pkl") -> bool:
+    def load_model(self, filepath: Optional[str] = None) -> bool:
         """
-        Load a trained model from disk
+        Load a trained model from disk and start serving it
         """
         try:
-            if os.path.exists(filepath):
-                model_data = joblib.load(filepath)
-                self.model = model_data['model']
-                self.scaler = model_data['scaler']
-                self.is_trained = model_data['is_trained']
-                return True
-            return False
+            return self.registry.load(filepath) is not None
         except Exception as e:
             print(f"Error loading model: {e}")
             return False
@@ -0,0 +1,172 @@
+import hashlib
+import io
+import itertools
+import logging
+import os
+import threading
+from dataclasses import dataclass, replace
+from datetime import datetime
+from functools import cached_property
+from typing import Any, List, Optional
+from app.ml.attribution import ForestAttributor
+from app.ml.compiled import CompiledForest
+from app.ml.features import model_feature_names
+
+logger = logging.getLogger(__name__)
+
+MODEL_PATH = os.getenv("MODEL_PATH", "models/device_health_model.pkl")
+# Seconds between checks of the model file for changes (0 disables hot reload)
+MODEL_RELOAD_INTERVAL = float(os.getenv("MODEL_RELOAD_INTERVAL", "30"))
+
+@dataclass(frozen=True)
+class ModelSnapshot:
+    """
+    Immutable, versioned view of a trained model and the scaler it was trained with.
+    Readers grab a reference once per request and never see a half-swapped model.
+    """
+    model: Any
+    scaler: Any
+    version: int
+    loaded_at: datetime
+    source_path: Optional[str] = None
+    source_mtime: Optional[float] = None
+    source_hash: Optional[str] = None
+
+    @cached_property
+    def feature_names(self) -> List[str]:
+        """Feature columns the model expects, in order"""
+        return model_feature_names(self.scaler)
+
+    @cached_property
+    def compiled(self) -> CompiledForest:
+        """Flattened scaler + forest for fast inference, built on first use and cached with the snapshot"""
+        return CompiledForest(self.model, self.scaler, self.feature_names)
+
+    @cached_property
+    def attributor(self) -> ForestAttributor:
+        """Per-tree attribution structures, built on first use and cached with the snapshot"""
+        return ForestAttributor(self.model)
+
+class ModelRegistry:
+    """
+    Holds the currently served ModelSnapshot. Loading and publishing are
+    serialized by a lock; reading the current snapshot is a plain attribute
+    read so inference never blocks on (or touches) the disk.
+    """
+
+    def __init__(self, path: str = MODEL_PATH):
+        self.path = path
+        self._snapshot: Optional[ModelSnapshot] = None
+        self._lock = threading.Lock()
+        self._versions = itertools.count(1)
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+
+    def current(self) -> Optional[ModelSnapshot]:
+        return self._snapshot
+
+    def load(self, path: Optional[str] = None) -> Optional[ModelSnapshot]:
+        """
+        Load the model artifact from disk and publish it as the current snapshot.
+        Returns None if there is no artifact at the path.
+        """
+        path = path or self.path
+        with self._lock:
+            if not os.path.exists(path):
+                return None
+
+            mtime = os.stat(path).st_mtime
+            with open(path, 'rb') as f:
+                content = f.read()
+            digest = hashlib.sha256(content).hexdigest()
+
+            current = self._snapshot
+            if current is not None and current.source_hash == digest:
+                # File was rewritten with identical content, keep the same version
+                self._snapshot = replace(current, source_path=path, source_mtime=mtime)
+                return self._snapshot
+
+            import joblib
+            model_data = joblib.load(io.BytesIO(content))
+            return self._swap(model_data['model'], model_data['scaler'], path, mtime, digest)
+
+    def publish(self, model: Any, scaler: Any, save: bool = True) -> ModelSnapshot:
+        """
+        Publish a freshly trained model. The artifact is written to a temporary
+        file and renamed into place so a concurrent reload never reads a partial file.
+        """
+        with self._lock:
+            if not save:
+                return self._swap(model, scaler, None, None, None)
+
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            buffer = io.BytesIO()
+            import joblib
+            joblib.dump({'model': model, 'scaler': scaler, 'is_trained': True}, buffer)
+            content = buffer.getvalue()
+
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+
+            mtime = os.stat(self.path).st_mtime
+            digest = hashlib.sha256(content).hexdigest()
+            return self._swap(model, scaler, self.path, mtime, digest)
+
+    def refresh_if_changed(self) -> bool:
+        """
+        Reload the artifact if its modification time differs from the served
+        snapshot. Returns True if a new version was published.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return False
+
+        current = self._snapshot
+        if current is not None and current.source_path == self.path and current.source_mtime == mtime:
+            return False
+
+        previous_version = current.version if current is not None else None
+        snapshot = self.load()
+        return snapshot is not None and snapshot.version != previous_version
+
+    def start_watching(self, interval: float = MODEL_RELOAD_INTERVAL):
+        """Start a daemon thread that hot-reloads the artifact when it changes"""
+        if interval <= 0 or (self._watcher is not None and self._watcher.is_alive()):
+            return
+        self._stop_watching.clear()
+        self._watcher = threading.Thread(
+            target=self._watch, args=(interval,), name="model-registry-watcher", daemon=True
+        )
+        self._watcher.start()
+
+    def stop_watching(self):
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=5)
+            self._watcher = None
+
+    def _watch(self, interval: float):
+        while not self._stop_watching.wait(interval):
+            try:
+                if self.refresh_if_changed():
+                    logger.info(f"Reloaded model from {self.path} (version {self._snapshot.version})")
+            except Exception as e:
+                logger.error(f"Error reloading model from {self.path}: {e}")
+
+    def _swap(self, model: Any, scaler: Any, path: Optional[str], mtime: Optional[float],
+              digest: Optional[str]) -> ModelSnapshot:
+        snapshot = ModelSnapshot(
+            model=model,
+            scaler=scaler,
+            version=next(self._versions),
+            loaded_at=datetime.utcnow(),
+            source_path=path,
+            source_mtime=mtime,
+            source_hash=digest
+        )
+        # Single reference assignment: readers see either the old or the new snapshot
+        self._snapshot = snapshot
+        return snapshot
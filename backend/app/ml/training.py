@@ -0,0 +1,187 @@
+import logging
+import multiprocessing
+import os
+import threading
+import uuid
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from app.crud import device_data as crud_device_data
+from app.database import SessionLocal
+from app.ml.features import TREND_FEATURES, TREND_SIGNALS, batch_trend_features
+from app.ml.model import DeviceHealthPredictor, fit_health_model, predictor
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the database per round trip while loading training data
+TRAINING_CHUNK_SIZE = int(os.getenv("TRAINING_CHUNK_SIZE", "10000"))
+# Cores used to fit the forest (-1 = all cores)
+TRAINING_N_JOBS = int(os.getenv("TRAINING_N_JOBS", "-1"))
+# Finished jobs kept around for status polling
+MAX_FINISHED_JOBS = 50
+# Train with the per-device trend features of app.ml.features by default
+TRAINING_TREND_FEATURES = os.getenv("TRAINING_TREND_FEATURES", "false").lower() in ("1", "true", "yes")
+
+@dataclass
+class TrainingJob:
+    job_id: str
+    status: str = "queued"  # queued, loading_data, fitting, completed, failed
+    progress: float = 0.0
+    submitted_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    max_records: Optional[int] = None
+    trend_features: bool = False
+    records_used: int = 0
+    fit_seconds: Optional[float] = None
+    model_version: Optional[int] = None
+    model_hash: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+def derive_health_labels(X: np.ndarray) -> np.ndarray:
+    """
+    Label readings with the rule-based health status used until real
+    maintenance records are available. X columns follow DeviceHealthPredictor.feature_names;
+    missing (NaN) values never satisfy a condition.
+    """
+    temperature, vibration, error_count = X[:, 1], X[:, 3], X[:, 4]
+    with np.errstate(invalid='ignore'):
+        conditions = [
+            (error_count <= 1) & (temperature <= 35) & (vibration <= 0.3),
+            (error_count > 1) & (error_count <= 5) & ((temperature > 35) | (vibration > 0.3)),
+            (error_count > 5) | (temperature > 45) | (vibration > 0.8)
+        ]
+    return np.select(conditions, [0, 1, 2], default=0)
+
+class TrainingJobManager:
+    """
+    Runs model training in the background. Training data is streamed from the
+    database on a job thread and the fit itself runs in a separate process so
+    it neither blocks API workers nor holds the GIL.
+    """
+
+    def __init__(self, predictor: DeviceHealthPredictor, session_factory=SessionLocal,
+                 use_process_pool: bool = True):
+        self.predictor = predictor
+        self.session_factory = session_factory
+        self.use_process_pool = use_process_pool
+        self._jobs: Dict[str, TrainingJob] = {}
+        self._lock = threading.Lock()
+        # One job at a time: concurrent fits would only fight over the same cores
+        self._runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix="training-job")
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    def submit(self, max_records: Optional[int] = None, trend_features: Optional[bool] = None) -> TrainingJob:
+        if trend_features is None:
+            trend_features = TRAINING_TREND_FEATURES
+        job = TrainingJob(job_id=uuid.uuid4().hex, submitted_at=datetime.utcnow(), max_records=max_records,
+                          trend_features=trend_features)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._runner.submit(self._run, job)
+        return job
+
+    def get(self, job_id: str) -> Optional[TrainingJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[TrainingJob]:
+        return sorted(self._jobs.values(), key=lambda job: job.submitted_at, reverse=True)
+
+    def shutdown(self):
+        self._runner.shutdown(wait=False, cancel_futures=True)
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, job: TrainingJob):
+        job.started_at = datetime.utcnow()
+        try:
+            job.status = "loading_data"
+            X = self._load_training_matrix(job)
+            if len(X) == 0:
+                raise ValueError("No device data available for training")
+
+            job.status = "fitting"
+            job.progress = 0.5
+            y = derive_health_labels(X)
+            columns = self.predictor.feature_names + (TREND_FEATURES if job.trend_features else [])
+            import pandas as pd
+            features = pd.DataFrame(np.nan_to_num(X, nan=0.0), columns=columns)
+            model, scaler, fit_seconds = self._fit(features, y)
+
+            job.progress = 0.9
+            snapshot = self.predictor.registry.publish(model, scaler)
+
+            job.fit_seconds = fit_seconds
+            job.model_version = snapshot.version
+            job.model_hash = snapshot.source_hash
+            job.status = "completed"
+            job.progress = 1.0
+            logger.info(f"Training job {job.job_id} finished: {job.records_used} records, "
+                        f"{fit_seconds:.2f}s fit, model version {snapshot.version}")
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Training job {job.job_id} failed: {e}")
+        finally:
+            job.finished_at = datetime.utcnow()
+
+    def _load_training_matrix(self, job: TrainingJob) -> np.ndarray:
+        db = self.session_factory()
+        try:
+            total = crud_device_data.count_device_data(db)
+            if job.max_records is not None:
+                total = min(total, job.max_records)
+
+            # Trend features need each device's readings together and in time order
+            columns = self.predictor.feature_names
+            if job.trend_features:
+                columns = ['device_id'] + columns
+            chunks, device_ids = [], []
+            for rows in crud_device_data.iter_feature_rows(
+                db, columns, chunk_size=TRAINING_CHUNK_SIZE, limit=job.max_records, per_device=job.trend_features
+            ):
+                if job.trend_features:
+                    device_ids.extend(row[0] for row in rows)
+                    rows = [row[1:] for row in rows]
+                # None becomes NaN with a float dtype
+                chunks.append(np.array(rows, dtype=np.float64))
+                job.records_used += len(rows)
+                job.progress = 0.5 * job.records_used / total if total else 0.0
+        finally:
+            db.close()
+
+        if not chunks:
+            return np.empty((0, len(self.predictor.feature_names)))
+        X = np.vstack(chunks)
+        if job.trend_features:
+            signals = [self.predictor.feature_names.index(signal) for signal in TREND_SIGNALS]
+            X = np.hstack([X, batch_trend_features(device_ids, X[:, signals])])
+        return X
+
+    def _fit(self, X: 'pd.DataFrame', y: np.ndarray) -> Tuple[Any, Any, float]:
+        if not self.use_process_pool:
+            return fit_health_model(X, y, n_jobs=TRAINING_N_JOBS)
+
+        if self._process_pool is None:
+            # spawn: forking a process with live threads and DB connections is unsafe
+            self._process_pool = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._process_pool.submit(fit_health_model, X, y, n_jobs=TRAINING_N_JOBS).result()
+
+    def _prune(self):
+        finished = [job for job in self.list() if job.status in ("completed", "failed")]
+        for job in finished[MAX_FINISHED_JOBS:]:
+            del self._jobs[job.job_id]
+
+# Initialize global training job manager
+training_jobs = TrainingJobManager(predictor)
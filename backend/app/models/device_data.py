@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Index
 from app.database import Base
 from datetime import datetime
 
@@ -17,5 +17,10 @@ class DeviceData(Base):
     maintenance_notes = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Time-ordered access path for "latest N", time ranges and keyset pagination
+        Index("ix_device_data_device_id_timestamp", device_id, timestamp.desc(), id.desc()),
+    )
+    
     def __repr__(self):
         return f"<DeviceData(device_id='{self.device_id}', timestamp='{self.timestamp}')>"
\ No newline at end of file
@@ -0,0 +1,54 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from app.database import Base
+from datetime import datetime
+
+class DeviceLatestState(Base):
+    """
+    One row per device with its latest reading, running aggregates over all
+    of its readings and its latest prediction. Maintained incrementally on
+    ingest so "latest state" consumers read O(devices) rows.
+    Missing sensor values count as 0 in the sums, like the model's preprocessing.
+    """
+    __tablename__ = "device_latest_state"
+
+    device_id = Column(String, ForeignKey("devices.device_id"), primary_key=True)
+    
+    # Latest reading
+    last_timestamp = Column(DateTime, nullable=True)
+    usage_hours = Column(Float, nullable=True)
+    temperature = Column(Float, nullable=True)
+    pressure = Column(Float, nullable=True)
+    vibration = Column(Float, nullable=True)
+    error_count = Column(Integer, nullable=True)
+    
+    # Running aggregates
+    reading_count = Column(Integer, default=0)
+    temperature_sum = Column(Float, default=0)
+    pressure_sum = Column(Float, default=0)
+    vibration_sum = Column(Float, default=0)
+    error_count_sum = Column(Integer, default=0)
+    max_temperature = Column(Float, nullable=True)
+    max_vibration = Column(Float, nullable=True)
+    
+    # Latest prediction
+    latest_prediction_id = Column(Integer, ForeignKey("predictions.id", ondelete="SET NULL"), nullable=True)
+    latest_status = Column(String, nullable=True)
+    latest_confidence = Column(Float, nullable=True)
+    latest_prediction_at = Column(DateTime, nullable=True)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    @property
+    def mean_temperature(self):
+        return self.temperature_sum / self.reading_count if self.reading_count else None
+    
+    @property
+    def mean_pressure(self):
+        return self.pressure_sum / self.reading_count if self.reading_count else None
+    
+    @property
+    def mean_vibration(self):
+        return self.vibration_sum / self.reading_count if self.reading_count else None
+    
+    def __repr__(self):
+        return f"<DeviceLatestState(device_id='{self.device_id}', last_timestamp='{self.last_timestamp}')>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
 from app.database import Base
 from datetime import datetime
 
@@ -14,5 +14,10 @@ class Prediction(Base):
     recommendation = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     
+    __table_args__ = (
+        # Latest prediction per device (DISTINCT ON / row_number) reads this index in order
+        Index("ix_predictions_device_id_timestamp", device_id, prediction_timestamp.desc(), id.desc()),
+    )
+    
     def __repr__(self):
         return f"<Prediction(device_id='{self.device_id}', status='{self.predicted_status}')>"
\ No newline at end of file
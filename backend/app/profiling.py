@@ -0,0 +1,249 @@
+import contextvars
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Shared secret: requests sending it in X-Profile-Token are profiled, and it is
+# required to read stored profiles (unset disables both)
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+# Fraction of requests profiled without the header (0 disables sampling)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Seconds between stack samples of a profiled request
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+# Profiles kept in memory per worker process, oldest dropped first
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "50"))
+
+PROFILE_HEADER = b"x-profile-token"
+REQUEST_ID_HEADER = b"x-request-id"
+_REQUEST_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+def _frame_label(code) -> str:
+    # Last two path components keep app/ml/model.py apart from app/api/model.py
+    path = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+    return f"{code.co_qualname} ({path}:{code.co_firstlineno})"
+
+def _is_idle(frame) -> bool:
+    # The event loop waiting in selector.select() for I/O
+    return frame.f_code.co_name == "select" and frame.f_code.co_filename.endswith("selectors.py")
+
+class RequestProfile:
+    """
+    Stack samples of one request. Each sample is the call stack, root first,
+    of a thread working on the request at that moment:
+
+    - the event loop thread whenever it is busy; with concurrent requests
+      this includes other requests' coroutines interleaved with this one
+    - threads running blocking work submitted through run_blocking
+    - worker threads whose stack contains the route's endpoint function
+      (sync endpoints)
+    """
+
+    def __init__(self, profile_id: str, method: str, path: str, endpoint_code=None,
+                 loop_thread: Optional[int] = None):
+        self.id = profile_id
+        self.method = method
+        self.path = path
+        self.endpoint_code = endpoint_code
+        self.loop_thread = loop_thread if loop_thread is not None else threading.get_ident()
+        self.started_at = datetime.utcnow()
+        self.duration_seconds: Optional[float] = None
+        self.status: Optional[int] = None
+        self.sample_count = 0
+        self.stacks: Counter = Counter()
+        self._threads: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def wrap(self, func: Callable[..., Any]) -> Callable[..., Any]:
+        """Mark the thread running func as working on this request while it runs"""
+        @wraps(func)
+        def run(*args, **kwargs):
+            ident = threading.get_ident()
+            with self._lock:
+                self._threads.add(ident)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._threads.discard(ident)
+        return run
+
+    def sample(self, frames: Dict[int, Any]):
+        with self._lock:
+            threads = set(self._threads)
+        for ident, frame in frames.items():
+            if ident == self.loop_thread:
+                if _is_idle(frame):
+                    continue
+            elif ident not in threads:
+                if self.endpoint_code is None:
+                    continue
+                if not any(f.f_code is self.endpoint_code for f in self._walk(frame)):
+                    continue
+            stack = tuple(_frame_label(f.f_code) for f in reversed(list(self._walk(frame))))
+            self.stacks[stack] += 1
+            self.sample_count += 1
+
+    @staticmethod
+    def _walk(frame):
+        while frame is not None:
+            yield frame
+            frame = frame.f_back
+
+    def collapsed(self) -> str:
+        """Samples in the collapsed stack format read by flamegraph.pl and speedscope"""
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top_functions(self, limit: int = 30) -> List[Dict[str, Any]]:
+        """Functions by samples spent in them (total) and in their own code (self)"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in self.stacks.items():
+            own[stack[-1]] += count
+            for label in set(stack):
+                total[label] += count
+        return [
+            {'function': label, 'total_samples': count, 'self_samples': own[label]}
+            for label, count in total.most_common(limit)
+        ]
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            'id': self.id,
+            'method': self.method,
+            'path': self.path,
+            'status': self.status,
+            'started_at': self.started_at.isoformat(),
+            'duration_seconds': self.duration_seconds,
+            'samples': self.sample_count,
+            'interval_seconds': PROFILE_INTERVAL,
+        }
+
+class _Sampler(threading.Thread):
+    def __init__(self, profile: RequestProfile, interval: float):
+        super().__init__(name=f"profiler-{profile.id}", daemon=True)
+        self.profile = profile
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        own = threading.get_ident()
+        while not self._stop_event.wait(self.interval):
+            frames = sys._current_frames()
+            frames.pop(own, None)
+            self.profile.sample(frames)
+
+    def stop(self):
+        """Signal the sampler to stop; join() waits for its last sample"""
+        self._stop_event.set()
+
+class ProfileStore:
+    """Most recent request profiles of this worker, by id"""
+
+    def __init__(self, max_stored: int = PROFILE_MAX_STORED):
+        self.max_stored = max_stored
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile):
+        with self._lock:
+            self._profiles.pop(profile.id, None)
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_stored:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[RequestProfile]:
+        """Stored profiles, newest first"""
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+    def clear(self):
+        with self._lock:
+            self._profiles.clear()
+
+# The profile of the request being handled, visible to worker threads started from it
+current_profile: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar("current_profile", default=None)
+
+def valid_token(token: Optional[str]) -> bool:
+    return bool(PROFILE_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_TOKEN)
+
+def _endpoint_code(scope) -> Any:
+    # Resolved up front (only for profiled requests) to recognize sync endpoints on worker threads
+    from starlette.routing import Match
+    app = scope.get("app")
+    for route in getattr(getattr(app, "router", None), "routes", ()):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(getattr(route, "endpoint", None), "__code__", None)
+    return None
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling opted-in requests: those sending the
+    PROFILE_TOKEN in X-Profile-Token, and a PROFILE_SAMPLE_RATE fraction of
+    all others. The profile is stored under the request's X-Request-ID (or a
+    generated id), returned in the X-Profile-Id response header. Requests
+    that are not profiled only pay for one header lookup.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _wanted(self, scope) -> bool:
+        if PROFILE_TOKEN:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return valid_token(value.decode("latin-1"))
+        return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not (PROFILE_TOKEN or PROFILE_SAMPLE_RATE > 0) or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope["headers"]).get(REQUEST_ID_HEADER, b"").decode("latin-1")
+        if not _REQUEST_ID.match(request_id):
+            request_id = uuid.uuid4().hex
+        profile = RequestProfile(request_id, scope["method"], scope["path"], _endpoint_code(scope))
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", request_id.encode())]
+            await send(message)
+
+        token = current_profile.set(profile)
+        sampler = _Sampler(profile, PROFILE_INTERVAL)
+        start = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profile.duration_seconds = time.perf_counter() - start
+            current_profile.reset(token)
+            sampler.stop()
+            # Imported here: run_blocking registers its threads with the current profile
+            from app.concurrency import run_blocking
+            # The last sampling interval may still be running, wait for it off the event loop
+            await run_blocking(sampler.join)
+            profile_store.add(profile)
+            logger.info(f"Profiled {profile.method} {profile.path} as {profile.id}: "
+                        f"{profile.duration_seconds * 1000:.0f} ms, {profile.sample_count} samples")
+
+# Initialize global profile store
+profile_store = ProfileStore()
@@ -0,0 +1,25 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import datetime
+
+class DeviceLatestState(BaseModel):
+    device_id: str
+    last_timestamp: Optional[datetime] = None
+    usage_hours: Optional[float] = None
+    temperature: Optional[float] = None
+    pressure: Optional[float] = None
+    vibration: Optional[float] = None
+    error_count: Optional[int] = None
+    reading_count: int = 0
+    mean_temperature: Optional[float] = None
+    mean_pressure: Optional[float] = None
+    mean_vibration: Optional[float] = None
+    max_temperature: Optional[float] = None
+    max_vibration: Optional[float] = None
+    error_count_sum: int = 0
+    latest_status: Optional[str] = None
+    latest_confidence: Optional[float] = None
+    latest_prediction_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,372 @@
+import json
+import logging
+import math
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import exc
+from app.crud import device_data as crud_device_data
+from app.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Readings written per transaction
+TELEMETRY_BATCH_SIZE = int(os.getenv("TELEMETRY_BATCH_SIZE", "1000"))
+# Seconds a reading may wait in the buffer before a partial batch is flushed
+TELEMETRY_FLUSH_INTERVAL = float(os.getenv("TELEMETRY_FLUSH_INTERVAL", "1.0"))
+# Readings buffered before new submissions are rejected (backpressure)
+TELEMETRY_MAX_BUFFERED = int(os.getenv("TELEMETRY_MAX_BUFFERED", "100000"))
+# Seconds between retries of a failed flush, doubled up to TELEMETRY_MAX_RETRY_DELAY
+TELEMETRY_RETRY_DELAY = 0.5
+TELEMETRY_MAX_RETRY_DELAY = 30.0
+# Failed attempts at a batch before it is split up to isolate the readings the database refuses
+TELEMETRY_MAX_FLUSH_ATTEMPTS = int(os.getenv("TELEMETRY_MAX_FLUSH_ATTEMPTS", "3"))
+
+# device_data.error_count is a 32-bit INTEGER
+MAX_ERROR_COUNT = 2 ** 31 - 1
+
+NUMERIC_FIELDS = ('usage_hours', 'temperature', 'pressure', 'vibration')
+TEXT_FIELDS = ('error_codes', 'maintenance_notes')
+
+class TelemetryFull(Exception):
+    """The buffer cannot take more readings until the writer catches up"""
+
+class TelemetryUnavailable(Exception):
+    """The writer is not running"""
+
+def decode_payload(body: bytes, content_type: str) -> List[Dict[str, Any]]:
+    """
+    Decode a telemetry request body: newline-delimited JSON, a JSON object or
+    array, or msgpack (a map or an array of maps)
+    """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if content_type in ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack'):
+        try:
+            import msgpack
+        except ImportError:
+            raise ValueError("msgpack payloads require the msgpack package")
+        try:
+            payload = msgpack.unpackb(body, raw=False, timestamp=3)
+        except Exception as e:
+            raise ValueError(f"Invalid msgpack payload: {e}")
+    elif content_type == 'application/json':
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Invalid JSON payload: {e}")
+    else:
+        # JSON lines (application/x-ndjson, application/jsonl, text/plain)
+        payload = []
+        for line_number, line in enumerate(body.splitlines(), 1):
+            if line.strip():
+                try:
+                    payload.append(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Invalid JSON on line {line_number}: {e}")
+
+    readings = payload if isinstance(payload, list) else [payload]
+    if not all(isinstance(reading, dict) for reading in readings):
+        raise ValueError("Every reading must be an object")
+    return readings
+
+def coerce_reading(reading: Dict[str, Any], received_at: datetime) -> Dict[str, Any]:
+    """
+    Turn one decoded reading into a device_data record. The timestamp may be
+    an ISO 8601 string, epoch seconds or a datetime and defaults to the
+    receive time. Raises ValueError for readings that cannot be stored.
+    """
+    device_id = reading.get('device_id')
+    if not isinstance(device_id, str) or not device_id:
+        raise ValueError("device_id is required")
+
+    record = {'device_id': device_id, 'timestamp': _parse_timestamp(reading.get('timestamp'), received_at)}
+    for field in NUMERIC_FIELDS:
+        value = reading.get(field)
+        record[field] = _finite(field, value) if value is not None else None
+    error_count = reading.get('error_count')
+    record['error_count'] = int(_finite('error_count', error_count)) if error_count is not None else 0
+    if not 0 <= record['error_count'] <= MAX_ERROR_COUNT:
+        raise ValueError(f"error_count must be between 0 and {MAX_ERROR_COUNT}")
+    for field in TEXT_FIELDS:
+        value = reading.get(field)
+        record[field] = str(value) if value is not None else None
+    return record
+
+def _finite(field: str, value: Any) -> float:
+    # Infinities and NaN would be stored as is (or refused by the database with the whole batch)
+    try:
+        number = float(value)
+    except OverflowError:
+        number = math.inf
+    if not math.isfinite(number):
+        raise ValueError(f"{field} must be a finite number")
+    return number
+
+def _parse_timestamp(value: Any, default: datetime) -> datetime:
+    if value is None:
+        return default
+    if isinstance(value, datetime):
+        timestamp = value
+    elif isinstance(value, (int, float)):
+        try:
+            timestamp = datetime.fromtimestamp(value, tz=timezone.utc)
+        except (OverflowError, OSError) as e:
+            raise ValueError(f"timestamp out of range: {e}")
+    else:
+        timestamp = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    # Stored as naive UTC like the rest of device_data
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+class _Waiter:
+    """A submit() call waiting for its readings (sequence numbers first_seq to last_seq)"""
+
+    def __init__(self, first_seq: int, last_seq: int, callback: Callable[[bool], None]):
+        self.first_seq = first_seq
+        self.last_seq = last_seq
+        self.callback = callback
+        self.ok = True
+
+def _notify(done: List[Tuple[_Waiter, bool]]):
+    for waiter, ok in done:
+        try:
+            waiter.callback(ok)
+        except Exception as e:
+            # e.g. the event loop of a waiting request closed meanwhile
+            logger.warning(f"Error notifying a telemetry waiter: {e}")
+
+def _unreachable(error: Exception) -> bool:
+    # Connection failures and pool timeouts say nothing about the readings, retry them as they are
+    return isinstance(error, (exc.OperationalError, exc.InterfaceError, exc.TimeoutError)) or \
+        getattr(error, 'connection_invalidated', False)
+
+class TelemetryWriter:
+    """
+    In-process buffer of telemetry readings drained by a background thread
+    that inserts them in micro-batches: a batch is written once
+    batch_size readings are waiting or the oldest has waited flush_interval.
+
+    Delivery into device_data is at-least-once for accepted readings: a batch
+    leaves the buffer only after its transaction committed, failed flushes are
+    retried with backoff. A batch the database still refuses after
+    TELEMETRY_MAX_FLUSH_ATTEMPTS (for a reason other than being unreachable)
+    is written in halves down to single readings; readings refused on their
+    own are logged and dropped, counted in stats() as dropped, so one bad row
+    cannot stall the pipeline. Every accepted reading gets a sequence number so
+    callers can wait for it to be committed. Submissions beyond max_buffered
+    readings are refused so a slow database pushes back on clients instead
+    of growing memory.
+    """
+
+    def __init__(self, session_factory=SessionLocal, batch_size: int = TELEMETRY_BATCH_SIZE,
+                 flush_interval: float = TELEMETRY_FLUSH_INTERVAL, max_buffered: int = TELEMETRY_MAX_BUFFERED):
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+
+        self._buffer: List[Tuple[int, float, Dict[str, Any]]] = []
+        self._waiters: List[_Waiter] = []
+        self._condition = threading.Condition()
+        self._next_seq = 1
+        self._committed_seq = 0
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+        self.accepted = 0
+        self.rejected = 0
+        self.written = 0
+        self.batches = 0
+        self.failed_flushes = 0
+        self.dropped = 0
+        self.last_flush_seconds: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def submit(self, records: Iterable[Dict[str, Any]],
+               on_committed: Optional[Callable[[bool], None]] = None) -> int:
+        """
+        Buffer device_data records for writing. Returns the sequence number of
+        the last one, to pass to wait_committed. on_committed is called on the
+        writer thread once they are all written (True), or dropped or abandoned
+        at shutdown (False). Raises TelemetryFull when the buffer has no room
+        for all of them and TelemetryUnavailable when the writer is stopped;
+        nothing is buffered in either case.
+        """
+        records = list(records)
+        with self._condition:
+            if not self.running or self._stopping:
+                raise TelemetryUnavailable("Telemetry writer is not running")
+            if len(self._buffer) + len(records) > self.max_buffered:
+                self.rejected += len(records)
+                raise TelemetryFull(f"Telemetry buffer is full ({len(self._buffer)} readings waiting)")
+
+            now = time.monotonic()
+            first_seq = self._next_seq
+            for record in records:
+                self._buffer.append((self._next_seq, now, record))
+                self._next_seq += 1
+            if on_committed is not None and records:
+                self._waiters.append(_Waiter(first_seq, self._next_seq - 1, on_committed))
+            self.accepted += len(records)
+            if len(self._buffer) >= self.batch_size:
+                self._condition.notify_all()
+            return self._next_seq - 1
+
+    def wait_committed(self, seq: int, timeout: Optional[float] = None) -> bool:
+        """
+        Block until the reading with sequence number seq is committed (or
+        dropped). Async callers pass on_committed to submit instead.
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: self._committed_seq >= seq, timeout=timeout)
+
+    def start(self):
+        with self._condition:
+            if self.running:
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="telemetry-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 30.0):
+        """Stop accepting readings and flush what is buffered"""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                'running': self.running,
+                'buffered': len(self._buffer),
+                'max_buffered': self.max_buffered,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+                'written': self.written,
+                'batches': self.batches,
+                'failed_flushes': self.failed_flushes,
+                'dropped': self.dropped,
+                'last_flush_seconds': self.last_flush_seconds,
+                'last_error': self.last_error,
+            }
+
+    def _run(self):
+        retry_delay = TELEMETRY_RETRY_DELAY
+        attempts = 0
+        while True:
+            with self._condition:
+                while not self._batch_due():
+                    # Wake up when the oldest buffered reading is due
+                    age = time.monotonic() - self._buffer[0][1] if self._buffer else 0.0
+                    self._condition.wait(timeout=max(self.flush_interval - age, 0.001))
+                if not self._buffer:
+                    # Stopping with nothing left to write
+                    return
+                # The batch stays at the head of the buffer until it is committed
+                batch = self._buffer[:self.batch_size]
+
+            error = self._flush(batch)
+            if error is not None:
+                attempts += 1
+                if attempts >= TELEMETRY_MAX_FLUSH_ATTEMPTS and not _unreachable(error):
+                    error = self._flush_apart(batch)
+            if error is None:
+                retry_delay = TELEMETRY_RETRY_DELAY
+                attempts = 0
+            else:
+                with self._condition:
+                    # Give up on retries only when shutting down
+                    if self._stopping:
+                        logger.error(f"Dropping {len(self._buffer)} buffered telemetry readings on shutdown")
+                        waiters, self._waiters = self._waiters, []
+                    else:
+                        waiters = None
+                        self._condition.wait(timeout=retry_delay)
+                if waiters is not None:
+                    _notify([(waiter, False) for waiter in waiters])
+                    return
+                retry_delay = min(retry_delay * 2, TELEMETRY_MAX_RETRY_DELAY)
+
+    def _batch_due(self) -> bool:
+        if self._stopping or len(self._buffer) >= self.batch_size:
+            return True
+        return bool(self._buffer) and time.monotonic() - self._buffer[0][1] >= self.flush_interval
+
+    def _flush(self, batch: List[Tuple[int, float, Dict[str, Any]]]) -> Optional[Exception]:
+        """Write a batch from the head of the buffer; returns the error if it failed"""
+        start = time.perf_counter()
+        db = self.session_factory()
+        try:
+            crud_device_data.insert_device_data_records(db, [record for _, _, record in batch])
+        except Exception as e:
+            db.rollback()
+            with self._condition:
+                self.failed_flushes += 1
+                self.last_error = str(e)
+            logger.error(f"Error flushing {len(batch)} telemetry readings: {e}")
+            return e
+        finally:
+            db.close()
+
+        with self._condition:
+            self.written += len(batch)
+            self.batches += 1
+            self.last_flush_seconds = time.perf_counter() - start
+            done = self._settle(batch, dropped=False)
+        _notify(done)
+        return None
+
+    def _flush_apart(self, batch: List[Tuple[int, float, Dict[str, Any]]]) -> Optional[Exception]:
+        """
+        Write a batch the database keeps refusing in halves, in order, down to
+        single readings, dropping the readings refused on their own. Stops at
+        the first error caused by the database being unreachable and returns
+        it; the rest of the batch stays buffered for the usual retries.
+        """
+        middle = len(batch) // 2
+        for part in (batch[:middle], batch[middle:]):
+            if not part:
+                continue
+            error = self._flush(part)
+            if error is None:
+                continue
+            if _unreachable(error):
+                return error
+            if len(part) > 1:
+                error = self._flush_apart(part)
+                if error is not None:
+                    return error
+                continue
+            logger.error(f"Dropping telemetry reading refused by the database: {part[0][2]!r} ({error})")
+            with self._condition:
+                self.dropped += 1
+                done = self._settle(part, dropped=True)
+            _notify(done)
+        return None
+
+    def _settle(self, part: List[Tuple[int, float, Dict[str, Any]]], dropped: bool) -> List[Tuple[_Waiter, bool]]:
+        # Called with the lock held; part is at the head of the buffer. Returns
+        # the waiters whose readings are now all written or dropped, to notify
+        # once the lock is released.
+        del self._buffer[:len(part)]
+        self._committed_seq = part[-1][0]
+        self._condition.notify_all()
+        done, pending = [], []
+        for waiter in self._waiters:
+            if dropped and waiter.first_seq <= part[0][0] <= waiter.last_seq:
+                waiter.ok = False
+            (done if waiter.last_seq <= self._committed_seq else pending).append(waiter)
+        self._waiters = pending
+        return [(waiter, waiter.ok) for waiter in done]
+
+telemetry_writer = TelemetryWriter()
@@ -1,10 +1,11 @@
-from app.database import Base, engine
-from app.models import user, device, device_data, prediction
+import os
+from alembic import command
+from alembic.config import Config
 
 def init_db():
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    # Create or upgrade all tables through the Alembic migrations
+    command.upgrade(Config(os.path.join(os.path.dirname(os.path.abspath(__file__)), "alembic.ini")), "head")
     print("Database tables created successfully!")
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
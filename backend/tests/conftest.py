@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(BACKEND_DIR))
+
+# Run the suite against a throwaway SQLite database unless one is configured
+os.environ.setdefault(
+    "DATABASE_URL",
+    "sqlite:///" + os.path.join(tempfile.gettempdir(), "medipredict_test.db")
+)
+
+@pytest.fixture
+def db():
+    from app.database import Base, engine, SessionLocal
+    from app.models import user, device, device_data, prediction, device_latest_state
+    from app.device_registry import device_registry
+    from app.ml.features import online_features
+
+    Base.metadata.drop_all(bind=engine)
+    device_registry.invalidate()
+    online_features.invalidate()
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
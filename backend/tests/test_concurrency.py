@@ -0,0 +1,58 @@
+import asyncio
+import threading
+import time
+from app import concurrency
+
+def test_run_blocking_uses_bounded_worker_threads(monkeypatch):
+    monkeypatch.setattr(concurrency, "BLOCKING_THREADS", 2)
+    running, peak = [0], [0]
+    lock = threading.Lock()
+    
+    def work():
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.05)
+        with lock:
+            running[0] -= 1
+        return threading.current_thread().name
+    
+    async def main():
+        return await asyncio.gather(*[concurrency.run_blocking(work) for _ in range(6)])
+    
+    names = asyncio.run(main())
+    assert threading.main_thread().name not in names
+    assert peak[0] == 2
+
+def test_lag_monitor_records_stalls():
+    monitor = concurrency.EventLoopLagMonitor(interval=0.01, threshold=0.05)
+    
+    async def main():
+        monitor.start()
+        await asyncio.sleep(0.05)
+        # Blocks the loop like sync work in an async def endpoint would
+        time.sleep(0.2)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+    
+    asyncio.run(main())
+    stats = monitor.stats()
+    assert stats["stalls"] == 1 and stats["max_lag_seconds"] >= 0.15
+    assert stats["samples"] > 3 and not stats["running"]
+
+def test_login_hashes_on_password_pool(db):
+    from fastapi.testclient import TestClient
+    from app import auth
+    from app.main import app
+    
+    hashed = auth.get_password_hash("secret")
+    assert auth.verify_password("secret", hashed)
+    assert asyncio.run(auth.verify_password_async("secret", hashed))
+    
+    with TestClient(app) as client:
+        client.post("/api/auth/register", json={
+            "username": "alice", "email": "alice@example.com", "password": "secret", "role": "technician"
+        })
+        assert client.post("/api/auth/token", data={"username": "alice", "password": "secret"}).status_code == 200
+        assert client.post("/api/auth/token", data={"username": "alice", "password": "wrong"}).status_code == 401
+        assert client.get("/health/event-loop").json()["running"]
@@ -0,0 +1,274 @@
+import asyncio
+from datetime import datetime, timedelta
+from fastapi import Response
+from app.crud import device_data as crud_device_data, prediction as crud_prediction
+from app.crud import device_latest_state as crud_latest_state
+from app.models.device_data import DeviceData
+from app.models.device_latest_state import DeviceLatestState
+from app.schemas.device_data import DeviceDataCreate
+from app.schemas.prediction import PredictionCreate, BulkPredictionRequest
+from app.api import predictions as predictions_api
+
+def _add_readings(db):
+    base = datetime(2024, 1, 1)
+    readings = [
+        dict(device_id="DEV-1", timestamp=base, temperature=30, error_count=0),
+        dict(device_id="DEV-1", timestamp=base + timedelta(hours=2), temperature=50, error_count=8),
+        dict(device_id="DEV-1", timestamp=base + timedelta(hours=1), temperature=35, error_count=1),
+        dict(device_id="DEV-2", timestamp=base, temperature=31, error_count=0),
+        dict(device_id="DEV-3", timestamp=base, temperature=32, error_count=0),
+    ]
+    crud_device_data.insert_device_data_records(db, readings)
+    return readings
+
+def test_latest_device_data_for_devices(db):
+    _add_readings(db)
+    
+    latest = crud_device_data.get_latest_device_data_for_devices(db, device_ids=["DEV-1", "DEV-2", "DEV-9"])
+    latest_by_device = {reading.device_id: reading for reading in latest}
+    
+    assert set(latest_by_device) == {"DEV-1", "DEV-2"}
+    assert latest_by_device["DEV-1"].temperature == 50
+    
+    assert len(crud_device_data.get_latest_device_data_for_devices(db)) == 3
+    assert crud_device_data.get_latest_device_data_for_devices(db, device_ids=[]) == []
+
+def test_create_multiple_predictions_returns_generated_rows(db):
+    creates = [
+        PredictionCreate(device_id=f"DEV-{i}", predicted_status="healthy", confidence_score=0.9, features_used="[]")
+        for i in range(5)
+    ]
+    
+    created = crud_prediction.create_multiple_predictions(db, creates)
+    
+    assert [row.device_id for row in created] == [f"DEV-{i}" for i in range(5)]
+    assert all(row.id is not None and row.prediction_timestamp is not None for row in created)
+
+def test_bulk_predict_scores_latest_reading_per_device(db):
+    _add_readings(db)
+    
+    results = predictions_api.bulk_predict(BulkPredictionRequest(device_ids=["DEV-1", "DEV-2", "DEV-9"]),
+                                           response=Response(), db=db)
+    
+    assert sorted(result.device_id for result in results) == ["DEV-1", "DEV-2"]
+    assert len(crud_prediction.get_recent_predictions(db)) == 2
+
+def test_bulk_predict_skips_devices_that_fail_to_score(db, monkeypatch):
+    _add_readings(db)
+    predict_latest_states = predictions_api.predictor.predict_latest_states
+    
+    def failing_for_dev_2(session, states):
+        if any(state.device_id == "DEV-2" for state in states):
+            raise ValueError("bad reading")
+        return predict_latest_states(session, states)
+    
+    monkeypatch.setattr(predictions_api.predictor, "predict_latest_states", failing_for_dev_2)
+    response = Response()
+    results = predictions_api.bulk_predict(BulkPredictionRequest(device_ids=["DEV-1", "DEV-2", "DEV-3"]),
+                                           response=response, db=db)
+    
+    assert sorted(result.device_id for result in results) == ["DEV-1", "DEV-3"]
+    assert response.headers["X-Failed-Devices"] == "DEV-2"
+
+def test_create_multiple_device_data_returns_generated_rows(db):
+    creates = [DeviceDataCreate(device_id="DEV-1", temperature=30 + i) for i in range(3)]
+    
+    created = crud_device_data.create_multiple_device_data(db, creates)
+    
+    assert [row.temperature for row in created] == [30, 31, 32]
+    assert all(row.id is not None and row.timestamp is not None and row.created_at is not None for row in created)
+
+def test_bulk_insert_device_data_returns_count(db):
+    creates = [DeviceDataCreate(device_id="DEV-1", error_count=i) for i in range(4)]
+    
+    assert crud_device_data.bulk_insert_device_data(db, creates) == 4
+    assert db.query(DeviceData).count() == 4
+
+def test_dashboard_uses_etag(db):
+    from fastapi.testclient import TestClient
+    from app.database import get_db
+    from app.main import app
+    from app.models.device import Device
+    
+    db.add_all([
+        Device(device_id=f"DEV-{i}", name=f"Device {i}", type="Monitor", manufacturer="Acme", model="M1",
+               serial_number=f"SN-{i}", installation_date=datetime(2024, 1, 1))
+        for i in (1, 2, 3)
+    ])
+    db.commit()
+    _add_readings(db)
+    predictions_api.bulk_predict(BulkPredictionRequest(device_ids=["DEV-1"]), response=Response(), db=db)
+    
+    app.dependency_overrides[get_db] = lambda: db
+    try:
+        client = TestClient(app)
+        response = client.get("/api/dashboard/")
+        assert response.status_code == 200
+        body = response.json()
+        assert body['total_devices'] == 3
+        assert sum(body['status_breakdown'].values()) == 3
+        assert body['status_breakdown']['unknown'] == 2
+        assert all(entry['explanation'] is not None for entry in body['devices'])
+        
+        etag = response.headers['etag']
+        assert client.get("/api/dashboard/", headers={"If-None-Match": etag}).status_code == 304
+        
+        db.add(DeviceData(device_id="DEV-2", timestamp=datetime(2024, 2, 1), temperature=44))
+        db.commit()
+        assert client.get("/api/dashboard/", headers={"If-None-Match": etag}).status_code == 200
+    finally:
+        app.dependency_overrides.clear()
+
+def test_time_ordered_device_data_access(db):
+    base = datetime(2024, 1, 1)
+    db.add_all([DeviceData(device_id="DEV-1", timestamp=base + timedelta(hours=h), temperature=h) for h in (3, 0, 4, 1, 2)])
+    # Two readings sharing a timestamp are ordered by id
+    db.add_all([DeviceData(device_id="DEV-1", timestamp=base + timedelta(hours=5), temperature=t) for t in (50, 51)])
+    db.add(DeviceData(device_id="DEV-2", timestamp=base + timedelta(hours=9), temperature=99))
+    db.commit()
+    
+    latest = crud_device_data.get_latest_device_data(db, "DEV-1", limit=3)
+    assert [data.temperature for data in latest] == [51, 50, 4]
+    
+    in_range = crud_device_data.get_device_data_in_range(db, "DEV-1", start=base + timedelta(hours=1), end=base + timedelta(hours=4))
+    assert [data.temperature for data in in_range] == [3, 2, 1]
+    
+    pages = []
+    page = crud_device_data.get_device_data_page(db, "DEV-1", limit=3)
+    while page:
+        pages.append([data.temperature for data in page])
+        page = crud_device_data.get_device_data_page(db, "DEV-1", before_timestamp=page[-1].timestamp, before_id=page[-1].id, limit=3)
+    assert pages == [[51, 50, 4], [3, 2, 1], [0]]
+
+def _state_columns(db):
+    return {
+        state.device_id: (
+            state.last_timestamp, state.temperature, state.error_count, state.reading_count,
+            state.temperature_sum, state.error_count_sum, state.max_temperature, state.latest_prediction_id
+        )
+        for state in db.query(DeviceLatestState).all()
+    }
+
+def test_latest_state_maintained_on_ingest(db):
+    _add_readings(db)
+    # An older reading arriving late must not replace the latest one
+    crud_device_data.create_multiple_device_data(db, [
+        DeviceDataCreate(device_id="DEV-1", timestamp=datetime(2023, 12, 31), temperature=60, error_count=2),
+        DeviceDataCreate(device_id="DEV-4", temperature=33)
+    ])
+    predictions_api.bulk_predict(BulkPredictionRequest(device_ids=["DEV-1", "DEV-2"]), response=Response(), db=db)
+    
+    state = crud_latest_state.get_latest_state(db, "DEV-1")
+    assert state.temperature == 50 and state.error_count == 8
+    assert state.reading_count == 4 and state.max_temperature == 60
+    assert state.mean_temperature == (30 + 50 + 35 + 60) / 4
+    assert state.latest_status is not None
+    
+    # Incremental maintenance agrees with a full rebuild from the base tables
+    incremental = _state_columns(db)
+    crud_latest_state.rebuild_latest_states(db)
+    db.commit()
+    db.expire_all()
+    assert _state_columns(db) == incremental
+    
+    # Deleting the latest reading falls back to the previous one
+    latest_id = crud_device_data.get_latest_device_data(db, "DEV-1")[0].id
+    crud_device_data.delete_device_data(db, latest_id)
+    db.expire_all()
+    state = crud_latest_state.get_latest_state(db, "DEV-1")
+    assert state.temperature == 35 and state.reading_count == 3
+
+def test_summary_report_counts_latest_prediction_per_device(db):
+    from app.api import reports as reports_api
+    from app.models.device import Device
+    
+    db.add_all([
+        Device(device_id=f"DEV-{i}", name=f"Device {i}", type="Monitor" if i < 3 else "Pump",
+               manufacturer="Acme", model="M1", serial_number=f"SN-{i}", installation_date=datetime(2024, 1, 1))
+        for i in (1, 2, 3, 4)
+    ])
+    db.commit()
+    crud_prediction.create_multiple_predictions(db, [
+        PredictionCreate(device_id="DEV-1", predicted_status="healthy", confidence_score=0.9, features_used="[]"),
+        PredictionCreate(device_id="DEV-2", predicted_status="at_risk", confidence_score=0.8, features_used="[]"),
+        PredictionCreate(device_id="DEV-3", predicted_status="healthy", confidence_score=0.7, features_used="[]"),
+    ])
+    # A newer prediction supersedes DEV-1's first one
+    crud_prediction.create_multiple_predictions(db, [
+        PredictionCreate(device_id="DEV-1", predicted_status="needs_maintenance", confidence_score=0.6, features_used="[]")
+    ])
+    
+    summary = asyncio.run(_summary_report(reports_api, by_type=True, by_manufacturer=True))
+    
+    assert summary["total_devices"] == 4
+    assert summary["status_breakdown"] == {'healthy': 1, 'at_risk': 1, 'needs_maintenance': 1, 'unknown': 1}
+    assert summary["by_type"]["Pump"] == {'healthy': 1, 'at_risk': 0, 'needs_maintenance': 0, 'unknown': 1}
+    assert summary["by_manufacturer"]["Acme"]["needs_maintenance"] == 1
+    assert "by_type" not in asyncio.run(_summary_report(reports_api))
+
+async def _summary_report(reports_api, **kwargs):
+    from app.database import AsyncSessionLocal
+    
+    async with AsyncSessionLocal() as session:
+        return await reports_api.get_summary_report(db=session, **kwargs)
+
+def test_async_read_and_bulk_upload_endpoints(db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    
+    client = TestClient(app)
+    response = client.post("/api/devices/bulk-upload-data", json={
+        "device_id": "DEV-7",
+        "data": [{"device_id": "DEV-7", "timestamp": f"2024-01-0{day}T00:00:00", "temperature": 30 + day}
+                 for day in (1, 2, 3)]
+    })
+    assert response.status_code == 200
+    
+    page = client.get("/api/devices/DEV-7/data", params={"limit": 2}).json()
+    assert [reading["temperature"] for reading in page] == [33, 32]
+    devices = client.get("/api/devices/").json()
+    assert [device["device_id"] for device in devices] == ["DEV-7"]
+    assert crud_latest_state.get_latest_state(db, "DEV-7").reading_count == 3
+
+def test_ensure_devices_exist_registers_once_and_caches(db):
+    from sqlalchemy import event
+    from app.crud import device as crud_device
+    from app.database import engine
+    from app.device_registry import device_registry
+    
+    assert crud_device.ensure_devices_exist(db, ["DEV-1", "DEV-2"]) == {"DEV-1", "DEV-2"}
+    assert crud_device.get_device_by_device_id(db, "DEV-2").manufacturer == "Unknown"
+    
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(engine, "before_cursor_execute", listener)
+    try:
+        # Cached ids need no query, new ones one SELECT and one INSERT
+        assert crud_device.ensure_devices_exist(db, ["DEV-1", "DEV-2"]) == set()
+        assert statements == []
+        assert crud_device.ensure_devices_exist(db, ["DEV-2", "DEV-3"]) == {"DEV-3"}
+        assert len(statements) == 2
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+    
+    # A device registered concurrently is skipped by ON CONFLICT DO NOTHING
+    db.execute(*crud_device.placeholder_devices_insert(db.get_bind().dialect.name, ["DEV-3", "DEV-4"]))
+    db.commit()
+    assert len(crud_device.get_devices(db)) == 4
+    
+    crud_device.delete_device(db, crud_device.get_device_by_device_id(db, "DEV-4").id)
+    assert device_registry.known(["DEV-1", "DEV-4"]) == {"DEV-1"}
+
+def test_latest_state_upserts_rows_in_device_id_order():
+    from types import SimpleNamespace
+    
+    readings = [{"device_id": device_id, "timestamp": datetime(2024, 1, 1), "temperature": 30.0}
+                for device_id in ("DEV-3", "DEV-1", "DEV-2", "DEV-1")]
+    _, states = crud_latest_state.readings_upsert("postgresql", readings)
+    assert [state["device_id"] for state in states] == ["DEV-1", "DEV-2", "DEV-3"]
+    
+    predictions = [SimpleNamespace(id=i, device_id=device_id, predicted_status="healthy", confidence_score=0.9,
+                                   prediction_timestamp=datetime(2024, 1, 1))
+                   for i, device_id in enumerate(("DEV-2", "DEV-1"))]
+    _, states = crud_latest_state.predictions_upsert("postgresql", predictions)
+    assert [state["device_id"] for state in states] == ["DEV-1", "DEV-2"]
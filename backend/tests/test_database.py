@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import create_engine, exc
+
+def test_instrumented_pool_records_waits_and_timeouts(tmp_path):
+    from app import database
+    
+    engine = database._instrument(create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}", poolclass=database.InstrumentedQueuePool,
+        pool_size=1, max_overflow=0, pool_timeout=0.05
+    ), "test")
+    try:
+        with engine.connect():
+            # The only connection is checked out, the next checkout has to wait and time out
+            with pytest.raises(exc.TimeoutError):
+                engine.connect()
+        with engine.connect():
+            pass
+        
+        metrics = database.POOL_METRICS["test"].snapshot()
+        assert metrics["checkouts"] == 2
+        assert metrics["checkout_timeouts"] == 1
+        assert metrics["checkout_wait_seconds_max"] >= 0.05
+        assert metrics["connections_opened"] == 1
+    finally:
+        engine.dispose()
+        database.POOL_METRICS.pop("test", None)
+
+def test_db_pool_health_endpoint(db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    
+    body = TestClient(app).get("/health/db-pool").json()
+    
+    assert body["status"] == "ok"
+    assert body["pools"]["sync"]["pool_class"] == "InstrumentedQueuePool"
+    assert body["pools"]["sync"]["checkouts"] >= 1
+
+def test_statement_instrumentation(tmp_path, monkeypatch, caplog):
+    from sqlalchemy import text
+    from app import database, metrics
+    
+    engine = database._instrument(create_engine(f"sqlite:///{tmp_path / 'queries.db'}"), "queries")
+    monkeypatch.setattr(database, "DB_SLOW_QUERY_SECONDS", 1e-9)
+    monkeypatch.setattr(database, "DB_SLOW_QUERY_EXPLAIN", True)
+    stats = metrics.RequestStats()
+    token = metrics.current_request.set(stats)
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)"))
+            for item_id in range(3):
+                conn.execute(text("SELECT name FROM items WHERE id = :id"), {"id": item_id})
+            conn.execute(text("SELECT name FROM items WHERE id IN (1, 2, 3)"))
+            conn.execute(text("SELECT name FROM items WHERE id IN (4, 5)"))
+            # Batched and repeated writes are intentional, not N+1 reads
+            conn.execute(text("INSERT INTO items (name) VALUES (:name)"), [{"name": "a"}, {"name": "b"}])
+            for name in ("c", "d"):
+                conn.execute(text("INSERT INTO items (name) VALUES (:name)"), {"name": name})
+    finally:
+        metrics.current_request.reset(token)
+        engine.dispose()
+    
+    assert stats.db_queries == 9 and stats.db_seconds > 0
+    assert stats.repeated_statements(2) == {
+        "SELECT name FROM items WHERE id = ?": 3,
+        "SELECT name FROM items WHERE id IN (?)": 2,
+    }
+    slow = [record.getMessage() for record in caplog.records if record.getMessage().startswith("Slow query")]
+    assert len(slow) == 9
+    # SELECTs are logged with their parameters and query plan
+    assert "with (2,)" in slow[3] and "SEARCH items USING INTEGER PRIMARY KEY" in slow[3]
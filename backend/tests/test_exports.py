@@ -0,0 +1,75 @@
+import csv
+import gzip
+import io
+from datetime import datetime, timedelta
+from app.crud import device_data as crud_device_data
+
+def _client(db):
+    from fastapi.testclient import TestClient
+    from app.database import get_db
+    from app.main import app
+    
+    app.dependency_overrides[get_db] = lambda: db
+    return app, TestClient(app)
+
+def test_iter_csv_yields_one_chunk_per_partition():
+    from app import exports
+    
+    chunks = list(exports.iter_csv(["a", "b"], [[(1, None)], [(2, "x"), (3, "y")]]))
+    
+    assert chunks == [b"a,b\r\n", b"1,\r\n", b"2,x\r\n3,y\r\n"]
+
+def test_export_device_data_streams_every_reading(db):
+    from app.database import get_db
+    
+    base = datetime(2024, 1, 1)
+    crud_device_data.insert_device_data_records(db, [
+        dict(device_id="DEV-1", timestamp=base + timedelta(minutes=i), temperature=float(i), error_count=i % 3)
+        for i in range(50)
+    ])
+    
+    app, client = _client(db)
+    try:
+        response = client.get("/api/reports/export-device-data/DEV-1")
+        gzipped = client.get("/api/reports/export-device-data/DEV-1?gzip=true")
+        missing = client.get("/api/reports/export-device-data/DEV-9")
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 50
+    assert rows[0]["temperature"] == "49.0" and rows[-1]["temperature"] == "0.0"
+    
+    assert gzipped.headers["content-disposition"].endswith('.csv.gz"')
+    assert gzip.decompress(gzipped.content).decode("utf-8") == response.text
+    assert missing.status_code == 404
+
+def test_export_device_data_parquet_and_arrow_with_time_range(db):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    from app.database import get_db
+    
+    base = datetime(2024, 1, 1)
+    crud_device_data.insert_device_data_records(db, [
+        dict(device_id=f"DEV-{i % 2}", timestamp=base + timedelta(hours=i), temperature=float(i))
+        for i in range(20)
+    ])
+    
+    app, client = _client(db)
+    try:
+        parquet = client.get("/api/reports/export-device-data/DEV-0?format=parquet&start=2024-01-01T04:00:00")
+        arrow = client.get("/api/reports/export-device-data?format=arrow&end=2024-01-01T10:00:00")
+        invalid = client.get("/api/reports/export-device-data?format=xml")
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+    
+    table = pq.read_table(io.BytesIO(parquet.content))
+    assert table.column("temperature").to_pylist() == [18.0, 16.0, 14.0, 12.0, 10.0, 8.0, 6.0, 4.0]
+    assert table.schema.field("error_count").type == pa.int64()
+    
+    fleet = pa.ipc.open_stream(io.BytesIO(arrow.content)).read_all()
+    assert fleet.num_rows == 10
+    assert set(fleet.column("device_id").to_pylist()) == {"DEV-0", "DEV-1"}
+    assert invalid.status_code == 400
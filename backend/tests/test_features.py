@@ -0,0 +1,124 @@
+import pytest
+import numpy as np
+from datetime import datetime, timedelta
+from app.crud import device_data as crud_device_data, device_latest_state as crud_latest_state
+from app.ml import features
+from app.ml.features import DeviceWindow, OnlineFeatureStore, TREND_SIGNALS, batch_trend_features, window_features
+
+def _readings(n_devices=3, per_device=20, seed=7):
+    rng = np.random.default_rng(seed)
+    base = datetime(2024, 1, 1)
+    readings = []
+    for i in range(per_device):
+        for device in range(n_devices):
+            values = {signal: float(rng.normal(50, 10)) for signal in TREND_SIGNALS}
+            values['error_count'] = int(rng.integers(0, 10))
+            if rng.random() < 0.2:
+                values['temperature'] = None
+            readings.append(dict(device_id=f"DEV-{device}", timestamp=base + timedelta(minutes=i), **values))
+    return readings
+
+def _batch(readings, window):
+    ordered = sorted(readings, key=lambda reading: (reading['device_id'], reading['timestamp']))
+    values = np.array([[reading[signal] for signal in TREND_SIGNALS] for reading in ordered], dtype=np.float64)
+    return ordered, batch_trend_features([reading['device_id'] for reading in ordered], values, window=window)
+
+def test_online_windows_match_batch_features_bit_for_bit():
+    readings = _readings()
+    for window in (1, 2, 5):
+        ordered, batch = _batch(readings, window)
+        
+        # Feed readings one at a time in arrival order, as ingestion does
+        states = {}
+        online = {}
+        for reading in readings:
+            state = states.setdefault(reading['device_id'], DeviceWindow(window))
+            state.push(reading['timestamp'], [reading[signal] for signal in TREND_SIGNALS])
+            online[(reading['device_id'], reading['timestamp'])] = window_features(state.ordered()[None])[0]
+        
+        stacked = np.stack([online[(reading['device_id'], reading['timestamp'])] for reading in ordered])
+        assert np.isfinite(batch).all()
+        assert stacked.tobytes() == batch.tobytes()
+
+def test_window_features_statistics():
+    windows = np.array([[[1.0], [np.nan], [3.0], [5.0]]])
+    mean, slope, ewma, delta = window_features(windows, alpha=0.5)[0]
+    # The missing value is carried forward from the reading before it
+    assert mean == (1 + 1 + 3 + 5) / 4
+    assert np.isclose(slope, 1.4)
+    assert ewma == 0.5 * 5 + 0.5 * (0.5 * 3 + 0.5 * 1)
+    assert delta == 2.0
+
+def test_feature_store_advances_and_reloads_windows(db, monkeypatch):
+    readings = _readings(per_device=12)
+    crud_device_data.insert_device_data_records(db, readings[:18])
+    store = OnlineFeatureStore(window=4)
+    monkeypatch.setattr(crud_device_data, "online_features", store)
+    
+    def check(stored):
+        states = crud_latest_state.get_latest_states(db)
+        ordered, batch = _batch(stored, 4)
+        last_rows = [max(i for i, reading in enumerate(ordered) if reading['device_id'] == state.device_id)
+                     for state in states]
+        assert store.trend_features(db, states).tobytes() == batch[last_rows].tobytes()
+    
+    check(readings[:18])
+    
+    # New readings advance the tracked windows in place
+    window = store._windows["DEV-0"]
+    crud_device_data.insert_device_data_records(db, readings[18:30])
+    assert store._windows["DEV-0"] is window and window.reading_count == 10
+    check(readings[:30])
+    
+    # A reading older than the window drops it; it is rebuilt from the database
+    late = dict(readings[0], timestamp=readings[0]['timestamp'] - timedelta(minutes=1), temperature=99.0)
+    crud_device_data.insert_device_data_records(db, [late])
+    assert "DEV-0" not in store._windows
+    check(readings[:30] + [late])
+
+def test_unstored_readings_get_the_features_they_would_have_once_ingested(db):
+    readings = _readings(per_device=12)
+    crud_device_data.insert_device_data_records(db, readings[:30])
+    upcoming = readings[30:33] + [dict(readings[33], device_id="DEV-NEW")]
+    
+    for window in (1, 4):
+        store = OnlineFeatureStore(window=window)
+        ordered, batch = _batch(readings[:30] + upcoming, window)
+        rows = [ordered.index(reading) for reading in upcoming]
+        assert store.reading_trend_features(db, upcoming).tobytes() == batch[rows].tobytes()
+
+def test_training_with_trend_features_serves_trend_models(db, tmp_path):
+    import time
+    from app.database import SessionLocal
+    import pandas as pd
+    from app.ml.model import DeviceHealthPredictor, TrendFeaturesUnavailable
+    from app.ml.registry import ModelRegistry
+    from app.ml.training import TrainingJobManager
+    
+    crud_device_data.insert_device_data_records(db, _readings())
+    job_predictor = DeviceHealthPredictor(registry=ModelRegistry(str(tmp_path / "model.pkl")))
+    manager = TrainingJobManager(job_predictor, session_factory=SessionLocal, use_process_pool=False)
+    job = manager.submit(trend_features=True)
+    deadline = time.time() + 30
+    while job.status not in ("completed", "failed") and time.time() < deadline:
+        time.sleep(0.05)
+    manager.shutdown()
+    
+    assert job.status == "completed", job.error
+    assert job_predictor.registry.current().feature_names == job_predictor.feature_names + features.TREND_FEATURES
+    
+    predictions, feature_names = job_predictor.predict_latest_states(db, crud_latest_state.get_latest_states(db))
+    assert feature_names == job_predictor.registry.current().feature_names
+    assert len(predictions) == 3
+    
+    # Raw rows get their trend features from the device's stored readings, never zeros
+    reading = {signal: 50.0 for signal in TREND_SIGNALS}
+    served = job_predictor.registry.current()
+    X = job_predictor.row_matrix([dict(reading, device_id="DEV-0")], served, db)
+    trends = features.online_features.reading_trend_features(db, [dict(reading, device_id="DEV-0")])
+    assert X[0, len(job_predictor.feature_names):].tobytes() == trends[0].tobytes()
+    assert len(job_predictor.predict_values([dict(reading, device_id="DEV-0")], db=db)) == 1
+    with pytest.raises(TrendFeaturesUnavailable):
+        job_predictor.predict_values([reading])
+    with pytest.raises(TrendFeaturesUnavailable):
+        job_predictor.predict(pd.DataFrame([reading]))
@@ -0,0 +1,55 @@
+import io
+from datetime import datetime
+import pandas as pd
+from app import ingestion
+from app.models.device_data import DeviceData
+
+CSV_CONTENT = b"""device_id,usage_hours,temperature,pressure,vibration,error_count,error_codes,maintenance_notes
+DEV-001,120.5,32.1,105.2,0.15,0,,Normal operation
+DEV-001,124.2,not-a-number,107.8,0.18,1.0,ERR201,
+DEV-001,130.0,35.0,110.0,0.2,,ERR202,Checked
+"""
+
+def test_coerce_device_data_chunk_handles_missing_values():
+    chunk = pd.read_csv(io.BytesIO(CSV_CONTENT))
+    timestamp = datetime(2024, 1, 1)
+    
+    records = ingestion.coerce_device_data_chunk(chunk, "DEV-001", timestamp)
+    
+    assert records[0]['error_codes'] is None
+    assert records[0]['maintenance_notes'] == "Normal operation"
+    assert records[1]['temperature'] is None
+    assert records[1]['error_count'] == 1
+    assert records[1]['maintenance_notes'] is None
+    assert records[2]['error_count'] == 0
+    assert all(record['device_id'] == "DEV-001" and record['timestamp'] == timestamp for record in records)
+
+def test_ingest_device_data_file_in_chunks(db):
+    rows = ingestion.ingest_device_data_file(db, "DEV-001", io.BytesIO(CSV_CONTENT), "readings.csv", chunksize=2)
+    
+    assert rows == 3
+    stored = db.query(DeviceData).order_by(DeviceData.id).all()
+    assert [data.error_codes for data in stored] == [None, "ERR201", "ERR202"]
+    assert stored[2].usage_hours == 130.0
+
+def test_ingest_parquet_and_arrow_match_csv(db):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    table = pa.Table.from_pandas(pd.read_csv(io.BytesIO(CSV_CONTENT)), preserve_index=False)
+    parquet_file = io.BytesIO()
+    pq.write_table(table, parquet_file)
+    arrow_file = io.BytesIO()
+    with pa.ipc.new_file(arrow_file, table.schema) as writer:
+        writer.write_table(table)
+    
+    timestamp = datetime(2024, 1, 1)
+    expected = ingestion.coerce_device_data_chunk(pd.read_csv(io.BytesIO(CSV_CONTENT)), "DEV-001", timestamp)
+    for file_obj, filename in ((parquet_file, "readings.parquet"), (arrow_file, "readings.arrow")):
+        batches = list(ingestion.iter_arrow_batches(file_obj, filename, batch_size=2))
+        records = [record for batch in batches for record in ingestion.coerce_arrow_batch(batch, "DEV-001", timestamp)]
+        assert len(batches) == 2
+        assert records == expected
+    
+    assert ingestion.ingest_device_data_file(db, "DEV-001", parquet_file, "readings.parquet") == 3
+    assert db.query(DeviceData).count() == 3
@@ -0,0 +1,62 @@
+from fastapi.testclient import TestClient
+from app import metrics
+from app.crud import device_data as crud_device_data
+from app.schemas.device_data import DeviceDataCreate
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Test latency", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, route="/a/{id}")
+    registry.stats("worker", "Worker stats", lambda: {"running": True, "buffered": 3, "last_error": None})
+    
+    text = registry.render()
+    assert 'latency_seconds_bucket{route="/a/{id}",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{route="/a/{id}",le="1"} 3' in text
+    assert 'latency_seconds_bucket{route="/a/{id}",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{route="/a/{id}"} 4' in text
+    assert 'latency_seconds_sum{route="/a/{id}"} 3.65' in text
+    assert "worker_running 1" in text and "worker_buffered 3" in text
+    assert "last_error" not in text
+
+def test_requests_are_labelled_by_route_template(db):
+    from app.main import app
+    
+    ingested = metrics.INGEST_ROWS.value()
+    crud_device_data.create_device_data(db, DeviceDataCreate(device_id="DEV-M", temperature=30.0))
+    assert metrics.INGEST_ROWS.value() == ingested + 1
+    labels = {"method": "GET", "route": "/api/devices/{device_id}/data"}
+    requests = metrics.HTTP_REQUESTS.value(status=200, **labels)
+    queries = metrics.DB_QUERIES_PER_REQUEST.count(**labels)
+    
+    with TestClient(app) as client:
+        for device_id in ("DEV-M", "DEV-N"):
+            assert client.get(f"/api/devices/{device_id}/data").status_code == 200
+        response = client.get("/metrics")
+    
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert metrics.HTTP_REQUESTS.value(status=200, **labels) == requests + 2
+    assert metrics.DB_QUERIES_PER_REQUEST.count(**labels) == queries + 2
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/devices/{device_id}/data"}' in response.text
+    assert "DEV-M" not in response.text
+    assert "db_pool_checkouts" in response.text and "event_loop_samples" in response.text
+    assert metrics.HTTP_IN_FLIGHT.value() == 0
+
+def test_debug_headers_and_n_plus_one_detection(db, monkeypatch, caplog):
+    from app.main import app
+    
+    monkeypatch.setattr(metrics, "DB_DEBUG_HEADERS", True)
+    monkeypatch.setattr(metrics, "DB_N_PLUS_ONE_THRESHOLD", 1)
+    labels = {"method": "GET", "route": "/api/devices/{device_id}/data"}
+    flagged = metrics.DB_N_PLUS_ONE.value(**labels)
+    
+    with TestClient(app) as client:
+        response = client.get("/api/devices/DEV-M/data")
+    
+    assert int(response.headers["x-db-queries"]) >= 1
+    assert float(response.headers["x-db-time-ms"]) >= 0
+    assert int(response.headers["x-db-repeated-statements"]) >= 1
+    assert metrics.DB_N_PLUS_ONE.value(**labels) == flagged + 1
+    assert any("Suspected N+1 queries in GET /api/devices/{device_id}/data" in record.getMessage()
+               for record in caplog.records)
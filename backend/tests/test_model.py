@@ -23,5 +23,177 @@ def test_model():
         print(f"Error during prediction: {e}")
         print("This is expected since we don't have a trained model yet.")
 
+def _training_frame():
+    return pd.DataFrame({
+        'usage_hours': [100, 200, 300, 150, 250, 900],
+        'temperature': [30, 35, 40, 32, 38, 55],
+        'pressure': [100, 120, 140, 110, 130, 190],
+        'vibration': [0.1, 0.2, 0.5, 0.15, 0.4, 1.2],
+        'error_count': [0, 1, 5, 0, 3, 9],
+        'health_status': ['healthy', 'healthy', 'at_risk', 'healthy', 'at_risk', 'needs_maintenance']
+    })
+
+def test_registry_swaps_and_hot_reloads_snapshots(tmp_path):
+    import os
+    from app.ml.registry import ModelRegistry
+    
+    model_path = str(tmp_path / "model.pkl")
+    predictor = DeviceHealthPredictor(registry=ModelRegistry(model_path))
+    predictor.train(_training_frame())
+    first = predictor.registry.current()
+    assert first.version == 1 and os.path.exists(model_path)
+    
+    # Another process writes a new artifact: the watcher picks it up by mtime/hash
+    other = DeviceHealthPredictor(registry=ModelRegistry(model_path))
+    other.train(_training_frame().iloc[::-1])
+    os.utime(model_path, (first.source_mtime + 10, first.source_mtime + 10))
+    assert predictor.registry.refresh_if_changed()
+    assert predictor.registry.current().version == 2
+    assert not predictor.registry.refresh_if_changed()
+    
+    # The previously served snapshot is untouched by the swap
+    assert first.model is not predictor.model
+    assert len(predictor.predict(_training_frame())) == 6
+
+def test_training_job_streams_data_and_publishes_model(db, tmp_path):
+    import time
+    from app.database import SessionLocal
+    from app.ml.registry import ModelRegistry
+    from app.ml.training import TrainingJobManager
+    from app.models.device_data import DeviceData
+    
+    frame = _training_frame()
+    db.add_all([
+        DeviceData(device_id="DEV-1", **row)
+        for row in frame.drop(columns='health_status').to_dict('records')
+    ])
+    db.add(DeviceData(device_id="DEV-2", temperature=None, error_count=0))
+    db.commit()
+    
+    job_predictor = DeviceHealthPredictor(registry=ModelRegistry(str(tmp_path / "model.pkl")))
+    manager = TrainingJobManager(job_predictor, session_factory=SessionLocal, use_process_pool=False)
+    job = manager.submit()
+    
+    deadline = time.time() + 30
+    while job.status not in ("completed", "failed") and time.time() < deadline:
+        time.sleep(0.05)
+    
+    assert job.status == "completed", job.error
+    assert job.records_used == 7
+    assert job.progress == 1.0
+    assert job.model_version == job_predictor.registry.current().version
+    assert job.fit_seconds > 0
+    manager.shutdown()
+
+def test_derive_health_labels():
+    from app.ml.training import derive_health_labels
+    
+    X = np.array([
+        [100, 30, 100, 0.1, 0],
+        [100, 40, 100, 0.1, 3],
+        [100, 30, 100, 0.1, 9],
+        [100, np.nan, 100, 0.1, 0],
+    ])
+    
+    assert derive_health_labels(X).tolist() == [0, 1, 2, 0]
+
+def test_explanations_records_and_columnar_agree(tmp_path):
+    from app.ml.registry import ModelRegistry
+    
+    predictor = DeviceHealthPredictor(registry=ModelRegistry(str(tmp_path / "model.pkl")))
+    predictor.train(_training_frame())
+    batch = predictor.explain_batch(_training_frame())
+    
+    records = batch.to_records()
+    columns = batch.to_columnar(include_text=True)
+    
+    assert len(records) == len(columns['prediction']) == 6
+    for idx, record in enumerate(records):
+        assert record['prediction'] == columns['prediction'][idx]
+        assert record['top_factors'] == columns['top_factors'][idx]
+        assert record['recommendation'] == columns['recommendation'][idx]
+        assert set(record['class_probabilities']) == {'healthy', 'at_risk', 'needs_maintenance'}
+        assert abs(sum(record['class_probabilities'].values()) - 1) < 1e-9
+    assert 'recommendation' not in batch.to_records(include_text=False)[0]
+
+def test_forest_attributions_decompose_probabilities(tmp_path):
+    from app.ml.registry import ModelRegistry
+    
+    predictor = DeviceHealthPredictor(registry=ModelRegistry(str(tmp_path / "model.pkl")))
+    predictor.train(_training_frame())
+    snapshot = predictor.registry.current()
+    X = snapshot.scaler.transform(_training_frame()[predictor.feature_names])
+    
+    bias, contributions = snapshot.attributor.contributions(X)
+    
+    assert contributions.shape == (6, 5, len(snapshot.model.classes_))
+    np.testing.assert_allclose(bias + contributions.sum(axis=1), snapshot.model.predict_proba(X), atol=1e-12)
+    assert snapshot.attributor is snapshot.attributor
+    
+    records = predictor.predict_with_explanation(_training_frame())
+    for record in records:
+        contributions_by_feature = {name: data['contribution'] for name, data in record['feature_contributions'].items()}
+        assert record['top_factors'] == sorted(contributions_by_feature, key=contributions_by_feature.get, reverse=True)[:3]
+
+def test_compiled_forest_matches_sklearn_bit_for_bit(tmp_path):
+    from app.ml.registry import ModelRegistry
+    
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 5)) * [100, 10, 20, 0.5, 3] + [1000, 35, 110, 0.4, 3]
+    frame = pd.DataFrame(X, columns=['usage_hours', 'temperature', 'pressure', 'vibration', 'error_count'])
+    frame['health_status'] = np.select(
+        [(frame.error_count > 5) | (frame.temperature > 45), frame.temperature > 38],
+        ['needs_maintenance', 'at_risk'], default='healthy'
+    )
+    predictor = DeviceHealthPredictor(registry=ModelRegistry(str(tmp_path / "model.pkl")))
+    predictor.train(frame)
+    snapshot = predictor.registry.current()
+    
+    # Unseen rows, training rows and rows sitting exactly on split thresholds
+    thresholds = snapshot.compiled.threshold[~snapshot.compiled.is_leaf][:200]
+    on_split = np.tile(snapshot.scaler.transform(X[:1]), (len(thresholds), 1))
+    on_split[np.arange(len(thresholds)), snapshot.compiled.feature[~snapshot.compiled.is_leaf][:200]] = thresholds
+    test = np.vstack([
+        rng.normal(size=(1000, 5)) * [100, 10, 20, 0.5, 3] + [1000, 35, 110, 0.4, 3],
+        X[:500],
+        snapshot.scaler.inverse_transform(on_split),
+    ])
+    
+    expected = snapshot.model.predict_proba(snapshot.scaler.transform(test))
+    assert snapshot.compiled.predict_proba(test).tobytes() == expected.tobytes()
+    assert (snapshot.compiled.predict(test) == snapshot.model.predict(snapshot.scaler.transform(test))).all()
+    
+    row = dict(zip(predictor.feature_names, test[0]))
+    assert snapshot.compiled.predict_one(row) == dict(zip(snapshot.model.classes_.tolist(), expected[0].tolist()))
+    assert predictor.predict_values([row]) == predictor.predict(pd.DataFrame([row]))
+    assert predictor.predict_values(test[:3]) == predictor.predict(pd.DataFrame(test[:3], columns=predictor.feature_names))
+
+def test_feature_matrix_from_rows_matches_dataframe_path(tmp_path):
+    from app.api.ml import PredictionRequest
+    from app.models.device_latest_state import DeviceLatestState
+    from app.ml.registry import ModelRegistry
+    
+    predictor = DeviceHealthPredictor(registry=ModelRegistry(str(tmp_path / "model.pkl")))
+    predictor.train(_training_frame())
+    frame = _training_frame().drop(columns='health_status')
+    frame.loc[2, 'pressure'] = None
+    records = frame.astype(object).where(frame.notna(), None).to_dict('records')
+    
+    expected = predictor.preprocess_data(frame)
+    states = [DeviceLatestState(device_id=f"DEV-{idx}", **record) for idx, record in enumerate(records)]
+    requests = [PredictionRequest(device_id=f"DEV-{idx}", **record) for idx, record in enumerate(records)]
+    for rows in (records, states, requests):
+        X = predictor.feature_matrix(rows)
+        assert predictor.preprocess_matrix(X).tobytes() == expected.tobytes()
+        assert predictor.predict_values(rows) == predictor.predict(frame)
+    
+    out = np.full((len(records), 5), -1.0, dtype=np.float32)
+    assert predictor.feature_matrix(states, out=out) is out
+    assert out[2, 2] == 0 and out.dtype == np.float32
+    
+    explained = predictor.explain_values(requests).to_records()
+    assert [record['prediction'] for record in explained] == [status for status, _, _ in predictor.predict(frame)]
+
+
 if __name__ == "__main__":
-    test_model()
\ No newline at end of file
+    test_model()
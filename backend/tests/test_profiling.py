@@ -0,0 +1,53 @@
+import time
+from fastapi.testclient import TestClient
+from app import profiling
+from app.crud import device as crud_device
+
+def test_profiles_opted_in_requests(db, monkeypatch):
+    from app.main import app
+    
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+    monkeypatch.setattr(profiling, "PROFILE_INTERVAL", 0.001)
+    profiling.profile_store.clear()
+    lookup = crud_device.get_device_by_device_id
+    def slow_lookup(db, device_id):
+        time.sleep(0.1)
+        return lookup(db, device_id)
+    monkeypatch.setattr(crud_device, "get_device_by_device_id", slow_lookup)
+    
+    device = {"device_id": "DEV-P", "name": "Pump", "type": "infusion_pump", "manufacturer": "Acme",
+              "model": "X1", "serial_number": "SN-1", "installation_date": "2024-01-01T00:00:00"}
+    with TestClient(app) as client:
+        # Without the header nothing is profiled
+        response = client.post("/api/devices/", json=device)
+        assert "x-profile-id" not in response.headers
+        
+        response = client.get("/health", headers={"X-Profile-Token": "wrong"})
+        assert "x-profile-id" not in response.headers
+        
+        response = client.post("/api/devices/", json={**device, "device_id": "DEV-Q", "serial_number": "SN-2"},
+                               headers={"X-Profile-Token": "s3cret", "X-Request-ID": "req-1"})
+        assert response.status_code == 200 and response.headers["x-profile-id"] == "req-1"
+        
+        assert client.get("/api/admin/profiles/").status_code == 403
+        admin = {"X-Profile-Token": "s3cret"}
+        listed = client.get("/api/admin/profiles/", headers=admin).json()
+        assert [profile["id"] for profile in listed] == ["req-1"]
+        
+        profile = client.get("/api/admin/profiles/req-1", headers=admin).json()
+        assert profile["status"] == 200 and profile["samples"] > 10
+        assert any("slow_lookup" in entry["function"] for entry in profile["functions"])
+        
+        # The sync endpoint ran on a worker thread and was sampled there
+        stacks = client.get("/api/admin/profiles/req-1/collapsed", headers=admin).text
+        assert "create_device (api/devices.py" in stacks
+        assert client.get("/api/admin/profiles/missing", headers=admin).status_code == 404
+
+def test_sampler_stop_does_not_wait_for_the_thread():
+    sampler = profiling._Sampler(profiling.RequestProfile("p", "GET", "/"), interval=0.2)
+    sampler.start()
+    start = time.perf_counter()
+    sampler.stop()
+    assert time.perf_counter() - start < 0.05
+    sampler.join(timeout=1)
+    assert not sampler.is_alive()
@@ -0,0 +1,54 @@
+import json
+import os
+import subprocess
+import sys
+from fastapi.testclient import TestClient
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Cold import budget for app.main; the ML stack alone took longer than this
+IMPORT_BUDGET_SECONDS = float(os.getenv("IMPORT_BUDGET_SECONDS", "3.0"))
+HEAVY_MODULES = ["pandas", "sklearn", "joblib", "scipy", "pyarrow"]
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def test_import_is_fast_and_does_not_touch_the_database(tmp_path):
+    # Connecting to this database would fail, importing must not try
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{tmp_path / 'missing' / 'app.db'}"}
+    result = subprocess.run(
+        [sys.executable, "-c", IMPORT_SCRIPT], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    
+    assert report["loaded"] == []
+    assert report["seconds"] < IMPORT_BUDGET_SECONDS
+
+def test_ready_waits_for_model_and_database(db, monkeypatch):
+    from app import main
+    from app.ml.model import predictor
+    
+    with TestClient(main.app) as client:
+        predictor._load_finished.wait(30)
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+        assert response.json()["model"] in ("loaded", "missing")
+        
+        monkeypatch.setattr(main, "check_connection", lambda: "connection refused")
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json() == {"status": "not_ready", "database": "connection refused",
+                                   "model": predictor.load_state}
+        
+        monkeypatch.setattr(main, "check_connection", lambda: None)
+        monkeypatch.setattr(predictor, "load_state", "failed")
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json() == {"status": "not_ready", "database": "ok", "model": "failed"}
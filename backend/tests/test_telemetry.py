@@ -0,0 +1,132 @@
+import json
+import time
+from datetime import datetime
+import msgpack
+import pytest
+from app import telemetry
+from app.crud import device as crud_device, device_data as crud_device_data
+from app.crud import device_latest_state as crud_latest_state
+from app.schemas.device import DeviceCreate
+
+def _reading(device_id, day, temperature=30.0):
+    return {"device_id": device_id, "timestamp": f"2024-01-0{day}T00:00:00Z", "temperature": temperature}
+
+def test_decode_payload_formats():
+    readings = [_reading("DEV-1", 1), _reading("DEV-2", 2)]
+    
+    ndjson = "\n".join(json.dumps(reading) for reading in readings).encode()
+    assert telemetry.decode_payload(ndjson, "application/x-ndjson") == readings
+    assert telemetry.decode_payload(json.dumps(readings).encode(), "application/json") == readings
+    assert telemetry.decode_payload(msgpack.packb(readings[0]), "application/msgpack") == readings[:1]
+    with pytest.raises(ValueError):
+        telemetry.decode_payload(b"[1, 2]", "application/json")
+    
+    record = telemetry.coerce_reading({"device_id": "DEV-1", "timestamp": 1704067200, "pressure": "2.5"}, None)
+    assert record["timestamp"] == datetime(2024, 1, 1)
+    assert record["pressure"] == 2.5 and record["error_count"] == 0
+    for out_of_range in ({"error_count": 1e20}, {"error_count": -1}, {"temperature": "inf"},
+                         {"vibration": 10 ** 400}, {"timestamp": 1e20}):
+        with pytest.raises(ValueError):
+            telemetry.coerce_reading({"device_id": "DEV-1", **out_of_range}, None)
+
+def test_writer_flushes_micro_batches(db):
+    writer = telemetry.TelemetryWriter(batch_size=3, flush_interval=0.05)
+    writer.start()
+    try:
+        # A full batch is written right away, the remainder once the flush interval passed
+        seq = writer.submit([telemetry.coerce_reading(_reading("DEV-1", day), None) for day in range(1, 6)])
+        assert writer.wait_committed(seq, timeout=5)
+    finally:
+        writer.stop()
+    
+    stats = writer.stats()
+    assert stats["written"] == 5 and stats["batches"] == 2 and stats["buffered"] == 0
+    assert crud_latest_state.get_latest_state(db, "DEV-1").reading_count == 5
+
+def test_writer_backpressure_and_retry(db, monkeypatch):
+    writer = telemetry.TelemetryWriter(batch_size=10, flush_interval=0.2, max_buffered=2)
+    with pytest.raises(telemetry.TelemetryUnavailable):
+        writer.submit([])
+    
+    failures = []
+    insert = crud_device_data.insert_device_data_records
+    def flaky_insert(db, records):
+        if not failures:
+            failures.append(len(records))
+            raise RuntimeError("database unavailable")
+        return insert(db, records)
+    monkeypatch.setattr(crud_device_data, "insert_device_data_records", flaky_insert)
+    monkeypatch.setattr(telemetry, "TELEMETRY_RETRY_DELAY", 0.01)
+    
+    writer.start()
+    try:
+        seq = writer.submit([telemetry.coerce_reading(_reading("DEV-1", day), None) for day in (1, 2)])
+        with pytest.raises(telemetry.TelemetryFull):
+            writer.submit([telemetry.coerce_reading(_reading("DEV-1", 3), None)])
+        # The failed batch stays buffered and is written by the retry
+        assert writer.wait_committed(seq, timeout=5)
+    finally:
+        writer.stop()
+    
+    stats = writer.stats()
+    assert failures == [2]
+    assert stats["failed_flushes"] == 1 and stats["written"] == 2 and stats["rejected"] == 1
+    assert crud_latest_state.get_latest_state(db, "DEV-1").reading_count == 2
+
+def test_writer_drops_readings_the_database_keeps_refusing(db, monkeypatch):
+    insert = crud_device_data.insert_device_data_records
+    def refuse_poison(db, records):
+        if any(record["temperature"] == -1 for record in records):
+            raise RuntimeError("value out of range")
+        return insert(db, records)
+    monkeypatch.setattr(crud_device_data, "insert_device_data_records", refuse_poison)
+    monkeypatch.setattr(telemetry, "TELEMETRY_RETRY_DELAY", 0.01)
+    monkeypatch.setattr(telemetry, "TELEMETRY_MAX_FLUSH_ATTEMPTS", 2)
+    
+    writer = telemetry.TelemetryWriter(batch_size=10, flush_interval=0.05)
+    outcomes = {}
+    writer.start()
+    try:
+        writer.submit([telemetry.coerce_reading(_reading("DEV-1", day), None) for day in (1, 2, 3)],
+                      lambda written: outcomes.setdefault("good", written))
+        seq = writer.submit([telemetry.coerce_reading(_reading("DEV-1", day, temperature), None)
+                             for day, temperature in ((4, -1), (5, 30.0))],
+                            lambda written: outcomes.setdefault("poisoned", written))
+        # The batch is split after two failed attempts; the rest is written, the poison row dropped
+        assert writer.wait_committed(seq, timeout=5)
+    finally:
+        writer.stop()
+    
+    stats = writer.stats()
+    assert stats["written"] == 4 and stats["dropped"] == 1 and stats["buffered"] == 0
+    assert outcomes == {"good": True, "poisoned": False}
+    assert crud_latest_state.get_latest_state(db, "DEV-1").reading_count == 4
+
+def test_telemetry_endpoint_registers_unknown_devices(db):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    
+    crud_device.create_device(db, DeviceCreate(
+        device_id="DEV-1", name="Pump", type="infusion_pump", manufacturer="Acme",
+        model="P1", serial_number="SN-1", installation_date=datetime(2023, 1, 1)
+    ))
+    body = "\n".join(json.dumps(reading) for reading in [
+        _reading("DEV-1", 1), _reading("DEV-1", 2), _reading("DEV-9", 1), {"temperature": 20}
+    ])
+    
+    with TestClient(app) as client:
+        response = client.post("/api/telemetry/", params={"wait": True}, content=body,
+                               headers={"Content-Type": "application/x-ndjson"})
+        assert response.status_code == 201
+        result = response.json()
+        assert result["accepted"] == 3 and result["committed"]
+        assert len(result["rejected"]) == 1
+        assert client.get("/api/telemetry/stats").json()["written"] >= 2
+        
+        response = client.post("/api/telemetry/", content=json.dumps({"device_id": "DEV-1", "error_count": 1e20}),
+                               headers={"Content-Type": "application/json"})
+        assert response.status_code == 422
+        assert response.json()["detail"][0]["index"] == 0
+    
+    assert crud_latest_state.get_latest_state(db, "DEV-1").reading_count == 2
+    assert crud_device.get_device_by_device_id(db, "DEV-9").name == "Device DEV-9"
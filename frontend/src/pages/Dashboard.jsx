@@ -19,54 +19,22 @@ const Dashboard = () => {
       try {
         setLoading(true)
 
-        // Fetch devices from the API
-        const devicesResponse = await fetch('http://localhost:8001/api/devices/')
-        let devices = []
-        if (devicesResponse.ok) {
-          devices = await devicesResponse.json()
-          setTotalDevices(devices.length)
+        // Fetch devices, latest predictions and explanations in one request
+        const dashboardResponse = await fetch('http://localhost:8001/api/dashboard/')
+        if (!dashboardResponse.ok) {
+          throw new Error(`Dashboard request failed with status ${dashboardResponse.status}`)
         }
+        const dashboard = await dashboardResponse.json()
 
-        // Fetch predictions from the API
-        const predictionsResponse = await fetch('http://localhost:8001/api/predictions/')
-        let predictions = []
-        if (predictionsResponse.ok) {
-          predictions = await predictionsResponse.json()
-        }
-
-        // Calculate device stats based on predictions
-        const healthyDevices = devices.filter(device => {
-          const devicePredictions = predictions.filter(p => p.device_id === device.device_id)
-          if (devicePredictions.length > 0) {
-            return devicePredictions[0].predicted_status === 'healthy'
-          }
-          return false // Default to not healthy if no predictions
-        }).length
-
-        const atRiskDevices = devices.filter(device => {
-          const devicePredictions = predictions.filter(p => p.device_id === device.device_id)
-          if (devicePredictions.length > 0) {
-            return devicePredictions[0].predicted_status === 'at_risk'
-          }
-          return false
-        }).length
-
-        const needsMaintenanceDevices = devices.filter(device => {
-          const devicePredictions = predictions.filter(p => p.device_id === device.device_id)
-          if (devicePredictions.length > 0) {
-            return devicePredictions[0].predicted_status === 'needs_maintenance'
-          }
-          return false
-        }).length
-
-        setDevicesAtRisk(atRiskDevices)
-        setDevicesNeedsMaintenance(needsMaintenanceDevices)
+        setTotalDevices(dashboard.total_devices)
+        setDevicesAtRisk(dashboard.status_breakdown.at_risk || 0)
+        setDevicesNeedsMaintenance(dashboard.status_breakdown.needs_maintenance || 0)
 
         // Set device stats for pie chart
         const deviceStatsData = [
-          { name: 'Healthy', value: healthyDevices },
-          { name: 'At Risk', value: atRiskDevices },
-          { name: 'Needs Maintenance', value: needsMaintenanceDevices },
+          { name: 'Healthy', value: dashboard.status_breakdown.healthy || 0 },
+          { name: 'At Risk', value: dashboard.status_breakdown.at_risk || 0 },
+          { name: 'Needs Maintenance', value: dashboard.status_breakdown.needs_maintenance || 0 },
         ]
         setDeviceStats(deviceStatsData)
 
@@ -83,48 +51,30 @@ const Dashboard = () => {
         setPredictionStats(mockPredictionData)
 
         // Set recent alerts (latest predictions)
-        const recentPredictions = predictions
-          .sort((a, b) => new Date(b.prediction_timestamp) - new Date(a.prediction_timestamp))
+        const recentPredictions = dashboard.devices
+          .filter(entry => entry.latest_prediction)
+          .sort((a, b) => new Date(b.latest_prediction.prediction_timestamp) - new Date(a.latest_prediction.prediction_timestamp))
           .slice(0, 5)
-          .map(pred => {
-            const device = devices.find(d => d.device_id === pred.device_id) || { name: 'Unknown Device' }
-            return {
-              deviceId: pred.device_id,
-              deviceName: device.name,
-              status: pred.predicted_status,
-              lastUpdated: new Date(pred.prediction_timestamp).toLocaleString()
-            }
-          })
+          .map(entry => ({
+            deviceId: entry.device.device_id,
+            deviceName: entry.device.name,
+            status: entry.latest_prediction.predicted_status,
+            lastUpdated: new Date(entry.latest_prediction.prediction_timestamp).toLocaleString()
+          }))
         setRecentAlerts(recentPredictions)
 
-        // Fetch explainable AI insights for at-risk and maintenance devices
-        const problemDevices = devices.filter(device => {
-          const devicePredictions = predictions.filter(p => p.device_id === device.device_id)
-          if (devicePredictions.length > 0) {
-            const status = devicePredictions[0].predicted_status
-            return status === 'at_risk' || status === 'needs_maintenance'
-          }
-          return false
-        })
-
-        const insightsPromises = problemDevices.slice(0, 5).map(async (device) => {
-          try {
-            const response = await fetch(`http://localhost:8001/api/ml/explain/${device.device_id}`)
-            if (response.ok) {
-              const explanation = await response.json()
-              return {
-                deviceId: device.device_id,
-                deviceName: device.name,
-                ...explanation
-              }
-            }
-          } catch (error) {
-            console.error(`Error fetching explanation for ${device.device_id}:`, error)
-          }
-          return null
-        })
-
-        const insights = (await Promise.all(insightsPromises)).filter(insight => insight !== null)
+        // Explainable AI insights for at-risk and maintenance devices
+        const insights = dashboard.devices
+          .filter(entry => {
+            const status = entry.latest_prediction && entry.latest_prediction.predicted_status
+            return entry.explanation && (status === 'at_risk' || status === 'needs_maintenance')
+          })
+          .slice(0, 5)
+          .map(entry => ({
+            deviceId: entry.device.device_id,
+            deviceName: entry.device.name,
+            ...entry.explanation
+          }))
         setExplainableInsights(insights)
 
       } catch (error) {
@@ -171,7 +171,7 @@ const UploadData = () => {
       <div className="bg-white shadow sm:rounded-lg">
         <div className="px-4 py-5 sm:p-6">
           <h2 className="text-lg leading-6 font-medium text-gray-900 mb-4">
-            Upload CSV or Excel file
+            Upload CSV, Excel, Parquet or Arrow file
           </h2>
           
           {error && (
@@ -241,13 +241,13 @@ const UploadData = () => {
                         type="file"
                         className="sr-only"
                         onChange={handleFileChange}
-                        accept=".csv,.xlsx,.xls"
+                        accept=".csv,.xlsx,.xls,.parquet,.arrow,.feather"
                       />
                     </label>
                     <p className="pl-1">or drag and drop</p>
                   </div>
                   <p className="text-xs text-gray-500">
-                    CSV, XLSX, or XLS up to 10MB
+                    CSV, XLSX, XLS, Parquet or Arrow up to 10MB
                   </p>
                 </div>
               </div>